@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Import-Time Benchmark for SmartPetBuys Scripts
+Measures module import cost with `python -X importtime` and enforces startup budgets.
+"""
+
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+SCRIPTS_DIR = Path(__file__).parent
+
+# Cumulative import budget in milliseconds (as reported by -X importtime, which adds some overhead)
+IMPORT_BUDGETS_MS = {
+    'keyword_manager': 75,
+    'duplicate_checker': 75,
+    'validate_product_data': 75,
+    'product_catalog': 75,
+    'generate_single_post': 100,
+}
+
+# Dependencies that must only load in the code paths that use them
+HEAVY_MODULES = ['openai', 'frontmatter', 'yaml', 'difflib', 'concurrent.futures']
+
+
+def measure_import(module: str) -> Tuple[float, List[str]]:
+    """Import a module in a fresh interpreter; return (cumulative ms, heavy modules loaded)."""
+    probe = (f"import sys, {module}; "
+             f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', probe],
+        cwd=SCRIPTS_DIR, capture_output=True, text=True, check=True
+    )
+
+    cumulative_us = None
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package" (top-level imports are not indented)
+        parts = line.split('|')
+        if len(parts) == 3 and parts[2].rstrip() == f" {module}":
+            cumulative_us = int(parts[1])
+
+    if cumulative_us is None:
+        raise RuntimeError(f"No import timing reported for {module}")
+
+    heavy = [name for name in result.stdout.strip().split(',') if name]
+    return cumulative_us / 1000, heavy
+
+
+def run_benchmark(runs: int = 5) -> Dict[str, Dict]:
+    """Measure every budgeted module; the median of several runs smooths out noise."""
+    results = {}
+    for module, budget in IMPORT_BUDGETS_MS.items():
+        timings = []
+        heavy: List[str] = []
+        for _ in range(runs):
+            ms, heavy = measure_import(module)
+            timings.append(ms)
+        median = statistics.median(timings)
+        results[module] = {
+            'median_ms': median,
+            'budget_ms': budget,
+            'heavy_imports': heavy,
+            'passed': median <= budget and not heavy,
+        }
+    return results
+
+
+def main():
+    """Run the import-time benchmark and fail when a budget is exceeded."""
+    runs = 5
+    if len(sys.argv) == 3 and sys.argv[1] == '--runs':
+        runs = int(sys.argv[2])
+    elif len(sys.argv) != 1:
+        print("Usage: python benchmark_imports.py [--runs N]")
+        return 1
+
+    results = run_benchmark(runs)
+
+    print("\n[BENCHMARK] Import time (median of {} runs):".format(runs))
+    for module, result in results.items():
+        status = "OK  " if result['passed'] else "FAIL"
+        line = f"  {status} {module:<24} {result['median_ms']:6.1f} ms (budget {result['budget_ms']} ms)"
+        if result['heavy_imports']:
+            line += f" eagerly imports: {', '.join(result['heavy_imports'])}"
+        print(line)
+
+    return 0 if all(result['passed'] for result in results.values()) else 1
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Responsive Hero Image Builder for SmartPetBuys
+Generates resized WebP/AVIF variants of the static hero images and a manifest for Hugo templates.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Breakpoints served to the browser; the source width is always included
+VARIANT_WIDTHS = [480, 768, 1200]
+
+# Encoder settings per output format, most efficient format first
+VARIANT_FORMATS = {
+    'avif': {'quality': 55, 'speed': 6},
+    'webp': {'quality': 80, 'method': 6},
+}
+
+SOURCE_EXTENSIONS = {'.webp', '.jpg', '.jpeg', '.png'}
+
+
+def _hash_file(path: Path) -> str:
+    """Hash file contents for cache invalidation."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _available_formats() -> List[str]:
+    """Return the configured output formats this Pillow build can encode."""
+    from PIL import Image
+
+    # Older Pillow releases only gain AVIF through the optional plugin
+    try:
+        import pillow_avif  # noqa: F401
+    except ImportError:
+        pass
+
+    Image.init()
+    formats = []
+    for fmt in VARIANT_FORMATS:
+        if fmt.upper() in Image.SAVE:
+            formats.append(fmt)
+        else:
+            logger.warning(f"Pillow cannot encode {fmt.upper()}, skipping those variants")
+    return formats
+
+
+def _target_widths(source_width: int, widths: List[int]) -> List[int]:
+    """Widths to generate for a source image (never upscale)."""
+    return sorted({w for w in widths if w < source_width} | {source_width})
+
+
+def _build_variants(source: str, output_dir: str, url_prefix: str,
+                    widths: List[int], formats: List[str]) -> Dict:
+    """Resize one hero image into every width/format variant (runs in a worker process)."""
+    from PIL import Image
+
+    source_path = Path(source)
+    out_dir = Path(output_dir)
+    variants = []
+
+    with Image.open(source_path) as img:
+        width, height = img.size
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if 'A' in img.getbands() else 'RGB')
+
+        for target_width in _target_widths(width, widths):
+            target_height = round(height * target_width / width)
+            resized = img if target_width == width else img.resize((target_width, target_height), Image.LANCZOS)
+
+            for fmt in formats:
+                # The original WebP already is the full-width WebP variant
+                if target_width == width and fmt == source_path.suffix.lstrip('.').lower():
+                    variants.append({
+                        'width': width,
+                        'height': height,
+                        'format': fmt,
+                        'url': f"{url_prefix}/{source_path.name}",
+                        'file': None,
+                        'bytes': source_path.stat().st_size,
+                    })
+                    continue
+
+                file_name = f"{source_path.stem}-{target_width}.{fmt}"
+                out_path = out_dir / file_name
+                resized.save(out_path, fmt.upper(), **VARIANT_FORMATS[fmt])
+                variants.append({
+                    'width': target_width,
+                    'height': target_height,
+                    'format': fmt,
+                    'url': f"{url_prefix}/{out_dir.name}/{file_name}",
+                    'file': file_name,
+                    'bytes': out_path.stat().st_size,
+                })
+
+    return {'width': width, 'height': height, 'variants': variants}
+
+
+class HeroImageBuilder:
+    """Builds responsive hero image variants with a content-hash cache."""
+
+    def __init__(self, source_dir: str = "static/images/heroes",
+                 manifest_path: str = "data/hero_images.json",
+                 url_prefix: str = "/images/heroes",
+                 widths: Optional[List[int]] = None):
+        self.source_dir = Path(source_dir)
+        self.output_dir = self.source_dir / "responsive"
+        self.manifest_path = Path(manifest_path)
+        self.url_prefix = url_prefix
+        self.widths = widths or VARIANT_WIDTHS
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self) -> Dict:
+        """Load the existing manifest, which doubles as the build cache."""
+        if self.manifest_path.exists():
+            try:
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (json.JSONDecodeError, FileNotFoundError):
+                logger.warning("Could not load hero image manifest, rebuilding all variants")
+        return {}
+
+    def _save_manifest(self):
+        """Write the manifest atomically so Hugo never reads a partial file."""
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(dict(sorted(self.manifest.items())), f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _find_sources(self) -> List[Path]:
+        """List source images (generated variants live in a subdirectory and are skipped)."""
+        if not self.source_dir.exists():
+            return []
+        return sorted(p for p in self.source_dir.iterdir()
+                      if p.is_file() and p.suffix.lower() in SOURCE_EXTENSIONS)
+
+    def _is_current(self, entry: Optional[Dict], content_hash: str, formats: List[str]) -> bool:
+        """Check whether a manifest entry still matches its source and settings."""
+        if not entry or entry.get('hash') != content_hash:
+            return False
+
+        expected = {(w, fmt) for w in _target_widths(entry['width'], self.widths) for fmt in formats}
+        recorded = {(v['width'], v['format']) for v in entry.get('variants', [])}
+        if expected != recorded:
+            return False
+
+        return all(v['file'] is None or (self.output_dir / v['file']).exists()
+                   for v in entry['variants'])
+
+    @staticmethod
+    def _srcset(variants: List[Dict], fmt: str) -> str:
+        """Build an HTML srcset string for one format."""
+        return ", ".join(f"{v['url']} {v['width']}w"
+                         for v in sorted(variants, key=lambda v: v['width'])
+                         if v['format'] == fmt)
+
+    def build(self, force: bool = False, workers: Optional[int] = None) -> Dict:
+        """Generate missing or stale variants across all cores and refresh the manifest."""
+        formats = _available_formats()
+        sources = self._find_sources()
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+
+        stats = {'total': len(sources), 'built': 0, 'cached': 0, 'failed': 0, 'removed': 0}
+
+        pending: List[Tuple[Path, str]] = []
+        for source in sources:
+            content_hash = _hash_file(source)
+            if not force and self._is_current(self.manifest.get(source.name), content_hash, formats):
+                stats['cached'] += 1
+            else:
+                pending.append((source, content_hash))
+
+        if pending:
+            with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+                futures = {
+                    pool.submit(_build_variants, str(source), str(self.output_dir),
+                                self.url_prefix, self.widths, formats): (source, content_hash)
+                    for source, content_hash in pending
+                }
+                for future, (source, content_hash) in futures.items():
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logger.error(f"Could not build variants for {source.name}: {e}")
+                        stats['failed'] += 1
+                        continue
+
+                    result['hash'] = content_hash
+                    result['fallback'] = f"{self.url_prefix}/{source.name}"
+                    result['srcset'] = {fmt: self._srcset(result['variants'], fmt) for fmt in formats}
+                    self.manifest[source.name] = result
+                    stats['built'] += 1
+
+        # Drop entries whose source image has been deleted
+        source_names = {source.name for source in sources}
+        for name in [name for name in self.manifest if name not in source_names]:
+            for variant in self.manifest[name].get('variants', []):
+                if variant['file']:
+                    (self.output_dir / variant['file']).unlink(missing_ok=True)
+            del self.manifest[name]
+            stats['removed'] += 1
+
+        self._save_manifest()
+        return stats
+
+    def get_savings(self) -> Dict:
+        """Compare the smallest mobile variant against the original for each hero."""
+        original_bytes = 0
+        mobile_bytes = 0
+        for entry in self.manifest.values():
+            full = [v['bytes'] for v in entry['variants'] if v['file'] is None]
+            smallest = min(entry['variants'], key=lambda v: (v['width'], v['bytes']), default=None)
+            if full and smallest:
+                original_bytes += full[0]
+                mobile_bytes += smallest['bytes']
+
+        return {
+            'images': len(self.manifest),
+            'original_bytes': original_bytes,
+            'mobile_bytes': mobile_bytes,
+            'reduction': 1 - mobile_bytes / original_bytes if original_bytes else 0.0,
+        }
+
+
+def main():
+    """CLI interface for building responsive hero images."""
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Usage: python build_hero_images.py [build|rebuild|stats]")
+        return 1
+
+    command = sys.argv[1]
+
+    if command in ('build', 'rebuild'):
+        try:
+            import PIL  # noqa: F401
+        except ImportError as e:
+            print(f"❌ Missing required dependency: {e}")
+            print("Install with: pip install Pillow")
+            return 1
+
+        builder = HeroImageBuilder()
+        stats = builder.build(force=(command == 'rebuild'))
+        print("\n[BUILD] Hero image variants:")
+        print(f"Source images: {stats['total']}")
+        print(f"Built: {stats['built']}")
+        print(f"Unchanged (cached): {stats['cached']}")
+        print(f"Removed: {stats['removed']}")
+        print(f"Failed: {stats['failed']}")
+        return 1 if stats['failed'] else 0
+
+    elif command == 'stats':
+        savings = HeroImageBuilder().get_savings()
+        print("\n[STATS] Hero image variants:")
+        print(f"Images in manifest: {savings['images']}")
+        print(f"Original size: {savings['original_bytes'] / 1024:.0f} KB")
+        print(f"Smallest variants: {savings['mobile_bytes'] / 1024:.0f} KB")
+        print(f"Mobile reduction: {savings['reduction']:.1%}")
+
+    else:
+        print("Invalid command")
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
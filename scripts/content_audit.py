@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+Content Quality Audit for SmartPetBuys
+Single-pass Markdown analysis of every post, fanned out over a process pool and cached by content hash.
+"""
+
+import csv
+import hashlib
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+POSTS_DIR = "content/posts"
+CACHE_PATH = ".cache/content_audit.json"
+REPORT_PATH = "content_audit_report.csv"
+
+# Bump when analyze_markdown changes so cached analyses are discarded
+ANALYZER_VERSION = 1
+
+# Analyze changed posts in worker processes only when enough of them changed to pay for the pool
+PARALLEL_THRESHOLD = 64
+BATCH_SIZE = 32
+
+# Same thresholds the generator enforces on new drafts, plus the prompt's SEO targets
+MIN_CHARACTERS = 1000
+MIN_HEADINGS = 3
+MIN_PARAGRAPHS = 5
+TARGET_WORDS = 1200
+MIN_KEYWORD_MENTIONS = 3
+MAX_KEYWORD_DENSITY = 0.03
+
+HEADING = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+SHORTCODE_PRODUCT = re.compile(r'\{\{<\s*product\s+(?:id=)?"?([^"\s>]+)"?\s*>\}\}')
+PRODUCT_CARD = re.compile(r'class="product-card"')
+HTML_TAG = re.compile(r'<[^>]+>|\{\{<.*?>\}\}')
+WORD = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+FAQ_HEADING = re.compile(r'\bfaqs?\b|frequently asked', re.IGNORECASE)
+TOP_PICKS_HEADING = re.compile(r'top product recommendations', re.IGNORECASE)
+
+# Header fields post_keyword reads; everything else (the schema block) is left unparsed
+KEYWORD_FIELDS = ('keywords', 'tags', 'title')
+
+REPORT_COLUMNS = ['path', 'score', 'errors', 'warnings', 'words', 'characters', 'headings', 'paragraphs',
+                  'keyword', 'keyword_mentions', 'keyword_density', 'product_cards', 'issues']
+
+
+def post_keyword(metadata: Dict) -> str:
+    """Target keyword of a post: first `keywords` entry, else first tag, else the title."""
+    keywords = metadata.get('keywords')
+    if isinstance(keywords, str) and keywords.strip():
+        return keywords.split(',')[0].strip().lower()
+    if isinstance(keywords, list) and keywords:
+        return str(keywords[0]).strip().lower()
+    tags = metadata.get('tags')
+    if isinstance(tags, list) and tags:
+        return str(tags[0]).strip().lower()
+    return str(metadata.get('title', '')).split('—')[0].strip().lower()
+
+
+def analyze_markdown(body: str, keyword: str = '') -> Dict:
+    """Measure a Markdown body in one pass over its lines."""
+    words = 0
+    keyword_mentions = 0
+    headings = 0
+    h2_titles: List[str] = []
+    paragraphs = 0
+    in_paragraph = False
+    in_code = False
+    has_top_picks = False
+    has_faq = False
+    product_cards = 0
+    product_ids: List[str] = []
+
+    keyword_pattern = re.compile(r'\b' + r'\s+'.join(map(re.escape, keyword.split())) + r'\b') if keyword else None
+
+    for line in body.splitlines():
+        stripped = line.strip()
+
+        if stripped.startswith('```'):
+            in_code = not in_code
+            continue
+        if not stripped:
+            in_paragraph = False
+            continue
+        if not in_paragraph:
+            paragraphs += 1
+            in_paragraph = True
+        if in_code:
+            continue
+
+        heading = HEADING.match(stripped)
+        if heading:
+            headings += 1
+            title = heading.group(2)
+            if len(heading.group(1)) == 2:
+                h2_titles.append(title)
+            has_top_picks = has_top_picks or bool(TOP_PICKS_HEADING.search(title))
+            has_faq = has_faq or bool(FAQ_HEADING.search(title))
+            text = title
+        else:
+            if '{{<' in stripped:
+                product_ids.extend(SHORTCODE_PRODUCT.findall(stripped))
+            if 'product-card"' in stripped:
+                product_cards += len(PRODUCT_CARD.findall(stripped))
+            text = HTML_TAG.sub(' ', stripped) if '<' in stripped or '{{' in stripped else stripped
+
+        lowered = text.lower()
+        words += len(WORD.findall(lowered))
+        if keyword_pattern is not None:
+            keyword_mentions += len(keyword_pattern.findall(lowered))
+
+    keyword_words = len(keyword.split()) or 1
+    return {
+        'characters': len(body.strip()),
+        'words': words,
+        'headings': headings,
+        'h2': h2_titles,
+        'paragraphs': paragraphs,
+        'keyword': keyword,
+        'keyword_mentions': keyword_mentions,
+        'keyword_density': round(keyword_mentions * keyword_words / words, 4) if words else 0.0,
+        'has_top_picks': has_top_picks,
+        'has_faq': has_faq,
+        'product_cards': product_cards + len(product_ids),
+        'product_ids': product_ids,
+    }
+
+
+def audit_issues(analysis: Dict, product_ids: Optional[Set[str]] = None) -> List[Dict]:
+    """Turn an analysis into error/warning issues; product ids are checked against the catalog."""
+    issues = []
+
+    def flag(severity: str, message: str):
+        issues.append({'severity': severity, 'message': message})
+
+    if analysis['characters'] < MIN_CHARACTERS:
+        flag('error', f"Too short ({analysis['characters']} characters, minimum {MIN_CHARACTERS})")
+    if analysis['headings'] < MIN_HEADINGS:
+        flag('error', f"Too few headings ({analysis['headings']}, minimum {MIN_HEADINGS})")
+    if analysis['paragraphs'] < MIN_PARAGRAPHS:
+        flag('error', f"Too few paragraphs ({analysis['paragraphs']}, minimum {MIN_PARAGRAPHS})")
+    if not analysis['has_top_picks']:
+        flag('error', 'Missing "Top Product Recommendations" section')
+    if analysis['product_cards'] == 0:
+        flag('error', 'No product cards or product shortcodes')
+    if product_ids is not None:
+        for product_id in sorted(set(analysis['product_ids']) - product_ids):
+            flag('error', f"Unknown product id '{product_id}' in product shortcode")
+
+    if analysis['words'] < TARGET_WORDS:
+        flag('warning', f"Below target length ({analysis['words']} words, target {TARGET_WORDS})")
+    if not analysis['has_faq']:
+        flag('warning', 'Missing FAQ section')
+    if analysis['keyword']:
+        if analysis['keyword_mentions'] < MIN_KEYWORD_MENTIONS:
+            flag('warning', f"Keyword '{analysis['keyword']}' used {analysis['keyword_mentions']} times "
+                            f"(target {MIN_KEYWORD_MENTIONS}+)")
+        elif analysis['keyword_density'] > MAX_KEYWORD_DENSITY:
+            flag('warning', f"Keyword density {analysis['keyword_density']:.1%} looks stuffed")
+
+    return issues
+
+
+def analyze_post(path: str, raw: Optional[bytes] = None) -> Tuple[str, Dict]:
+    """Read (unless raw bytes are given), hash and analyze one post file (runs in a worker process)."""
+    from frontmatter_io import parse_header, split_frontmatter
+
+    if raw is None:
+        with open(path, 'rb') as f:
+            raw = f.read()
+    text = str(raw, 'utf-8', 'replace')
+    fmt, header, body = split_frontmatter(text)
+    metadata = parse_header(fmt, header, KEYWORD_FIELDS)
+    analysis = analyze_markdown(body, post_keyword(metadata))
+    analysis['title'] = str(metadata.get('title', ''))
+    analysis['hash'] = hashlib.sha256(raw).hexdigest()[:16]
+    return path, analysis
+
+
+def _analyze_batch(paths: List[str], archive=None) -> List[Tuple[str, Dict]]:
+    if archive is not None:
+        return [analyze_post(path, archive.read(path)) for path in paths]
+    return [analyze_post(path) for path in paths]
+
+
+def _analyze_archived_batch(args) -> List[Tuple[str, Dict]]:
+    """Analyze a batch from the corpus archive, mapped afresh in each worker process."""
+    from corpus_archive import CorpusArchive
+
+    paths, posts_dir, archive_path = args
+    with CorpusArchive(posts_dir, archive_path) as archive:
+        return _analyze_batch(paths, archive)
+
+
+def iter_post_files(posts_dir: str = POSTS_DIR) -> Iterator[Tuple[str, os.stat_result]]:
+    """Yield (path, stat) for page-bundle index.md files and loose .md posts."""
+    if not os.path.isdir(posts_dir):
+        return
+    with os.scandir(posts_dir) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                index_path = os.path.join(entry.path, 'index.md')
+                try:
+                    yield index_path, os.stat(index_path)
+                except FileNotFoundError:
+                    continue
+            elif entry.name.endswith('.md') and entry.name != '_index.md':
+                yield entry.path, entry.stat()
+
+
+def load_cache(cache_path: str = CACHE_PATH) -> Dict:
+    path = Path(cache_path)
+    if path.exists():
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+            if cache.get('version') == ANALYZER_VERSION:
+                return cache
+        except (json.JSONDecodeError, FileNotFoundError):
+            pass
+    return {'version': ANALYZER_VERSION, 'posts': {}}
+
+
+def save_cache(cache: Dict, cache_path: str = CACHE_PATH):
+    path = Path(cache_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def _score(errors: int, warnings: int) -> int:
+    return max(0, 100 - 20 * errors - 5 * warnings)
+
+
+def audit_posts(posts_dir: str = POSTS_DIR, cache_path: Optional[str] = CACHE_PATH,
+                product_ids: Optional[Set[str]] = None, full: bool = False,
+                workers: Optional[int] = None, archive=None) -> Dict:
+    """Audit every post, re-analyzing only files whose size/mtime (then content hash) changed.
+
+    With an open corpus archive (see corpus_archive.py) posts are listed and read from the
+    pack instead of the posts directory.
+    """
+    started = time.perf_counter()
+    cache = load_cache(cache_path) if cache_path and not full else {'version': ANALYZER_VERSION, 'posts': {}}
+    cached_posts = cache['posts']
+    current: Dict[str, Dict] = {}
+    stale: List[str] = []
+
+    files = archive.iter_post_files() if archive is not None else iter_post_files(posts_dir)
+    for path, stat in files:
+        cached = cached_posts.get(path)
+        if cached and cached['mtime_ns'] == stat.st_mtime_ns and cached['size'] == stat.st_size:
+            current[path] = cached
+        else:
+            current[path] = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+            stale.append(path)
+
+    if len(stale) >= PARALLEL_THRESHOLD:
+        from concurrent.futures import ProcessPoolExecutor
+        batches = [stale[i:i + BATCH_SIZE] for i in range(0, len(stale), BATCH_SIZE)]
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            if archive is not None:
+                batches = [(batch, archive.posts_dir, str(archive.pack_path)) for batch in batches]
+                results = [item for batch in pool.map(_analyze_archived_batch, batches) for item in batch]
+            else:
+                results = [item for batch in pool.map(_analyze_batch, batches) for item in batch]
+    else:
+        results = _analyze_batch(stale, archive)
+
+    reanalyzed = 0
+    for path, analysis in results:
+        cached = cached_posts.get(path)
+        # A touched but unchanged file keeps its cached analysis
+        if cached and cached['analysis']['hash'] == analysis['hash']:
+            analysis = cached['analysis']
+        else:
+            reanalyzed += 1
+        current[path]['analysis'] = analysis
+
+    if cache_path:
+        save_cache({'version': ANALYZER_VERSION, 'posts': current}, cache_path)
+
+    posts = []
+    for path, entry in current.items():
+        analysis = entry['analysis']
+        issues = audit_issues(analysis, product_ids)
+        errors = sum(1 for issue in issues if issue['severity'] == 'error')
+        warnings = len(issues) - errors
+        posts.append({
+            'path': path,
+            'title': analysis['title'],
+            'score': _score(errors, warnings),
+            'errors': errors,
+            'warnings': warnings,
+            **{key: analysis[key] for key in ('words', 'characters', 'headings', 'paragraphs', 'keyword',
+                                              'keyword_mentions', 'keyword_density', 'product_cards')},
+            'issues': issues,
+        })
+
+    return {
+        'posts': posts,
+        'audited': len(posts),
+        'reanalyzed': reanalyzed,
+        'cached': len(posts) - reanalyzed,
+        'failing': sum(1 for post in posts if post['errors']),
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def sort_posts(posts: List[Dict], key: str = 'score') -> List[Dict]:
+    """Sort worst first for score; largest first for other numeric columns."""
+    if key not in REPORT_COLUMNS or key == 'issues':
+        raise ValueError(f"Cannot sort by '{key}'")
+    if key in ('path', 'keyword'):
+        return sorted(posts, key=lambda post: post[key])
+    reverse = key not in ('score',)
+    return sorted(posts, key=lambda post: (post[key], post['path']), reverse=reverse)
+
+
+def generate_csv_report(posts: List[Dict], report_path: str = REPORT_PATH):
+    """Write one row per post with its metrics and issues."""
+    with open(report_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(REPORT_COLUMNS)
+        for post in posts:
+            writer.writerow([post[column] for column in REPORT_COLUMNS[:-1]] +
+                            ['; '.join(f"[{issue['severity']}] {issue['message']}" for issue in post['issues'])])
+
+
+def main():
+    """CLI interface for the content audit."""
+    import sys
+
+    args = sys.argv[1:]
+    sort_key = 'score'
+    if '--sort' in args:
+        index = args.index('--sort')
+        if index + 1 >= len(args):
+            print("--sort needs a column name")
+            return 2
+        sort_key = args[index + 1]
+        del args[index:index + 2]
+
+    unknown = [arg for arg in args if arg not in ('--json', '--full', '--csv', '--strict', '--archive')]
+    if unknown:
+        print("Usage: python content_audit.py [--sort COLUMN] [--full] [--csv] [--json] [--strict] [--archive]")
+        print(f"Columns: {', '.join(REPORT_COLUMNS[:-1])}")
+        return 2
+
+    from product_catalog import open_catalog
+    catalog = open_catalog()
+    product_ids = set(catalog)
+
+    archive = None
+    if '--archive' in args:
+        from corpus_archive import open_archive
+        archive = open_archive()
+    results = audit_posts(product_ids=product_ids, full='--full' in args, archive=archive)
+    try:
+        results['posts'] = sort_posts(results['posts'], sort_key)
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        return 2
+
+    if '--csv' in args:
+        generate_csv_report(results['posts'])
+
+    failed = results['failing'] > 0
+    if '--json' in args:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+        return 1 if failed and '--strict' in args else 0
+
+    print(f"\n[AUDIT] Audited {results['audited']} posts ({results['reanalyzed']} analyzed, "
+          f"{results['cached']} cached) in {results['elapsed_ms']:.0f} ms")
+    print(f"{'Score':>5} {'Err':>3} {'Warn':>4} {'Words':>6} {'Density':>7} {'Cards':>5}  Post")
+    for post in results['posts']:
+        path = Path(post['path'])
+        name = path.parent.name if path.name == 'index.md' else path.stem
+        print(f"{post['score']:>5} {post['errors']:>3} {post['warnings']:>4} {post['words']:>6} "
+              f"{post['keyword_density']:>7.2%} {post['product_cards']:>5}  {name}")
+        for issue in post['issues']:
+            if issue['severity'] == 'error':
+                print(f"{'':>30}- {issue['message']}")
+
+    print(f"\nPosts with errors: {results['failing']}")
+    if '--csv' in args:
+        print(f"Generated {REPORT_PATH}")
+
+    return 1 if failed and '--strict' in args else 0
+
+
+if __name__ == "__main__":
+    exit(main())
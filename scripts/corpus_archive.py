@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Packed Corpus Archive for SmartPetBuys
+Packs every post file into one append-only archive with an offset index, so corpus-wide scans
+become a single sequential, memory-mapped read instead of thousands of small file opens.
+"""
+
+import json
+import mmap
+import os
+import sys
+import time
+from collections import namedtuple
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from content_audit import POSTS_DIR, iter_post_files
+
+ARCHIVE_PATH = ".cache/corpus.pack"
+ARCHIVE_VERSION = 1
+
+# Rewrite the pack once superseded records take up more than this share of it
+COMPACT_RATIO = 0.5
+
+# What consumers get instead of os.stat_result: the fields their caches are keyed on
+ArchivedStat = namedtuple('ArchivedStat', 'st_mtime_ns st_size')
+
+
+class CorpusArchive:
+    """Post files packed into ARCHIVE_PATH, indexed by their path relative to the posts directory.
+
+    The pack only ever grows: changed posts are appended and the JSON index (written atomically
+    after the data) points at the newest copy. Paths are yielded exactly as iter_post_files()
+    yields them, so caches keyed on those paths work the same whichever source they read.
+    """
+
+    def __init__(self, posts_dir: str = POSTS_DIR, archive_path: str = ARCHIVE_PATH):
+        self.posts_dir = posts_dir
+        self.pack_path = Path(archive_path)
+        self.index_path = self.pack_path.with_suffix('.idx')
+        # rel path -> [offset, length, mtime_ns, size]
+        self.entries: Dict[str, List[int]] = {}
+        self.pack_size = 0
+        self._order: Optional[List[str]] = None
+        self._file = None
+        self._map = None
+
+    # Index
+
+    def _load_index(self) -> bool:
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if index.get('version') != ARCHIVE_VERSION:
+                return False
+            pack_size = self.pack_path.stat().st_size
+        except (OSError, json.JSONDecodeError):
+            return False
+        # A pack shorter than the index expects lost committed data; start over
+        if pack_size < index['pack_size']:
+            return False
+        self.entries, self.pack_size = index['entries'], index['pack_size']
+        self._order = None
+        return True
+
+    def _save_index(self):
+        tmp_path = self.index_path.with_suffix('.idx.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': ARCHIVE_VERSION, 'pack_size': self.pack_size, 'entries': self.entries},
+                      f, separators=(',', ':'))
+        os.replace(tmp_path, self.index_path)
+
+    def _key(self, path: str) -> str:
+        return os.path.relpath(path, self.posts_dir).replace(os.sep, '/')
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.posts_dir, *key.split('/'))
+
+    # Building
+
+    def refresh(self) -> Dict[str, int]:
+        """Append new and changed posts, drop deleted ones, and compact when mostly superseded."""
+        self.close()
+        self.pack_path.parent.mkdir(parents=True, exist_ok=True)
+        if not self._load_index():
+            self.entries, self.pack_size = {}, 0
+        changes = {'added': 0, 'updated': 0, 'removed': 0, 'compacted': 0}
+
+        seen = set()
+        stale: List[Tuple[str, str, os.stat_result]] = []
+        for path, stat in iter_post_files(self.posts_dir):
+            key = self._key(path)
+            seen.add(key)
+            entry = self.entries.get(key)
+            if entry and entry[2] == stat.st_mtime_ns and entry[3] == stat.st_size:
+                continue
+            stale.append((key, path, stat))
+
+        if stale:
+            with open(self.pack_path, 'ab') as pack:
+                # Drop anything a crashed run appended without committing it to the index
+                pack.truncate(self.pack_size)
+                pack.seek(self.pack_size)
+                for key, path, stat in stale:
+                    try:
+                        with open(path, 'rb') as f:
+                            data = f.read()
+                    except OSError:
+                        continue
+                    changes['updated' if key in self.entries else 'added'] += 1
+                    self.entries[key] = [self.pack_size, len(data), stat.st_mtime_ns, stat.st_size]
+                    pack.write(data)
+                    self.pack_size += len(data)
+
+        for key in [key for key in self.entries if key not in seen]:
+            del self.entries[key]
+            changes['removed'] += 1
+
+        live = sum(entry[1] for entry in self.entries.values())
+        if self.pack_size and self.pack_size - live > COMPACT_RATIO * self.pack_size:
+            self._compact()
+            changes['compacted'] = 1
+        if any(changes.values()) or not self.index_path.exists():
+            self._save_index()
+        self._order = None
+        return changes
+
+    def _compact(self):
+        """Rewrite the pack with only current records, in path order, and swap it in atomically."""
+        self.close()
+        tmp_path = self.pack_path.with_suffix('.pack.tmp')
+        offset = 0
+        # Mapped here rather than through open(), which reloads the on-disk index when no entries are left
+        with open(self.pack_path, 'rb') as pack, open(tmp_path, 'wb') as f:
+            with mmap.mmap(pack.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                for key in sorted(self.entries):
+                    entry = self.entries[key]
+                    f.write(data[entry[0]:entry[0] + entry[1]])
+                    entry[0] = offset
+                    offset += entry[1]
+        os.replace(tmp_path, self.pack_path)
+        self.pack_size = offset
+
+    # Reading
+
+    def open(self) -> "CorpusArchive":
+        """Memory-map the pack for reading (loading the index first if refresh() was not called)."""
+        if self._map is not None:
+            return self
+        if not self.entries and not self._load_index():
+            raise FileNotFoundError(f"No corpus archive at {self.pack_path}; run refresh() first")
+        self._file = open(self.pack_path, 'rb')
+        # Empty files cannot be mapped
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.pack_size else b''
+        return self
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        if self._file:
+            self._file.close()
+        self._file = self._map = None
+
+    def __enter__(self) -> "CorpusArchive":
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, path) -> bool:
+        return self._key(str(path)) in self.entries
+
+    def iter_post_files(self) -> Iterator[Tuple[str, ArchivedStat]]:
+        """(path, stat) for every archived post, in pack order so reads stay sequential."""
+        if self._order is None:
+            self._order = sorted(self.entries, key=lambda key: self.entries[key][0])
+        for key in self._order:
+            entry = self.entries[key]
+            yield self._path(key), ArchivedStat(entry[2], entry[3])
+
+    def read(self, path) -> memoryview:
+        """Raw bytes of a post as a zero-copy view into the mapped pack."""
+        self.open()
+        offset, length = self.entries[self._key(str(path))][:2]
+        return memoryview(self._map)[offset:offset + length]
+
+    def text(self, path) -> str:
+        """Decoded text of a post, as open(path, encoding='utf-8', errors='replace') would give."""
+        text = str(self.read(path), 'utf-8', 'replace')
+        # Universal newlines, as text-mode reads translate them
+        if '\r' in text:
+            text = text.replace('\r\n', '\n').replace('\r', '\n')
+        return text
+
+
+def open_archive(posts_dir: str = POSTS_DIR, archive_path: str = ARCHIVE_PATH) -> CorpusArchive:
+    """Bring the archive up to date with posts_dir and map it for reading."""
+    archive = CorpusArchive(posts_dir, archive_path)
+    archive.refresh()
+    return archive.open()
+
+
+def main():
+    """CLI interface for the corpus archive."""
+    args = sys.argv[1:]
+    if not args or args[0] not in ('build', 'refresh', 'stats', 'cat'):
+        print("Usage: python corpus_archive.py [build|refresh|stats|cat <path>]")
+        return 1
+    archive = CorpusArchive()
+
+    if args[0] in ('build', 'refresh'):
+        if args[0] == 'build':
+            for path in (archive.pack_path, archive.index_path):
+                if path.exists():
+                    path.unlink()
+        started = time.perf_counter()
+        changes = archive.refresh()
+        print(f"[SUCCESS] {len(archive)} posts in {archive.pack_path} ({archive.pack_size:,} bytes): "
+              f"{changes['added']} added, {changes['updated']} updated, {changes['removed']} removed"
+              f"{', compacted' if changes['compacted'] else ''} in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    elif args[0] == 'stats':
+        with archive:
+            live = sum(entry[1] for entry in archive.entries.values())
+            started = time.perf_counter()
+            scanned = sum(len(archive.read(path)) for path, _ in archive.iter_post_files())
+            elapsed = (time.perf_counter() - started) * 1000
+        print("\n[STATS] Corpus Archive:")
+        print(f"Posts: {len(archive)}")
+        print(f"Pack size: {archive.pack_size:,} bytes ({archive.pack_size - live:,} superseded)")
+        print(f"Sequential scan: {scanned:,} bytes in {elapsed:.1f} ms")
+
+    elif args[0] == 'cat' and len(args) == 2:
+        with archive:
+            if args[1] not in archive:
+                print(f"[ERROR] Not archived: {args[1]}")
+                return 1
+            sys.stdout.write(archive.text(args[1]))
+
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
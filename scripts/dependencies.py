@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+"""
+Lazy Dependency Loading for SmartPetBuys Scripts
+Heavy third-party packages are imported on first use so bookkeeping commands start fast.
+"""
+
+import importlib
+import logging
+from types import ModuleType
+
+logger = logging.getLogger(__name__)
+
+
+def require(module: str, package: str) -> ModuleType:
+    """Import a heavy dependency on first use, with install instructions when it is missing."""
+    try:
+        return importlib.import_module(module)
+    except ImportError as e:
+        print(f"❌ Missing required dependency: {e}")
+        print(f"Install with: pip install {package}")
+        raise
@@ -7,30 +7,91 @@ Prevents duplicate and similar content generation.
 import os
 import json
 import hashlib
+import heapq
 import logging
-import re
 from pathlib import Path
-from typing import Dict, List, Set, Tuple
-from difflib import SequenceMatcher
-import frontmatter
+from typing import Dict, List, Optional, Set, Tuple
+
+# difflib, PyYAML and the title/phrase indexes are imported on first use to keep CLI startup fast
+from frontmatter_io import load_post, parse_header, split_frontmatter
+from site_config import DEFAULT_SITE, SiteConfig
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Posts (by phrase overlap) that also get a full SequenceMatcher comparison in check_content_duplicate
+CONTENT_CONFIRM_TOP = 3
+
 
 class DuplicateChecker:
-    """Advanced duplicate content detection and prevention."""
+    """Advanced duplicate content detection and prevention.
+
+    Given a corpus archive (corpus_archive.CorpusArchive), posts are listed and read from the pack
+    instead of the posts directory.
+    """
     
-    def __init__(self, content_dir: str = "content/posts", tracker_path: str = "data/content_tracker.json"):
-        self.content_dir = Path(content_dir)
-        self.tracker_path = Path(tracker_path)
-        self.existing_posts = self._load_existing_posts()
+    def __init__(self, content_dir: Optional[str] = None, tracker_path: Optional[str] = None,
+                 site: SiteConfig = DEFAULT_SITE, archive=None):
+        self.content_dir = Path(content_dir) if content_dir else site.posts_path
+        self.tracker_path = Path(tracker_path) if tracker_path else site.tracker_path
+        self.site = site
+        self.archive = archive
+        # index.md path -> (mtime_ns, size, parsed post), so refreshes only re-parse changed files
+        self._post_cache: Dict[str, Tuple[int, int, Dict]] = {}
+        self._tracker_mtime = None
+        self._existing_posts: Optional[List[Dict]] = None
+        # title_index.TitleIndex and phrase_index.PhraseIndex, loaded on the first title/content check
+        self._title_index = None
+        self._phrase_index = None
         self.tracker_data = self._load_tracker()
     
+    @property
+    def existing_posts(self) -> List[Dict]:
+        """Parsed posts, loaded on first access."""
+        if self._existing_posts is None:
+            self._existing_posts = self._load_existing_posts()
+        return self._existing_posts
+    
+    @property
+    def title_index(self):
+        """Persistent trigram index over post titles, synced with the posts directory on first access."""
+        if self._title_index is None:
+            from title_index import CACHE_PATH as TITLE_INDEX_PATH, TitleIndex
+            self._title_index = TitleIndex(str(self.content_dir), str(self.site.path(TITLE_INDEX_PATH)),
+                                           archive=self.archive)
+            self._title_index.refresh()
+        return self._title_index
+    
+    @property
+    def phrase_index(self):
+        """Persistent phrase postings over post bodies, synced with the posts directory on first access."""
+        if self._phrase_index is None:
+            from phrase_index import CACHE_PATH as PHRASE_INDEX_PATH, PhraseIndex
+            self._phrase_index = PhraseIndex(str(self.content_dir), str(self.site.path(PHRASE_INDEX_PATH)),
+                                             archive=self.archive)
+            self._phrase_index.refresh()
+        return self._phrase_index
+    
+    def refresh(self):
+        """Pick up added, changed and deleted posts and tracker updates incrementally."""
+        if self.archive is not None:
+            self.archive.refresh()
+        self._existing_posts = self._load_existing_posts()
+        for index in (self._title_index, self._phrase_index):
+            if index is not None:
+                index.refresh()
+        try:
+            tracker_mtime = self.tracker_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            tracker_mtime = None
+        if tracker_mtime != self._tracker_mtime:
+            self.tracker_data = self._load_tracker()
+    
     def _load_tracker(self) -> Dict:
         """Load content tracker data."""
         if self.tracker_path.exists():
             try:
+                self._tracker_mtime = self.tracker_path.stat().st_mtime_ns
                 with open(self.tracker_path, 'r', encoding='utf-8') as f:
                     return json.load(f)
             except (json.JSONDecodeError, FileNotFoundError):
@@ -43,116 +104,110 @@ class DuplicateChecker:
         posts = []
         
         if not self.content_dir.exists():
+            self._post_cache = {}
             return posts
         
+        cache = {}
+        for key, stat in self._iter_bundles():
+            cached = self._post_cache.get(key)
+            if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+                cache[key] = cached
+                posts.append(cached[2])
+                continue
+            
+            try:
+                if self.archive is not None:
+                    fmt, header, body = split_frontmatter(self.archive.text(key))
+                    metadata = parse_header(fmt, header)
+                else:
+                    metadata, body = load_post(key)
+                body = body.strip()
+                entry = {
+                    'path': key,
+                    'title': metadata.get('title', ''),
+                    'content': body,
+                    'slug': metadata.get('slug', ''),
+                    'keywords': metadata.get('tags', []),
+                    'hash': hashlib.sha256(body.encode()).hexdigest()
+                }
+                cache[key] = (stat.st_mtime_ns, stat.st_size, entry)
+                posts.append(entry)
+            except Exception as e:
+                logger.warning(f"Could not load post {key}: {e}")
+        
+        self._post_cache = cache
+        return posts
+    
+    def _iter_bundles(self):
+        """(index.md path, stat) of every page bundle, from the archive when there is one."""
+        if self.archive is not None:
+            for path, stat in self.archive.iter_post_files():
+                if os.path.basename(path) == 'index.md':
+                    yield path, stat
+            return
         for post_dir in self.content_dir.iterdir():
             if post_dir.is_dir():
                 index_file = post_dir / "index.md"
-                if index_file.exists():
-                    try:
-                        with open(index_file, 'r', encoding='utf-8') as f:
-                            post = frontmatter.load(f)
-                            posts.append({
-                                'path': str(index_file),
-                                'title': post.metadata.get('title', ''),
-                                'content': post.content,
-                                'slug': post.metadata.get('slug', ''),
-                                'keywords': post.metadata.get('tags', []),
-                                'hash': hashlib.sha256(post.content.encode()).hexdigest()
-                            })
-                    except Exception as e:
-                        logger.warning(f"Could not load post {index_file}: {e}")
-        
-        return posts
+                try:
+                    yield str(index_file), index_file.stat()
+                except FileNotFoundError:
+                    continue
     
     def _normalize_text(self, text: str) -> str:
-        """Normalize text for comparison."""
-        # Convert to lowercase
-        text = text.lower()
-        
-        # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text)
-        
-        # Remove markdown formatting
-        text = re.sub(r'[#*`_\[\]()]', '', text)
-        
-        # Remove common stop words and filler
-        stop_words = {'the', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'from', 'as', 'is', 'are', 'was', 'were', 'be', 'been', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'should', 'could', 'can', 'may', 'might', 'must', 'shall', 'a', 'an'}
-        
-        words = text.split()
-        words = [w for w in words if w not in stop_words and len(w) > 2]
-        
-        return ' '.join(words)
+        """Normalize text for comparison (lowercase, no Markdown, no stop words)."""
+        from title_index import normalize_text
+        return normalize_text(text)
     
     def _calculate_similarity(self, text1: str, text2: str) -> float:
         """Calculate similarity between two texts."""
         norm1 = self._normalize_text(text1)
         norm2 = self._normalize_text(text2)
         
+        from difflib import SequenceMatcher
         return SequenceMatcher(None, norm1, norm2).ratio()
     
     def _extract_key_phrases(self, text: str) -> Set[str]:
-        """Extract key phrases from text."""
-        # Normalize text
-        norm_text = self._normalize_text(text)
-        words = norm_text.split()
-        
-        # Extract 2-3 word phrases
-        phrases = set()
-        for i in range(len(words) - 1):
-            # 2-word phrases
-            phrase = f"{words[i]} {words[i+1]}"
-            if len(phrase) > 6:  # Skip very short phrases
-                phrases.add(phrase)
-            
-            # 3-word phrases
-            if i < len(words) - 2:
-                phrase = f"{words[i]} {words[i+1]} {words[i+2]}"
-                if len(phrase) > 10:
-                    phrases.add(phrase)
-        
-        return phrases
+        """Extract key phrases (normalized 2-3 word sequences) from text."""
+        from phrase_index import extract_phrases
+        return extract_phrases(text)
     
     def check_title_duplicate(self, title: str) -> Tuple[bool, str]:
         """Check if title is duplicate or too similar."""
-        norm_title = self._normalize_text(title)
-        
-        for post in self.existing_posts:
-            norm_existing = self._normalize_text(post['title'])
-            
-            # Exact match
-            if norm_title == norm_existing:
-                return True, f"Exact title match: {post['title']}"
-            
-            # High similarity
-            similarity = self._calculate_similarity(title, post['title'])
-            if similarity > 0.85:
-                return True, f"High similarity ({similarity:.2%}) with: {post['title']}"
-        
-        return False, ""
+        # Trigram candidates above the Jaccard floor, each confirmed with SequenceMatcher
+        match = self.title_index.find_duplicate(title, threshold=0.85)
+        if match is None:
+            return False, ""
+        
+        similarity, _, existing_title = match
+        if similarity == 1.0:
+            return True, f"Exact title match: {existing_title}"
+        return True, f"High similarity ({similarity:.2%}) with: {existing_title}"
+    
+    def search_titles(self, text: str, limit: int = 10) -> List[Tuple[float, str, str]]:
+        """Existing titles most similar to text: [(trigram Jaccard, path, title)]."""
+        from title_index import SEARCH_BUDGET, SEARCH_JACCARD
+        return self.title_index.search(text, limit=limit, min_jaccard=SEARCH_JACCARD, budget=SEARCH_BUDGET)
     
     def check_content_duplicate(self, content: str, similarity_threshold: float = 0.7) -> Tuple[bool, str]:
         """Check if content is duplicate or too similar."""
-        content_phrases = self._extract_key_phrases(content)
-        
-        for post in self.existing_posts:
-            # Skip empty content
-            if not post['content'].strip():
-                continue
-            
-            # Check overall similarity
-            similarity = self._calculate_similarity(content, post['content'])
-            if similarity > similarity_threshold:
-                return True, f"High content similarity ({similarity:.2%}) with post: {post['title']}"
+        from phrase_index import read_post
+        
+        # One pass over the draft's phrases against the corpus postings; template boilerplate is ignored
+        matches = self.phrase_index.overlaps(self._extract_key_phrases(content))
+        
+        for rank, (overlap_ratio, overlap, path, title) in enumerate(matches):
+            # Full-text similarity is only worth computing for the closest candidates
+            if rank < CONTENT_CONFIRM_TOP:
+                try:
+                    _, body = read_post(path, self.archive.text(path) if self.archive is not None else None)
+                except (OSError, KeyError):
+                    body = ''
+                similarity = self._calculate_similarity(content, body) if body.strip() else 0.0
+                if similarity > similarity_threshold:
+                    return True, f"High content similarity ({similarity:.2%}) with post: {title}"
             
-            # Check phrase overlap
-            post_phrases = self._extract_key_phrases(post['content'])
-            if content_phrases and post_phrases:
-                overlap = len(content_phrases & post_phrases)
-                overlap_ratio = overlap / min(len(content_phrases), len(post_phrases))
-                
-                if overlap_ratio > 0.5 and overlap > 10:
-                    return True, f"High phrase overlap ({overlap_ratio:.2%}, {overlap} phrases) with: {post['title']}"
+            if overlap_ratio > 0.5 and overlap > 10:
+                return True, f"High phrase overlap ({overlap_ratio:.2%}, {overlap} phrases) with: {title}"
         
         return False, ""
     
@@ -218,33 +273,22 @@ class DuplicateChecker:
         return similar_posts
     
     def get_duplicate_stats(self) -> Dict:
-        """Get statistics about duplicate prevention."""
-        stats = {
-            'total_posts': len(self.existing_posts),
-            'unique_hashes': len(set(post['hash'] for post in self.existing_posts)),
-            'duplicate_hashes': 0,
-            'keyword_usage': {},
-            'most_used_keywords': []
+        """Get statistics about duplicate prevention.
+        
+        Read from the tracker's rollups (content hash counts and posts per keyword), so the cost does
+        not grow with the number of posts.
+        """
+        from tracker_rollups import TrackerRollups
+        rollups = TrackerRollups.load(self.tracker_data).data
+        
+        keyword_usage = dict(rollups['by_keyword'])
+        return {
+            'total_posts': rollups['posts'],
+            'unique_hashes': len(rollups['hashes']),
+            'duplicate_hashes': len(rollups['collisions']),
+            'keyword_usage': keyword_usage,
+            'most_used_keywords': heapq.nlargest(10, keyword_usage.items(), key=lambda item: item[1]),
         }
-        
-        # Count duplicate hashes
-        hash_counts = {}
-        for post in self.existing_posts:
-            hash_counts[post['hash']] = hash_counts.get(post['hash'], 0) + 1
-        
-        stats['duplicate_hashes'] = sum(1 for count in hash_counts.values() if count > 1)
-        
-        # Keyword usage from tracker
-        keyword_data = self.tracker_data.get('keywords', {})
-        for keyword, data in keyword_data.items():
-            usage_count = data.get('usage_count', 0)
-            stats['keyword_usage'][keyword] = usage_count
-        
-        # Most used keywords
-        sorted_keywords = sorted(stats['keyword_usage'].items(), key=lambda x: x[1], reverse=True)
-        stats['most_used_keywords'] = sorted_keywords[:10]
-        
-        return stats
     
     def cleanup_duplicates(self, dry_run: bool = True) -> List[str]:
         """Find and optionally remove duplicate posts."""
@@ -281,10 +325,16 @@ def main():
     """CLI interface for duplicate checking."""
     import sys
     
-    checker = DuplicateChecker()
+    archive = None
+    if '--archive' in sys.argv:
+        from corpus_archive import open_archive
+        sys.argv.remove('--archive')
+        archive = open_archive()
+    checker = DuplicateChecker(archive=archive)
     
     if len(sys.argv) < 2:
-        print("Usage: python duplicate_checker.py [stats|cleanup|check <keyword> <title> <content>]")
+        print("Usage: python duplicate_checker.py [stats|cleanup|check <keyword> <title> <content>|"
+              "titles --like <text> [--limit N]|phrases] [--archive]")
         return 1
     
     command = sys.argv[1]
@@ -324,6 +374,24 @@ def main():
         else:
             print("[SUCCESS] Content appears to be unique")
     
+    elif command == 'titles' and '--like' in sys.argv[2:-1]:
+        text = sys.argv[sys.argv.index('--like') + 1]
+        limit = 10
+        if '--limit' in sys.argv[2:-1]:
+            limit = int(sys.argv[sys.argv.index('--limit') + 1])
+        
+        matches = checker.search_titles(text, limit=limit)
+        print(f"\n[TITLES] {len(matches)} titles like \"{text}\" ({len(checker.title_index)} indexed):")
+        for jaccard, path, title in matches:
+            print(f"  {jaccard:.2f}  {title}  ({path})")
+    
+    elif command == 'phrases':
+        index = checker.phrase_index
+        print(f"\n[PHRASES] {len(index)} posts indexed; phrases in more than {index.df_cutoff()} posts "
+              f"are treated as boilerplate:")
+        for phrase, frequency in index.boilerplate():
+            print(f"  {frequency:>5}  {phrase}")
+    
     else:
         print("Invalid command or arguments")
         return 1
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Duplicate Risk Prediction for SmartPetBuys
+Estimates, before any OpenAI call, how likely a keyword is to produce a near-duplicate of an existing post.
+"""
+
+import json
+import os
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Set
+
+from content_audit import KEYWORD_FIELDS, POSTS_DIR, SHORTCODE_PRODUCT, iter_post_files, post_keyword
+from frontmatter_io import parse_header, split_frontmatter
+from title_index import MARKDOWN, STOP_WORDS
+
+CACHE_PATH = ".cache/duplicate_risk.json"
+CACHE_VERSION = 1
+
+# Keywords at or above SKIP_RISK are not sent to the API; those above DEPRIORITIZE_RISK lose rank
+SKIP_RISK = 0.75
+DEPRIORITIZE_RISK = 0.4
+
+# Similarity to the closest post blends keyword/title token overlap with top-5 product overlap
+TOKEN_WEIGHT = 0.7
+PRODUCT_WEIGHT = 0.3
+# Each prior post for the keyword (out of max_posts) and each discarded generation adds history risk
+USAGE_WEIGHT = 0.5
+REJECTION_WEIGHT = 0.25
+
+AFFILIATE_LINK = re.compile(r'href="(https?://[^"]+)"')
+# Words every title carries (branding, buying-guide boilerplate) say nothing about the topic
+NOISE_TOKENS = {'smartpetbuys', 'best', 'top', 'review', 'reviews', 'guide', 'complete', '—'}
+
+
+@lru_cache(maxsize=65536)
+def _topic_word(word: str) -> str:
+    """Topic form of one lowercased word ('' for stop words, noise and punctuation)."""
+    word = MARKDOWN.sub('', word)
+    if word in STOP_WORDS or len(word) <= 2:
+        return ''
+    word = word.strip('.,:;!?"\'')
+    if word in NOISE_TOKENS:
+        return ''
+    if word.endswith('ies') and len(word) > 4:
+        return word[:-3] + 'y'
+    if word.endswith(('ches', 'shes', 'sses', 'xes', 'zes')):
+        return word[:-2]
+    if word.endswith('s') and not word.endswith('ss') and len(word) > 3:
+        return word[:-1]
+    return word
+
+
+def topic_tokens(text: str) -> Set[str]:
+    """Normalized, crudely singularized topic words of a keyword or title."""
+    tokens = {_topic_word(word) for word in text.lower().split()}
+    tokens.discard('')
+    return tokens
+
+
+def post_features(path: str) -> Dict:
+    """Topic tokens and featured products (shortcode ids and affiliate URLs) of one post."""
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        text = f.read()
+    fmt, header, body = split_frontmatter(text)
+    metadata = parse_header(fmt, header, KEYWORD_FIELDS)
+    title = str(metadata.get('title', '') or '')
+    products = set(SHORTCODE_PRODUCT.findall(body)) | set(AFFILIATE_LINK.findall(body))
+    return {
+        'title': title,
+        'tokens': sorted(topic_tokens(f"{post_keyword(metadata)} {title}")),
+        'products': sorted(products),
+    }
+
+
+class DuplicateRiskPredictor:
+    """Scores keywords against per-post topic tokens, featured products and tracker history."""
+
+    def __init__(self, posts_dir: str = POSTS_DIR, cache_path: Optional[str] = CACHE_PATH,
+                 max_posts: int = 3):
+        self.posts_dir = posts_dir
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.max_posts = max_posts
+        self.posts: Dict[str, Dict] = {}
+        self._by_token: Dict[str, Set[str]] = {}
+        self._by_product: Dict[str, Set[str]] = {}
+
+    def _load_cache(self) -> Dict:
+        if self.cache_path and self.cache_path.exists():
+            try:
+                with open(self.cache_path, 'r', encoding='utf-8') as f:
+                    cache = json.load(f)
+                if cache.get('version') == CACHE_VERSION:
+                    return cache['posts']
+            except (json.JSONDecodeError, KeyError):
+                pass
+        return {}
+
+    def _save_cache(self):
+        if not self.cache_path:
+            return
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': CACHE_VERSION, 'posts': self.posts}, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.cache_path)
+
+    def refresh(self) -> int:
+        """Sync post features with the posts directory; returns how many posts were (re)read."""
+        cached = self.posts or self._load_cache()
+        posts = {}
+        changed = 0
+        for path, stat in iter_post_files(self.posts_dir):
+            key = Path(path).as_posix()
+            entry = cached.get(key)
+            if entry and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+                posts[key] = entry
+                continue
+            try:
+                posts[key] = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, **post_features(path)}
+            except OSError:
+                continue
+            changed += 1
+
+        removed = len(set(cached) - set(posts))
+        self.posts = posts
+        self._by_token, self._by_product = {}, {}
+        for key, entry in posts.items():
+            for token in entry['tokens']:
+                self._by_token.setdefault(token, set()).add(key)
+            for product in entry['products']:
+                self._by_product.setdefault(product, set()).add(key)
+        if changed or removed:
+            self._save_cache()
+        return changed
+
+    def predict(self, keyword: str, products: Iterable = (), history: Optional[Dict] = None) -> Dict:
+        """Estimate the chance that generating for keyword yields a near-duplicate.
+
+        products are the Product records that would be featured; history is the tracker's entry
+        for the keyword (usage_count, rejected).
+        """
+        tokens = topic_tokens(keyword)
+        selected = [(product.id, product.url) for product in products]
+
+        candidates = set()
+        for token in tokens:
+            candidates |= self._by_token.get(token, set())
+        for product_id, url in selected:
+            candidates |= self._by_product.get(product_id, set()) | self._by_product.get(url, set())
+
+        best = {'similarity': 0.0, 'token_overlap': 0.0, 'product_overlap': 0.0, 'post': None}
+        for key in candidates:
+            entry = self.posts[key]
+            post_tokens = set(entry['tokens'])
+            union = tokens | post_tokens
+            token_overlap = len(tokens & post_tokens) / len(union) if union else 0.0
+            featured = set(entry['products'])
+            product_overlap = (sum(1 for product_id, url in selected if product_id in featured or url in featured)
+                               / len(selected)) if selected else 0.0
+            similarity = TOKEN_WEIGHT * token_overlap + PRODUCT_WEIGHT * product_overlap
+            if similarity > best['similarity']:
+                best = {'similarity': similarity, 'token_overlap': token_overlap,
+                        'product_overlap': product_overlap, 'post': entry['title'] or key}
+
+        history = history or {}
+        history_risk = min(1.0, USAGE_WEIGHT * history.get('usage_count', 0) / self.max_posts
+                           + REJECTION_WEIGHT * history.get('rejected', 0))
+        risk = 1 - (1 - best['similarity']) * (1 - history_risk)
+        return {
+            'keyword': keyword,
+            'risk': round(risk, 3),
+            'similarity': round(best['similarity'], 3),
+            'token_overlap': round(best['token_overlap'], 3),
+            'product_overlap': round(best['product_overlap'], 3),
+            'history_risk': round(history_risk, 3),
+            'closest_post': best['post'],
+            'action': 'skip' if risk >= SKIP_RISK else 'deprioritize' if risk >= DEPRIORITIZE_RISK else 'generate',
+        }
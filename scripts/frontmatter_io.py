@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Frontmatter Reader/Writer for SmartPetBuys
+Parses YAML (---) and TOML (+++) post headers with libyaml when available, reads only the header when
+just metadata is needed, and streams new posts to disk in the layout python-frontmatter produced.
+"""
+
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+from dependencies import require
+
+FENCES = {'---': 'yaml', '+++': 'toml'}
+
+_yaml = None
+
+
+def _yaml_codec():
+    """(yaml module, loader, dumper), preferring the libyaml C bindings over the pure-Python ones."""
+    global _yaml
+    if _yaml is None:
+        yaml = require('yaml', 'pyyaml')
+        _yaml = (yaml, getattr(yaml, 'CSafeLoader', yaml.SafeLoader), getattr(yaml, 'CSafeDumper', yaml.SafeDumper))
+    return _yaml
+
+
+def split_frontmatter(text: str) -> Tuple[Optional[str], str, str]:
+    """Split a post into (format, header, body); format is 'yaml', 'toml' or None."""
+    for fence, fmt in FENCES.items():
+        if text.startswith(fence + '\n') or text.startswith(fence + '\r\n'):
+            end = text.find('\n' + fence, len(fence))
+            if end != -1:
+                body_start = text.find('\n', end + 1)
+                body = text[body_start + 1:] if body_start != -1 else ''
+                return fmt, text[len(fence) + 1:end + 1], body
+    return None, '', text
+
+
+def _select_blocks(header: str, fields: Iterable[str], separator: str) -> Tuple[str, set]:
+    """Top-level `key<separator>` entries of a header (with their continuation lines) named in fields.
+
+    Returns the reduced header and the keys found, so unrequested blocks such as the nested schema
+    are never handed to the parser.
+    """
+    wanted = set(fields)
+    kept, found = [], set()
+    keep = False
+    for line in header.splitlines(keepends=True):
+        if line[:1] not in (' ', '\t', '-', '#', '\r', '\n'):
+            if separator == '=' and line.startswith('['):
+                break  # TOML tables follow every top-level key
+            key = line.split(separator, 1)[0].strip().strip('"\'')
+            keep = key in wanted
+            if keep:
+                found.add(key)
+        if keep:
+            kept.append(line)
+    return ''.join(kept), found
+
+
+def parse_header(fmt: Optional[str], header: str, fields: Optional[Iterable[str]] = None) -> Dict:
+    """Parse frontmatter into a dict, tolerating malformed headers.
+
+    With fields, only those top-level keys are parsed (falling back to a full parse if the header
+    is laid out in a way the block scan cannot follow).
+    """
+    if fields is not None:
+        fields = set(fields)
+        subset, found = _select_blocks(header, fields, ':' if fmt == 'yaml' else '=')
+        data = parse_header(fmt, subset) if found else {}
+        if set(data) == found and (fmt != 'toml' or found == fields or '\n[' not in header):
+            return data
+        return {key: value for key, value in parse_header(fmt, header).items() if key in fields}
+
+    if fmt == 'yaml':
+        yaml, loader, _ = _yaml_codec()
+        try:
+            data = yaml.load(header, Loader=loader)
+        except yaml.YAMLError:
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    if fmt == 'toml':
+        try:
+            import tomllib
+            return tomllib.loads(header)
+        except ImportError:
+            pass
+        except ValueError:
+            return {}
+        # Python < 3.11: our TOML headers are flat `key = value` lines with JSON-compatible values
+        data = {}
+        for line in header.splitlines():
+            key, sep, value = line.partition('=')
+            if sep:
+                try:
+                    data[key.strip()] = json.loads(value.strip())
+                except json.JSONDecodeError:
+                    data[key.strip()] = value.strip().strip('"')
+        return data
+
+    return {}
+
+
+def read_header(path, fields: Optional[Iterable[str]] = None) -> Dict:
+    """Metadata of a post, reading the file only up to the closing fence."""
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        fence = f.readline().rstrip('\r\n')
+        fmt = FENCES.get(fence)
+        if fmt is None:
+            return {}
+        lines = []
+        for line in f:
+            if line.rstrip('\r\n') == fence:
+                return parse_header(fmt, ''.join(lines), fields)
+            lines.append(line)
+    return {}  # unterminated header
+
+
+def load_post(path) -> Tuple[Dict, str]:
+    """(metadata, body) of a post file."""
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        text = f.read()
+    fmt, header, body = split_frontmatter(text)
+    return parse_header(fmt, header), body
+
+
+def dumps(metadata: Dict, body: str) -> str:
+    """Serialize a post exactly as frontmatter.dumps(frontmatter.Post(body, **metadata)) did."""
+    yaml, _, dumper = _yaml_codec()
+    header = yaml.dump(metadata, Dumper=dumper, default_flow_style=False, allow_unicode=True).strip()
+    return f"---\n{header}\n---\n\n{body.strip()}"
+
+
+def write_post(path, metadata: Dict, body: str):
+    """Stream a post to disk (header straight from the YAML emitter, then the body) and swap it in atomically."""
+    yaml, _, dumper = _yaml_codec()
+    path = Path(path)
+    tmp_path = path.with_suffix(path.suffix + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write('---\n')
+        yaml.dump(metadata, f, Dumper=dumper, default_flow_style=False, allow_unicode=True)
+        f.write('---\n\n')
+        f.write(body.strip())
+    os.replace(tmp_path, path)
+
+
+def main():
+    """Scan every post's metadata (optionally just some fields) and report timing."""
+    from content_audit import POSTS_DIR, iter_post_files
+
+    args = sys.argv[1:]
+    if not args or args[0] != 'scan':
+        print("Usage: python frontmatter_io.py scan [--fields title,slug,tags] [--posts DIR] [--json]")
+        sys.exit(1)
+    fields = args[args.index('--fields') + 1].split(',') if '--fields' in args else None
+    posts_dir = args[args.index('--posts') + 1] if '--posts' in args else POSTS_DIR
+
+    started = time.perf_counter()
+    headers = {Path(path).as_posix(): read_header(path, fields) for path, _ in iter_post_files(posts_dir)}
+    elapsed = time.perf_counter() - started
+
+    if '--json' in args:
+        print(json.dumps(headers, indent=2, ensure_ascii=False, default=str))
+    codec = _yaml_codec()[1].__name__ if _yaml else 'n/a'
+    print(f"[SCAN] {len(headers)} headers in {elapsed * 1000:.1f} ms (YAML loader: {codec})", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,18 +10,21 @@ import json
 import hashlib
 import logging
 import re
+import threading
 import time
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import TYPE_CHECKING, Dict, List, Mapping, Optional, Tuple
 
-try:
-    import frontmatter
-    import openai
-except ImportError as e:
-    print(f"❌ Missing required dependency: {e}")
-    print("Install with: pip install openai frontmatter")
-    exit(1)
+# openai and PyYAML (via frontmatter_io) are imported on first use (see dependencies.require), and so are
+# the catalog, request controller, ledger, audit and rollup modules: benchmark_imports.py budgets startup
+from dependencies import require
+from site_config import DEFAULT_SITE, SiteConfig, shared_catalog
+
+if TYPE_CHECKING:
+    from product_catalog import Product
+    from request_controller import RequestController
+    from tracker_rollups import TrackerRollups
 
 # Configure logging
 logging.basicConfig(
@@ -30,19 +33,49 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Keywords scored for duplicate risk per selection (each needs a product lookup)
+RISK_CANDIDATES = 20
+
+
+def normalize_post_path(path: str) -> str:
+    """Normalize a tracked post path to the repo-relative POSIX form (Windows runs stored backslashes)."""
+    return Path(str(path).replace('\\', '/')).as_posix()
+
+
 class ContentTracker:
     """Manages content tracking database for duplicate prevention and analytics."""
     
-    def __init__(self, tracker_path: str = "data/content_tracker.json"):
-        self.tracker_path = Path(tracker_path)
+    def __init__(self, tracker_path: Optional[str] = None, site: SiteConfig = DEFAULT_SITE):
+        self.site = site
+        self.tracker_path = Path(tracker_path) if tracker_path else site.tracker_path
+        self._mtime_ns = None
+        self.data = self._load_tracker()
+    
+    def _file_mtime(self) -> Optional[int]:
+        try:
+            return self.tracker_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+    
+    def refresh(self) -> bool:
+        """Reload tracker data if another process changed the file."""
+        if self._file_mtime() == self._mtime_ns:
+            return False
         self.data = self._load_tracker()
+        return True
     
     def _load_tracker(self) -> Dict:
         """Load existing tracker data or create new."""
+        from tracker_rollups import TrackerRollups
+        
         if self.tracker_path.exists():
             try:
+                self._mtime_ns = self._file_mtime()
                 with open(self.tracker_path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                    data = json.load(f)
+                # Rollups written by an older version, or edited around, are rebuilt once here
+                data["rollups"] = TrackerRollups.load(data).data
+                return data
             except (json.JSONDecodeError, FileNotFoundError):
                 logger.warning("Could not load content tracker, creating new one")
         
@@ -52,29 +85,58 @@ class ContentTracker:
             "metadata": {
                 "created": datetime.now(timezone.utc).isoformat(),
                 "last_updated": datetime.now(timezone.utc).isoformat()
-            }
+            },
+            "rollups": TrackerRollups().data
         }
     
+    @property
+    def rollups(self) -> "TrackerRollups":
+        """Analytics rollups (counts by keyword, category, day and week; last use; hash collisions)."""
+        from tracker_rollups import TrackerRollups
+        return TrackerRollups(self.data["rollups"])
+    
     def _save_tracker(self):
         """Save tracker data to file."""
         self.tracker_path.parent.mkdir(exist_ok=True)
-        self.data["metadata"]["last_updated"] = datetime.now(timezone.utc).isoformat()
+        self.data.setdefault("metadata", {})["last_updated"] = datetime.now(timezone.utc).isoformat()
         
-        with open(self.tracker_path, 'w', encoding='utf-8') as f:
+        # Write to a temp file and swap it in so readers never see a half-written tracker
+        tmp_path = self.tracker_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
             json.dump(self.data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.tracker_path)
+        self._mtime_ns = self._file_mtime()
+    
+    def save(self):
+        """Persist in-memory changes made directly to tracker data (rebuilding the rollups from its posts)."""
+        from tracker_rollups import TrackerRollups
+        self.data["rollups"] = TrackerRollups.build(self.data.get("posts", {}).values()).data
+        self._save_tracker()
     
-    def add_post(self, keyword: str, title: str, content_hash: str, file_path: str):
+    def add_post(self, keyword: str, title: str, content_hash: str, file_path: str,
+                 category: Optional[str] = None):
         """Track a new post."""
         post_id = hashlib.sha256(f"{keyword}_{title}".encode()).hexdigest()[:12]
+        replaced = post_id in self.data["posts"]
         
-        self.data["posts"][post_id] = {
+        post = {
             "keyword": keyword,
             "title": title,
             "content_hash": content_hash,
-            "file_path": file_path,
+            "file_path": normalize_post_path(self.site.relative(file_path)),
             "created": datetime.now(timezone.utc).isoformat(),
             "status": "published"
         }
+        if category:
+            post["category"] = category
+        self.data["posts"][post_id] = post
+        
+        # Count the post in the rollups; overwriting an existing post means recounting from scratch
+        if replaced:
+            from tracker_rollups import TrackerRollups
+            self.data["rollups"] = TrackerRollups.build(self.data["posts"].values()).data
+        else:
+            self.rollups.add(post)
         
         # Update keyword tracking
         if keyword not in self.data["keywords"]:
@@ -91,6 +153,12 @@ class ContentTracker:
         self._save_tracker()
         return post_id
     
+    def record_rejection(self, keyword: str):
+        """Count a generation discarded as a near-duplicate (feeds duplicate-risk prediction)."""
+        entry = self.data["keywords"].setdefault(keyword, {"usage_count": 0, "last_used": None, "posts": []})
+        entry["rejected"] = entry.get("rejected", 0) + 1
+        self._save_tracker()
+    
     def is_duplicate(self, keyword: str, title: str) -> bool:
         """Check if content would be duplicate."""
         # Check exact title matches
@@ -110,49 +178,108 @@ class ContentTracker:
         return self.data["keywords"].get(keyword, {}).get("usage_count", 0)
 
 
+_clients: Dict[Optional[str], object] = {}
+_clients_lock = threading.Lock()
+
+
+def shared_client(api_key: Optional[str]):
+    """One OpenAI client (and HTTP connection pool) per API key, shared by every site in the process."""
+    with _clients_lock:
+        if api_key not in _clients:
+            openai = require('openai', 'openai')
+            # Retries are owned by the request controller, not the SDK
+            _clients[api_key] = openai.OpenAI(api_key=api_key, max_retries=0)
+        return _clients[api_key]
+
+
 class SmartPetBuysGenerator:
     """AI-powered content generator for SmartPetBuys."""
     
-    def __init__(self):
-        self.client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-        self.content_tracker = ContentTracker()
+    def __init__(self, site: SiteConfig = DEFAULT_SITE):
+        from llm_ledger import LEDGER_PATH
+        
+        self.site = site
+        self._client = None
+        # Shared per process unless a caller injects its own (e.g. tests against a stub server)
+        self.request_controller: Optional["RequestController"] = None
+        self.ledger_path: Optional[str] = str(site.path(LEDGER_PATH))
+        # related_posts.RelatedIndex, loaded when the first post is written
+        self.related_index = None
+        # duplicate_risk.DuplicateRiskPredictor, loaded on the first keyword scored
+        self.duplicate_risk = None
+        self.content_tracker = ContentTracker(site=site)
         self.products = self._load_products()
-        
-    def _load_products(self) -> Dict:
-        """Load products database."""
-        products_path = Path("data/products.json")
-        if products_path.exists():
-            with open(products_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return {}
+        # Resident callers (generation_worker.py) supply a preloaded post corpus here
+        self.existing_posts: Optional[List[Dict]] = None
+        self.last_post_path: Optional[Path] = None
+        self._keywords_cache: Optional[Tuple[int, List[Dict]]] = None
+        # keyword -> canonical keyword of its cluster (keywords.csv `cluster` column), for every row
+        self._keyword_clusters: Dict[str, str] = {}
+        
+    @property
+    def client(self):
+        """OpenAI client, created on first API call."""
+        if self._client is None:
+            self._client = shared_client(os.getenv('OPENAI_API_KEY'))
+        return self._client
+    
+    def _load_products(self) -> Mapping[str, "Product"]:
+        """Load products database (lazily when an indexed catalog exists), shared with other sites."""
+        return shared_catalog(self.site)
     
     def _load_keywords(self) -> List[Dict]:
-        """Load and parse keywords.csv."""
+        """Load and parse keywords.csv (cached until the file changes)."""
         keywords = []
-        keywords_path = Path("keywords.csv")
+        keywords_path = self.site.keywords_path
         
         if not keywords_path.exists():
-            logger.error("keywords.csv not found")
+            logger.error(f"{keywords_path} not found")
             return keywords
         
+        mtime_ns = keywords_path.stat().st_mtime_ns
+        if self._keywords_cache and self._keywords_cache[0] == mtime_ns:
+            return list(self._keywords_cache[1])
+        
+        clusters = {}
         with open(keywords_path, 'r', encoding='utf-8') as f:
             reader = csv.DictReader(f)
             for row in reader:
+                keyword = row['keyword'].strip()
+                clusters[keyword] = (row.get('cluster') or '').strip() or keyword
                 if row.get('publish', '').lower() == 'yes':
                     keywords.append({
-                        'keyword': row['keyword'].strip(),
+                        'keyword': keyword,
                         'priority': row.get('priority', 'medium').strip(),
-                        'estimated_volume': int(row.get('estimated_volume', 0))
+                        'estimated_volume': int(row.get('estimated_volume', 0)),
+                        'cluster': clusters[keyword],
                     })
         
-        return keywords
+        self._keywords_cache = (mtime_ns, keywords)
+        self._keyword_clusters = clusters
+        return list(keywords)
+    
+    def _predict_duplicate_risk(self, keyword: str, products: List["Product"]) -> Dict:
+        """Pre-flight estimate of how likely keyword is to produce a near-duplicate post."""
+        if self.duplicate_risk is None:
+            from duplicate_risk import CACHE_PATH as RISK_CACHE_PATH, DuplicateRiskPredictor
+            self.duplicate_risk = DuplicateRiskPredictor(str(self.site.posts_path),
+                                                         str(self.site.path(RISK_CACHE_PATH)))
+            self.duplicate_risk.refresh()
+        return self.duplicate_risk.predict(keyword, products, self.content_tracker.data["keywords"].get(keyword))
     
     def _select_keyword(self, keywords: List[Dict]) -> Optional[Dict]:
-        """Select the best keyword for content generation."""
+        """Select the best keyword for content generation, skipping likely duplicates."""
+        # One post per keyword cluster: hold back keywords whose cluster-mates already have a post
+        used_by_cluster: Dict[str, set] = {}
+        for used, entry in self.content_tracker.data["keywords"].items():
+            if entry.get("usage_count"):
+                used_by_cluster.setdefault(self._keyword_clusters.get(used, used), set()).add(used)
+        
         # Filter out overused keywords
         available_keywords = []
         for kw in keywords:
-            if self.content_tracker.get_keyword_usage(kw['keyword']) < 3:
+            cluster_mates = used_by_cluster.get(kw.get('cluster', kw['keyword']), set()) - {kw['keyword']}
+            if self.content_tracker.get_keyword_usage(kw['keyword']) < 3 and not cluster_mates:
                 available_keywords.append(kw)
         
         if not available_keywords:
@@ -167,9 +294,25 @@ class SmartPetBuysGenerator:
             x['estimated_volume']
         ), reverse=True)
         
-        return available_keywords[0]
+        # Score the best candidates before paying for a completion: high-risk keywords are skipped,
+        # medium-risk ones only used when nothing safer is available
+        fallback = None
+        for kw in available_keywords[:RISK_CANDIDATES]:
+            kw['products'] = self._get_relevant_products(kw['keyword'])
+            kw['risk'] = self._predict_duplicate_risk(kw['keyword'], kw['products'])
+            action = kw['risk']['action']
+            if action == 'generate':
+                return kw
+            logger.info(f"[RISK] {'Skipping' if action == 'skip' else 'Deprioritizing'} '{kw['keyword']}' "
+                        f"(duplicate risk {kw['risk']['risk']:.0%}, closest: {kw['risk']['closest_post']})")
+            if action == 'deprioritize' and fallback is None:
+                fallback = kw
+        
+        if fallback is None:
+            logger.info("No keyword below the duplicate-risk threshold")
+        return fallback
     
-    def _get_relevant_products(self, keyword: str) -> List[Dict]:
+    def _get_relevant_products(self, keyword: str) -> List["Product"]:
         """Find products relevant to the keyword."""
         relevant_products = []
         keyword_lower = keyword.lower()
@@ -197,10 +340,22 @@ class SmartPetBuysGenerator:
                 primary_filter = terms
                 break
         
+        # Indexed catalogs only decode records that mention a scoring term
+        from product_catalog import IndexedCatalog
+        if isinstance(self.products, IndexedCatalog):
+            terms = set(keyword_lower.split()) | set(primary_filter or [])
+            terms.update(term for term in ('dog', 'cat') if term in keyword_lower)
+            if 'training' in keyword_lower or 'treat' in keyword_lower:
+                terms.update(['treat', 'training'])
+            candidates = self.products.candidates(terms)
+        else:
+            candidates = self.products.values()
+        
         # Score products based on relevance
         scored_products = []
-        for product_id, product in self.products.items():
-            product_text = f"{product['name']} {product.get('blurb', '')}".lower()
+        for product in candidates:
+            product_id = product.id
+            product_text = product.search_text
             score = 0
             
             # Primary keyword match (highest priority)
@@ -222,40 +377,40 @@ class SmartPetBuysGenerator:
                     score += 5
             
             if score > 0:
-                product['id'] = product_id
-                product['relevance_score'] = score
-                scored_products.append(product)
+                scored_products.append((score, product))
         
-        # Sort by relevance score and return top products
-        scored_products.sort(key=lambda x: x['relevance_score'], reverse=True)
-        return scored_products[:5]  # Limit to top 5 products
+        # Sort by relevance score, breaking ties with rating and review volume
+        scored_products.sort(key=lambda x: (
+            x[0],
+            x[1].rating or 0.0,
+            x[1].review_count or 0
+        ), reverse=True)
+        return [product for _, product in scored_products[:5]]  # Limit to top 5 products
     
-    def _create_content_prompt(self, keyword: str, products: List[Dict]) -> str:
+    def _create_content_prompt(self, keyword: str, products: List["Product"]) -> str:
         """Create the AI prompt for content generation."""
         
         product_info = ""
         if products:
             product_info = "\n\nRELEVANT PRODUCTS TO FEATURE (must include these with exact details):\n"
             for product in products:
-                # Enhanced error handling with better fallbacks
-                brand = product.get('brand')
-                if not brand:
-                    # Try to extract brand from product name
-                    name_parts = product['name'].split()
-                    brand = name_parts[0] if name_parts else 'Quality Brand'
-                
-                rating = product.get('rating', '4.5')  # Default to good rating
-                review_count = product.get('review_count', '1,000+')  # Default review count
-                price = product.get('price', '29.99')  # Default reasonable price
+                # Only pass along data we actually have; the model must not invent prices or ratings
+                if product.rating is not None and product.review_count is not None:
+                    rating_line = f"{product.rating_text}★ ({product.review_count_text} reviews)"
+                elif product.rating is not None:
+                    rating_line = f"{product.rating_text}★"
+                else:
+                    rating_line = "not available (omit the rating block)"
+                price_line = f"${product.price_text}" if product.price is not None else "not available (omit the price)"
                 
                 product_info += f"""
-PRODUCT: {product['name']} by {brand}
-- Price: ${price}
-- Rating: {rating}★ ({review_count} reviews)
-- Description: {product['blurb']}
-- Affiliate URL: {product['url']}
-- Product Image: {product['image']}
-- Product ID: {product['id']}
+PRODUCT: {product.name} by {product.display_brand or 'Unknown Brand'}
+- Price: {price_line}
+- Rating: {rating_line}
+- Description: {product.blurb}
+- Affiliate URL: {product.url}
+- Product Image: {product.image}
+- Product ID: {product.id}
 """
         
         return f"""You are a professional pet content writer for SmartPetBuys, a trusted pet product review and recommendation site. 
@@ -281,7 +436,7 @@ CRITICAL PRODUCT INTEGRATION REQUIREMENTS:
 - MUST include a "## Top Product Recommendations" section
 - For each product, use this EXACT HTML format for better styling:
 
-<div class="product-card" itemscope itemtype="https://schema.org/Product">
+<div class="product-card" data-product-id="[Product ID]" itemscope itemtype="https://schema.org/Product">
   <div class="product-card-image">
     <img src="[Product Image URL]" alt="[Product Name]" loading="lazy" itemprop="image">
   </div>
@@ -349,60 +504,102 @@ CONTENT GUIDELINES:
 Write the blog post content only (no frontmatter - that will be added separately). Start with the introduction.
 """
 
-    def _generate_content(self, keyword: str, products: List[Dict]) -> Optional[str]:
-        """Generate content using OpenAI with retry logic."""
-        max_retries = 3
-        base_delay = 1
-        
-        for attempt in range(max_retries):
-            try:
-                prompt = self._create_content_prompt(keyword, products)
-                
-                response = self.client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {"role": "system", "content": "You are a professional pet content writer specializing in helpful, SEO-optimized articles about pet products and care."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    max_tokens=4000,
-                    temperature=0.7
-                )
-                
-                return response.choices[0].message.content
-                
-            except openai.RateLimitError:
-                if attempt < max_retries - 1:
-                    delay = base_delay * (2 ** attempt)
-                    logger.warning(f"Rate limited, retrying in {delay}s...")
-                    time.sleep(delay)
-                    continue
-                else:
-                    logger.error("Rate limit exceeded, max retries reached")
-                    return None
-                    
-            except Exception as e:
-                logger.error(f"OpenAI API error (attempt {attempt + 1}): {e}")
-                if attempt < max_retries - 1:
-                    time.sleep(base_delay)
-                    continue
-                return None
-        
-        return None
+    def _generate_content(self, keyword: str, products: List["Product"]) -> Optional[str]:
+        """Generate content using OpenAI under the shared rate-limit/retry controller."""
+        openai = require('openai', 'openai')
+        from llm_ledger import record_call
+        from request_controller import HISTORY_PATH, CircuitOpenError, get_controller
+        if self.request_controller is None:
+            # Hedging is opt-in, e.g. OPENAI_HEDGE_PERCENTILE=0.95 (extra spend capped at 10% of calls)
+            hedge_percentile = os.getenv('OPENAI_HEDGE_PERCENTILE')
+            self.request_controller = get_controller(
+                'openai', transient_errors=(openai.APIConnectionError, OSError),
+                hedge_percentile=float(hedge_percentile) if hedge_percentile else None,
+                history_path=str(self.site.path(HISTORY_PATH)))
+        
+        prompt = self._create_content_prompt(keyword, products)
+        model = "gpt-4o-mini"
+        max_tokens = 4000
+        
+        def send():
+            return self.client.chat.completions.with_raw_response.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": "You are a professional pet content writer specializing in helpful, SEO-optimized articles about pet products and care."},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=max_tokens,
+                temperature=0.7
+            )
+        
+        report: Dict = {}
+        # Non-streamed completions arrive all at once, so there is no separate time-to-first-token
+        record = {'site': self.site.name, 'keyword': keyword, 'model': model, 'prompt_tokens': None,
+                  'completion_tokens': None, 'cached_tokens': None, 'ttft_ms': None, 'server_ms': None,
+                  'outcome': 'error'}
+        content = None
+        started = time.perf_counter()
+        try:
+            # Providers count the prompt (~4 chars per token) plus max_tokens against the token limit
+            raw = self.request_controller.call(send, token_cost=len(prompt) // 4 + max_tokens, report=report)
+            completion = raw.parse()
+            content = completion.choices[0].message.content
+            record['model'] = completion.model or model
+            processing_ms = raw.headers.get('openai-processing-ms', '')
+            record['server_ms'] = int(processing_ms) if processing_ms.isdigit() else None
+            if completion.usage:
+                record['prompt_tokens'] = completion.usage.prompt_tokens
+                record['completion_tokens'] = completion.usage.completion_tokens
+                details = getattr(completion.usage, 'prompt_tokens_details', None)
+                record['cached_tokens'] = getattr(details, 'cached_tokens', None)
+            record['outcome'] = 'ok' if content else 'empty'
+        except CircuitOpenError as e:
+            record['outcome'] = 'circuit_open'
+            logger.error(f"OpenAI unavailable, not calling: {e}")
+        except openai.RateLimitError:
+            record['outcome'] = 'rate_limited'
+            logger.error("Rate limit exceeded, max retries reached")
+        except Exception as e:
+            logger.error(f"OpenAI API error: {e}")
+        finally:
+            record['latency_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            record.update(report)
+            if self.ledger_path:
+                record_call(record, self.ledger_path)
+        return content
+    
+    def _add_related_links(self, slug: str, frontmatter_data: Dict, content: str) -> str:
+        """Index the new post and link to its most related existing posts."""
+        if self.related_index is None:
+            from related_posts import RelatedIndex
+            from related_posts import CACHE_PATH, RELATED_PATH
+            self.related_index = RelatedIndex(str(self.site.posts_path), str(self.site.path(RELATED_PATH)),
+                                              str(self.site.path(CACHE_PATH)))
+        self.related_index.update()
+        
+        related = self.related_index.add_document(slug, frontmatter_data, content)[:3]
+        if not related:
+            return content
+        
+        # Resolved at build time by layouts/shortcodes/related-posts.html, which skips posts deleted since
+        slugs = ' '.join(f'"{entry["post"]}"' for entry in related)
+        return f"{content.rstrip()}\n\n{{{{< related-posts {slugs} >}}}}\n"
     
     def _validate_content_quality(self, content: str) -> bool:
-        """Validate generated content meets quality standards."""
-        if not content or len(content.strip()) < 1000:
-            logger.warning("Content too short (minimum 1000 characters)")
+        """Validate generated content meets quality standards (same analyzer as content_audit.py)."""
+        from content_audit import MIN_CHARACTERS, MIN_HEADINGS, MIN_PARAGRAPHS, analyze_markdown
+        analysis = analyze_markdown(content or '')
+        if analysis['characters'] < MIN_CHARACTERS:
+            logger.warning(f"Content too short (minimum {MIN_CHARACTERS} characters)")
             return False
         
         # Check for proper structure
-        if content.count('#') < 3:
+        if analysis['headings'] < MIN_HEADINGS:
             logger.warning("Content lacks proper heading structure")
             return False
         
         # Check for reasonable paragraph structure
-        paragraphs = [p.strip() for p in content.split('\n\n') if p.strip()]
-        if len(paragraphs) < 5:
+        if analysis['paragraphs'] < MIN_PARAGRAPHS:
             logger.warning("Content has too few paragraphs")
             return False
         
@@ -411,23 +608,24 @@ Write the blog post content only (no frontmatter - that will be added separately
     def _load_existing_posts(self) -> List[Dict]:
         """Load existing posts for duplicate checking."""
         posts = []
-        posts_dir = Path("content/posts")
+        posts_dir = self.site.posts_path
         
         if not posts_dir.exists():
             return posts
         
+        from frontmatter_io import load_post
+        
         for post_dir in posts_dir.iterdir():
             if post_dir.is_dir():
                 index_file = post_dir / "index.md"
                 if index_file.exists():
                     try:
-                        with open(index_file, 'r', encoding='utf-8') as f:
-                            post = frontmatter.loads(f.read())
-                            posts.append({
-                                'title': post.metadata.get('title', ''),
-                                'content': post.content,
-                                'slug': post.metadata.get('slug', ''),
-                            })
+                        metadata, body = load_post(index_file)
+                        posts.append({
+                            'title': metadata.get('title', ''),
+                            'content': body.strip(),
+                            'slug': metadata.get('slug', ''),
+                        })
                     except Exception as e:
                         logger.warning(f"Could not load post {index_file}: {e}")
         
@@ -566,28 +764,36 @@ Write the blog post content only (no frontmatter - that will be added separately
             'priority': 0.8 if 'best' in keyword.lower() else 0.6
         }
     
-    def generate_post(self) -> bool:
-        """Generate a single blog post with comprehensive validation."""
+    def generate_post(self, keyword: Optional[str] = None) -> bool:
+        """Generate a single blog post with comprehensive validation.
+        
+        When no keyword is given, the best publishable keyword from keywords.csv is selected.
+        """
         logger.info("[GENERATION] Starting blog post generation...")
+        self.last_post_path = None
         
         # Validate API key
         if not os.getenv('OPENAI_API_KEY'):
             logger.error("[ERROR] OPENAI_API_KEY environment variable not set")
             return False
         
-        # Load available keywords
-        keywords = self._load_keywords()
-        if not keywords:
-            logger.info("[INFO] No keywords marked for publishing")
-            return False
-        
-        # Select keyword
-        selected_keyword = self._select_keyword(keywords)
-        if not selected_keyword:
-            logger.info("[INFO] No available keywords (all may be overused)")
-            return False
-        
-        keyword = selected_keyword['keyword']
+        if keyword is None:
+            # Load available keywords
+            keywords = self._load_keywords()
+            if not keywords:
+                logger.info("[INFO] No keywords marked for publishing")
+                return False
+            
+            # Select keyword
+            selected_keyword = self._select_keyword(keywords)
+            if not selected_keyword:
+                logger.info("[INFO] No available keywords (all may be overused)")
+                return False
+            
+            keyword = selected_keyword['keyword']
+            products = selected_keyword.get('products')
+        else:
+            products = None
         logger.info(f"[KEYWORD] Selected keyword: {keyword}")
         
         # Enhanced duplicate checking
@@ -597,7 +803,13 @@ Write the blog post content only (no frontmatter - that will be added separately
             return False
         
         # Get relevant products
-        products = self._get_relevant_products(keyword)
+        if products is None:
+            products = self._get_relevant_products(keyword)
+            risk = self._predict_duplicate_risk(keyword, products)
+            if risk['action'] == 'skip':
+                logger.info(f"[DUPLICATE] Predicted duplicate risk {risk['risk']:.0%} for keyword: {keyword} "
+                            f"(closest: {risk['closest_post']})")
+                return False
         logger.info(f"[PRODUCTS] Found {len(products)} relevant products")
         
         # Generate content with validation
@@ -612,36 +824,40 @@ Write the blog post content only (no frontmatter - that will be added separately
             return False
         
         # Additional duplicate check on generated content
-        for existing_post in self._load_existing_posts():
+        existing_posts = self.existing_posts if self.existing_posts is not None else self._load_existing_posts()
+        for existing_post in existing_posts:
             similarity = self._calculate_similarity(content, existing_post.get('content', ''))
             if similarity > 0.75:
                 logger.warning(f"[WARNING] High similarity ({similarity:.1%}) with existing post, skipping")
+                self.content_tracker.record_rejection(keyword)
                 return False
         
         # Create post structure
         slug = self._create_slug(keyword)
         frontmatter_data = self._create_frontmatter(keyword, title, slug)
+        content = self._add_related_links(slug, frontmatter_data, content)
         
         # Create post directory and file
-        post_dir = Path(f"content/posts/{slug}")
+        post_dir = self.site.posts_path / slug
         post_dir.mkdir(parents=True, exist_ok=True)
         
         post_path = post_dir / "index.md"
         
-        # Create full post with frontmatter
-        post = frontmatter.Post(content, **frontmatter_data)
-        post_content = frontmatter.dumps(post)
+        # Stream the YAML header and body straight to disk
+        from frontmatter_io import write_post
+        write_post(post_path, frontmatter_data, content)
         
-        # Save post
-        with open(post_path, 'w', encoding='utf-8') as f:
-            f.write(post_content)
+        # Track the post (hash the stripped body so reconcile_tracker.py can verify it from the file)
+        content_hash = hashlib.sha256(content.strip().encode()).hexdigest()
+        post_id = self.content_tracker.add_post(keyword, title, content_hash, str(post_path),
+                                                category=frontmatter_data['categories'][0])
         
-        # Track the post
-        content_hash = hashlib.sha256(content.encode()).hexdigest()
-        post_id = self.content_tracker.add_post(keyword, title, content_hash, str(post_path))
+        # Publish the new post's related links (and its place in other posts' lists) to data/related.json
+        self.related_index.save()
         
         # Mark keyword as used in CSV
         self.update_keywords_csv(keyword)
+        self.last_post_path = post_path
         
         logger.info(f"[SUCCESS] Successfully generated post: {post_path}")
         logger.info(f"[STATS] Post ID: {post_id}")
@@ -652,7 +868,7 @@ Write the blog post content only (no frontmatter - that will be added separately
     
     def update_keywords_csv(self, used_keyword: str):
         """Update keywords.csv to mark used keyword as unpublished."""
-        keywords_path = Path("keywords.csv")
+        keywords_path = self.site.keywords_path
         if not keywords_path.exists():
             return
         
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Resident Generation Worker for SmartPetBuys
+Keeps the catalog, tracker, keywords and duplicate indexes warm and serves jobs over a localhost HTTP API.
+"""
+
+import json
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+from duplicate_checker import DuplicateChecker
+from generate_single_post import SmartPetBuysGenerator
+from site_config import DEFAULT_SITE, SiteConfig, catalog_signature
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_QUEUED_JOBS = 16
+MAX_FINISHED_JOBS = 256
+JOB_TYPES = ('generate', 'check')
+
+
+class GenerationWorker:
+    """Processes generation and draft-check jobs against resident, incrementally refreshed state."""
+
+    def __init__(self, max_queued: int = MAX_QUEUED_JOBS, site: SiteConfig = DEFAULT_SITE):
+        started = time.perf_counter()
+        self.site = site
+        self.generator = SmartPetBuysGenerator(site)
+        self.checker = DuplicateChecker(site=site)
+        self.generator.existing_posts = self.checker.existing_posts
+        self._catalog_mtime = catalog_signature(site)
+
+        self.jobs: "OrderedDict[str, Dict]" = OrderedDict()
+        self.queue: "queue.Queue[str]" = queue.Queue(maxsize=max_queued)
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="generation-worker", daemon=True)
+        self._stopping = threading.Event()
+
+        logger.info(f"Worker state loaded in {(time.perf_counter() - started) * 1000:.0f} ms "
+                    f"({len(self.generator.products)} products, {len(self.checker.existing_posts)} posts)")
+
+    def refresh(self) -> Dict:
+        """Bring resident state up to date with the files on disk."""
+        started = time.perf_counter()
+
+        catalog_mtime = catalog_signature(self.site)
+        if catalog_mtime != self._catalog_mtime:
+            self.generator.products = self.generator._load_products()
+            self._catalog_mtime = catalog_mtime
+
+        self.generator.content_tracker.refresh()
+        self.checker.refresh()
+        self.generator.existing_posts = self.checker.existing_posts
+        if self.generator.duplicate_risk is not None:
+            self.generator.duplicate_risk.refresh()
+
+        return {'refresh_ms': round((time.perf_counter() - started) * 1000, 2)}
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        self._thread.join(timeout=5)
+
+    def submit(self, job_type: str, params: Dict) -> Optional[Dict]:
+        """Queue a job; returns None when the queue is full."""
+        job = {
+            'id': uuid.uuid4().hex[:12],
+            'type': job_type,
+            'params': params,
+            'status': 'queued',
+            'submitted': time.time(),
+            'result': None,
+            'done': threading.Event(),
+        }
+        with self._lock:
+            try:
+                self.queue.put_nowait(job['id'])
+            except queue.Full:
+                return None
+            self.jobs[job['id']] = job
+            # Forget the oldest finished jobs so memory stays bounded
+            while len(self.jobs) > MAX_FINISHED_JOBS + self.queue.maxsize:
+                oldest_id = next(iter(self.jobs))
+                if self.jobs[oldest_id]['status'] in ('queued', 'running'):
+                    break
+                self.jobs.popitem(last=False)
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                job_id = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            job = self.get(job_id)
+            if job is None:
+                continue
+
+            job['status'] = 'running'
+            started = time.perf_counter()
+            try:
+                timings = self.refresh()
+                if job['type'] == 'generate':
+                    result = self._generate(job['params'])
+                else:
+                    result = self._check(job['params'])
+                result.update(timings)
+                job['status'] = 'succeeded' if result.get('ok') else 'failed'
+            except Exception as e:
+                logger.error(f"Job {job_id} crashed: {e}")
+                result = {'ok': False, 'error': str(e)}
+                job['status'] = 'failed'
+
+            result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            job['result'] = result
+            job['done'].set()
+            self.queue.task_done()
+
+    def _generate(self, params: Dict) -> Dict:
+        """Generate a post, optionally for a specific keyword."""
+        keyword = params.get('keyword') or None
+        ok = self.generator.generate_post(keyword=keyword)
+        post_path = self.generator.last_post_path
+
+        if ok:
+            # Make the new post visible to the next job's duplicate checks right away
+            self.checker.refresh()
+            self.generator.existing_posts = self.checker.existing_posts
+
+        return {'ok': ok, 'post_path': str(post_path) if post_path else None}
+
+    def _check(self, params: Dict) -> Dict:
+        """Run duplicate and quality checks on a draft without generating anything."""
+        keyword = params.get('keyword', '')
+        title = params.get('title') or self.generator._create_title(keyword)
+        content = params.get('content', '')
+
+        is_duplicate, issues = self.checker.comprehensive_duplicate_check(keyword, title, content)
+        quality_ok = self.generator._validate_content_quality(content)
+        if not quality_ok:
+            issues.append("Quality: content failed length/structure checks")
+
+        return {'ok': not is_duplicate and quality_ok, 'duplicate': is_duplicate, 'issues': issues}
+
+
+def _public_job(job: Dict) -> Dict:
+    return {key: value for key, value in job.items() if key != 'done'}
+
+
+def make_handler(worker: GenerationWorker):
+    """Build the HTTP request handler bound to a worker."""
+
+    class JobHandler(BaseHTTPRequestHandler):
+        def _send(self, status: int, payload: Dict):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+        def do_GET(self):
+            if self.path == '/health':
+                self._send(200, {'status': 'ok', 'queued': worker.queue.qsize(),
+                                 'products': len(worker.generator.products),
+                                 'posts': len(worker.checker.existing_posts),
+                                 'provider': (worker.generator.request_controller.snapshot()
+                                              if worker.generator.request_controller else None)})
+            elif self.path.startswith('/jobs/'):
+                job = worker.get(self.path[len('/jobs/'):])
+                if job is None:
+                    self._send(404, {'error': 'Unknown job'})
+                else:
+                    self._send(200, _public_job(job))
+            else:
+                self._send(404, {'error': 'Not found'})
+
+        def do_POST(self):
+            if self.path != '/jobs':
+                self._send(404, {'error': 'Not found'})
+                return
+
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                request = json.loads(self.rfile.read(length) or b'{}')
+            except (ValueError, json.JSONDecodeError):
+                self._send(400, {'error': 'Body must be JSON'})
+                return
+
+            job_type = request.get('type')
+            if job_type not in JOB_TYPES:
+                self._send(400, {'error': f"type must be one of {', '.join(JOB_TYPES)}"})
+                return
+
+            job = worker.submit(job_type, request)
+            if job is None:
+                self._send(503, {'error': 'Job queue is full, retry later'})
+                return
+
+            # Optionally block until the job finishes (bounded by "timeout" seconds)
+            if request.get('wait'):
+                job['done'].wait(timeout=float(request.get('timeout', 600)))
+                self._send(200, _public_job(job))
+            else:
+                self._send(202, _public_job(job))
+
+    return JobHandler
+
+
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+    """Run the worker until interrupted."""
+    worker = GenerationWorker()
+    worker.start()
+    server = ThreadingHTTPServer((host, port), make_handler(worker))
+    logger.info(f"Generation worker listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        worker.stop()
+
+
+def submit_job(payload: Dict, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> Dict:
+    """Submit a job to a running worker and wait for the result."""
+    import urllib.error
+    import urllib.request
+
+    body = json.dumps({**payload, 'wait': True}).encode('utf-8')
+    request = urllib.request.Request(f"http://{host}:{port}/jobs", data=body,
+                                     headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return json.load(response)
+    except urllib.error.HTTPError as e:
+        return json.load(e)
+
+
+def main():
+    """CLI interface for the generation worker."""
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Usage: python generation_worker.py [serve [port]|generate [keyword]|check <keyword> <draft.md>]")
+        return 1
+
+    command = sys.argv[1]
+
+    if command == 'serve':
+        port = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_PORT
+        serve(port=port)
+
+    elif command == 'generate':
+        keyword = ' '.join(sys.argv[2:]) or None
+        result = submit_job({'type': 'generate', 'keyword': keyword})
+        print(json.dumps(result, indent=2))
+        return 0 if result.get('status') == 'succeeded' else 1
+
+    elif command == 'check' and len(sys.argv) == 4:
+        with open(sys.argv[3], 'r', encoding='utf-8') as f:
+            content = f.read()
+        result = submit_job({'type': 'check', 'keyword': sys.argv[2], 'content': content})
+        print(json.dumps(result, indent=2))
+        return 0 if result.get('status') == 'succeeded' else 1
+
+    else:
+        print("Invalid command or arguments")
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Bulk Product Ingestion for SmartPetBuys
+Streams new products from CSV, validates and dedupes them, and merges them into the catalog.
+"""
+
+import csv
+import logging
+import time
+from itertools import chain
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+from product_catalog import (CATALOG_PATH, PRODUCTS_PATH, IndexedCatalog, Product,
+                             export_products_json, write_catalog, write_products_json)
+from validate_product_data import iter_products, validate_product
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CSV_PATH = "NEW_PRODUCTS_TO_ADD.csv"
+
+# CSV headers (lowercased) mapped onto product schema fields; other columns are ignored
+HEADER_ALIASES = {
+    'product id': 'id',
+    'id': 'id',
+    'product name': 'name',
+    'name': 'name',
+    'affiliate link': 'url',
+    'url': 'url',
+    'image url': 'image',
+    'image': 'image',
+    'blurb': 'blurb',
+    'description': 'blurb',
+    'brand': 'brand',
+    'price': 'price',
+    'rating': 'rating',
+    'review count': 'review_count',
+    'review_count': 'review_count',
+    'reviews': 'review_count',
+}
+
+
+class ProductIngester:
+    """Merges CSV product rows into the catalog with id/URL deduplication."""
+
+    def __init__(self, csv_path: str = CSV_PATH, products_path: str = PRODUCTS_PATH,
+                 catalog_path: str = CATALOG_PATH):
+        self.csv_path = Path(csv_path)
+        self.products_path = Path(products_path)
+        self.catalog_path = Path(catalog_path)
+
+    def _existing_entries(self) -> Iterator[Tuple[str, Dict]]:
+        """Stream (id, entry) pairs from the current catalog source of truth."""
+        if self.catalog_path.exists():
+            catalog = IndexedCatalog(str(self.catalog_path))
+            try:
+                for product in catalog.iter_products():
+                    yield product.id, product.to_dict()
+            finally:
+                catalog.close()
+        elif self.products_path.exists():
+            yield from iter_products(str(self.products_path))
+
+    def _read_rows(self) -> Iterator[Tuple[int, Dict]]:
+        """Stream CSV rows normalized onto product schema fields."""
+        with open(self.csv_path, 'r', encoding='utf-8-sig', newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if not header:
+                return
+            fields = [HEADER_ALIASES.get(column.strip().lower()) for column in header]
+
+            for line_number, row in enumerate(reader, start=2):
+                if not any(cell.strip() for cell in row):
+                    continue
+                record = {}
+                for field, value in zip(fields, row):
+                    value = value.strip()
+                    if field and value:
+                        record[field] = value
+                yield line_number, record
+
+    def ingest(self, dry_run: bool = False) -> Dict:
+        """Validate and dedupe CSV rows in one pass, then write the merged catalog once."""
+        started = time.perf_counter()
+        stats = {
+            'rows': 0,
+            'added': [],
+            'duplicate_ids': [],
+            'duplicate_urls': [],
+            'rejected': [],
+            'missing_blurbs': [],
+        }
+
+        # Hash indexes over the existing catalog
+        known_ids = set()
+        url_owner: Dict[str, str] = {}
+        for product_id, data in self._existing_entries():
+            known_ids.add(product_id)
+            if data.get('url'):
+                url_owner[data['url']] = product_id
+        stats['existing'] = len(known_ids)
+
+        new_entries: List[Tuple[str, Dict]] = []
+        for line_number, record in self._read_rows():
+            stats['rows'] += 1
+            product_id = record.pop('id', '')
+
+            if not product_id:
+                stats['rejected'].append({'line': line_number, 'id': '', 'reasons': ['Missing product id']})
+                continue
+            if product_id in known_ids:
+                stats['duplicate_ids'].append(product_id)
+                continue
+            if record.get('url') in url_owner:
+                stats['duplicate_urls'].append({'id': product_id, 'existing': url_owner[record['url']]})
+                continue
+
+            errors = [f"{issue['field']}: {issue['message']}"
+                      for issue in validate_product(product_id, record) if issue['severity'] == 'error']
+            if errors:
+                stats['rejected'].append({'line': line_number, 'id': product_id, 'reasons': errors})
+                continue
+
+            # Round-trip through the typed model so numbers use the catalog's canonical formatting
+            entry = Product.from_dict(product_id, record).to_dict(canonical=True)
+            new_entries.append((product_id, entry))
+            known_ids.add(product_id)
+            url_owner[entry['url']] = product_id
+            stats['added'].append(product_id)
+            # Card copy is never made up; validate_product_data.py keeps warning until someone writes it
+            if not entry['blurb']:
+                stats['missing_blurbs'].append(product_id)
+
+        if new_entries and not dry_run:
+            self._write_merged(new_entries)
+
+        stats['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        return stats
+
+    def _write_merged(self, new_entries: List[Tuple[str, Dict]]):
+        """Write existing plus new products with a single atomic replace per file."""
+        merged = chain(self._existing_entries(), new_entries)
+        if self.catalog_path.exists():
+            write_catalog(merged, str(self.catalog_path))
+            export_products_json(str(self.catalog_path), str(self.products_path))
+        else:
+            write_products_json(merged, str(self.products_path))
+        logger.info(f"Merged {len(new_entries)} new products into the catalog")
+
+
+def main():
+    """CLI interface for bulk product ingestion."""
+    import sys
+
+    usage = "Usage: python ingest_products.py [products.csv] [--dry-run]"
+    if '--help' in sys.argv or '-h' in sys.argv:
+        print(usage)
+        return 0
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('-')]
+    flags = [arg for arg in sys.argv[1:] if arg.startswith('-')]
+    dry_run = '--dry-run' in flags
+    # Anything unrecognized stops here rather than running a real ingest
+    if len(args) > 1 or any(flag != '--dry-run' for flag in flags):
+        print(usage)
+        return 1
+
+    ingester = ProductIngester(csv_path=args[0] if args else CSV_PATH)
+    if not ingester.csv_path.exists():
+        print(f"[ERROR] CSV file not found: {ingester.csv_path}")
+        return 1
+
+    stats = ingester.ingest(dry_run=dry_run)
+
+    print(f"\n[INGEST] {'Dry run: ' if dry_run else ''}Product ingestion from {ingester.csv_path}")
+    print(f"Rows read: {stats['rows']}")
+    print(f"Existing products: {stats['existing']}")
+    print(f"Added: {len(stats['added'])}")
+    print(f"Skipped (duplicate id): {len(stats['duplicate_ids'])}")
+    print(f"Skipped (duplicate affiliate URL): {len(stats['duplicate_urls'])}")
+    print(f"Rejected: {len(stats['rejected'])}")
+    print(f"Missing blurbs: {len(stats['missing_blurbs'])}")
+    print(f"Elapsed: {stats['elapsed_ms']:.0f} ms")
+
+    for dup in stats['duplicate_urls']:
+        print(f"  - {dup['id']}: affiliate URL already used by {dup['existing']}")
+    for product_id in stats['missing_blurbs']:
+        print(f"  - [WARNING] {product_id}: no blurb, the product card will show no description")
+    for rejected in stats['rejected']:
+        print(f"  - line {rejected['line']} ({rejected['id'] or 'no id'}): {'; '.join(rejected['reasons'])}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Keyword Cannibalization Clustering for SmartPetBuys
+Groups near-synonymous keywords ("dog training treats", "best dog treats for training") under one
+canonical keyword so the scheduler publishes a single post per search intent.
+"""
+
+import gc
+import math
+from collections import Counter
+from typing import Dict, FrozenSet, Iterable, List, Set, Tuple
+
+from duplicate_risk import topic_tokens
+from title_index import normalize_text, trigrams
+
+# Keywords join a cluster when the blended token/character similarity to its canonical keyword reaches this
+CLUSTER_THRESHOLD = 0.7
+# Share of the blend given to IDF-weighted token overlap; the rest is character-trigram overlap of the
+# sorted topic tokens, which absorbs typos and compound spellings that tokens miss
+TOKEN_WEIGHT = 0.5
+
+PRIORITY_WEIGHTS = {'high': 3, 'medium': 2, 'low': 1}
+
+
+def keyword_features(keyword: str) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+    """Topic tokens of a keyword and the character trigrams of their sorted spelling."""
+    tokens = frozenset(topic_tokens(keyword))
+    return tokens, frozenset(trigrams(' '.join(sorted(tokens))))
+
+
+def blocking_keys(tokens: FrozenSet[str]) -> List[FrozenSet[str]]:
+    """The token set itself and every subset one token smaller.
+
+    Keywords that add, drop or swap a single topic token share a key, and pairs further apart than
+    that cannot reach CLUSTER_THRESHOLD with short keywords, so only keywords sharing a key are scored.
+    """
+    if len(tokens) < 2:
+        return [tokens]
+    return [tokens] + [tokens - {token} for token in tokens]
+
+
+def _jaccard(a: Set[str], b: Set[str]) -> float:
+    overlap = len(a & b)
+    return overlap / (len(a) + len(b) - overlap) if overlap else 0.0
+
+
+def canonical_order(row: Dict) -> Tuple:
+    """Sort key putting the keyword that should represent its cluster first."""
+    try:
+        volume = int(row.get('estimated_volume') or 0)
+    except ValueError:
+        volume = 0
+    keyword = row['keyword'].strip()
+    return (-PRIORITY_WEIGHTS.get((row.get('priority') or '').strip(), 1), -volume, len(keyword), keyword)
+
+
+class KeywordClusterer:
+    """Leader clustering of keywords with blocking-key candidate generation."""
+
+    def __init__(self, threshold: float = CLUSTER_THRESHOLD):
+        self.threshold = threshold
+        self.features: Dict[str, Tuple[FrozenSet[str], FrozenSet[str]]] = {}
+        self.idf: Dict[str, float] = {}
+
+    def _token_weight(self, tokens: Iterable[str]) -> float:
+        idf = self.idf
+        return sum([idf[token] for token in tokens])
+
+    def similarity(self, a: str, b: str) -> float:
+        """Blended similarity of two keywords already seen by cluster()."""
+        (tokens_a, grams_a), (tokens_b, grams_b) = self.features[a], self.features[b]
+        shared = self._token_weight(tokens_a & tokens_b)
+        union = self._token_weight(tokens_a | tokens_b)
+        weighted = shared / union if union else 0.0
+        return TOKEN_WEIGHT * weighted + (1 - TOKEN_WEIGHT) * _jaccard(grams_a, grams_b)
+
+    def cluster(self, rows: Iterable[Dict]) -> Dict[str, str]:
+        """Map every keyword to the canonical keyword of its cluster.
+
+        Keywords are visited best-first (priority, then volume); each joins the most similar existing
+        canonical keyword or becomes one itself, so clusters never chain through intermediate keywords.
+        Canonical keywords are indexed under their blocking keys and a keyword is only scored against
+        those sharing one of its keys, which keeps the work roughly linear in the number of keywords.
+        """
+        # The pass allocates millions of small sets and tuples that never form cycles; pausing the
+        # cyclic collector keeps it from rescanning the growing index over and over
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            return self._cluster(sorted(rows, key=canonical_order))
+        finally:
+            if collecting:
+                gc.enable()
+
+    def _cluster(self, rows: List[Dict]) -> Dict[str, str]:
+        df: Counter = Counter()
+        for row in rows:
+            keyword = row['keyword'].strip()
+            if keyword not in self.features:
+                self.features[keyword] = keyword_features(keyword)
+                df.update(self.features[keyword][0])
+        total = len(self.features)
+        self.idf = idf = {token: math.log(1 + total / count) for token, count in df.items()}
+
+        # The token half alone must leave the character half able to close the gap
+        min_token_score = (self.threshold - (1 - TOKEN_WEIGHT)) / TOKEN_WEIGHT
+        assignment: Dict[str, str] = {}
+        by_tokens: Dict[FrozenSet[str], str] = {}
+        # Blocking key -> canonical keywords as (tokens, trigrams, token weight, keyword)
+        blocks: Dict[FrozenSet[str], List[Tuple[FrozenSet[str], FrozenSet[str], float, str]]] = {}
+
+        for row in rows:
+            keyword = row['keyword'].strip()
+            if keyword in assignment:
+                continue
+            tokens, grams = self.features[keyword]
+            exact_key = tokens or frozenset([normalize_text(keyword) or keyword.lower()])
+            leader = by_tokens.get(exact_key)
+            if leader is not None:
+                assignment[keyword] = leader
+                continue
+
+            # Nothing but filler words ("best reviews"): only exact spellings can match
+            keys = blocking_keys(tokens) if tokens else []
+            weight = self._token_weight(tokens)
+            best, best_score = None, self.threshold
+            for key in keys:
+                for candidate_tokens, candidate_grams, candidate_weight, candidate in blocks.get(key, ()):
+                    shared = sum([idf[token] for token in tokens & candidate_tokens])
+                    token_score = shared / (weight + candidate_weight - shared)
+                    if token_score < min_token_score or TOKEN_WEIGHT * token_score + 1 - TOKEN_WEIGHT < best_score:
+                        continue
+                    overlap = len(grams & candidate_grams)
+                    char_score = overlap / (len(grams) + len(candidate_grams) - overlap)
+                    score = TOKEN_WEIGHT * token_score + (1 - TOKEN_WEIGHT) * char_score
+                    if score >= best_score:
+                        best, best_score = candidate, score
+
+            if best is not None:
+                assignment[keyword] = best
+                continue
+            assignment[keyword] = keyword
+            by_tokens[exact_key] = keyword
+            entry = (tokens, grams, weight, keyword)
+            for key in keys:
+                blocks.setdefault(key, []).append(entry)
+
+        return assignment
+
+
+def cluster_keywords(rows: Iterable[Dict], threshold: float = CLUSTER_THRESHOLD) -> Dict[str, str]:
+    """Map every keyword in keywords.csv rows to its cluster's canonical keyword."""
+    return KeywordClusterer(threshold).cluster(rows)
@@ -7,10 +7,13 @@ Handles keyword rotation, frequency tracking, and priority management.
 import csv
 import json
 import logging
+import os
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Dict, List, Optional
 
+from site_config import DEFAULT_SITE, SiteConfig
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -18,9 +21,10 @@ logger = logging.getLogger(__name__)
 class KeywordManager:
     """Enhanced keyword management with rotation and frequency tracking."""
     
-    def __init__(self, keywords_path: str = "keywords.csv", tracker_path: str = "data/content_tracker.json"):
-        self.keywords_path = Path(keywords_path)
-        self.tracker_path = Path(tracker_path)
+    def __init__(self, keywords_path: Optional[str] = None, tracker_path: Optional[str] = None,
+                 site: SiteConfig = DEFAULT_SITE):
+        self.keywords_path = Path(keywords_path) if keywords_path else site.keywords_path
+        self.tracker_path = Path(tracker_path) if tracker_path else site.tracker_path
         self.tracker_data = self._load_tracker()
     
     def _load_tracker(self) -> Dict:
@@ -42,13 +46,18 @@ class KeywordManager:
             logger.error(f"Keywords file not found: {self.keywords_path}")
             return keywords
         
+        # Keywords of a cluster (see `cluster`) share one post: once any of them has been used,
+        # the rest of its cluster is held back
+        used_by_cluster: Dict[str, set] = {}
         with open(self.keywords_path, 'r', encoding='utf-8') as f:
             reader = csv.DictReader(f)
             for row in reader:
+                keyword = row['keyword'].strip()
+                cluster = (row.get('cluster') or '').strip() or keyword
+                usage_count = self.tracker_data.get('keywords', {}).get(keyword, {}).get('usage_count', 0)
+                if usage_count:
+                    used_by_cluster.setdefault(cluster, set()).add(keyword)
                 if row.get('publish', '').lower() == 'yes':
-                    keyword = row['keyword'].strip()
-                    usage_count = self.tracker_data.get('keywords', {}).get(keyword, {}).get('usage_count', 0)
-                    
                     # Only include if under usage limit
                     if usage_count < 3:
                         keywords.append({
@@ -56,10 +65,11 @@ class KeywordManager:
                             'priority': row.get('priority', 'medium').strip(),
                             'estimated_volume': int(row.get('estimated_volume', 0)),
                             'usage_count': usage_count,
-                            'last_used': self.tracker_data.get('keywords', {}).get(keyword, {}).get('last_used')
+                            'last_used': self.tracker_data.get('keywords', {}).get(keyword, {}).get('last_used'),
+                            'cluster': cluster,
                         })
         
-        return keywords
+        return [kw for kw in keywords if not used_by_cluster.get(kw['cluster'], set()) - {kw['keyword']}]
     
     def select_best_keyword(self, keywords: List[Dict]) -> Optional[Dict]:
         """Select the best keyword based on priority, volume, and usage."""
@@ -112,13 +122,21 @@ class KeywordManager:
         
         logger.info(f"Marked keyword '{keyword}' as used")
     
-    def get_keyword_stats(self) -> Dict:
-        """Get comprehensive keyword usage statistics."""
+    def get_keyword_stats(self, stale_days: int = 30) -> Dict:
+        """Get comprehensive keyword usage statistics.
+        
+        Post counts and last use come from the tracker's rollups, so only the keyword CSV is read.
+        """
+        from tracker_rollups import TrackerRollups
+        rollups = TrackerRollups.load(self.tracker_data)
+        posts_by_keyword = rollups.data['by_keyword']
+        
         stats = {
             'total_keywords': 0,
             'publishable_keywords': 0,
             'overused_keywords': 0,
             'never_used_keywords': 0,
+            'stale_keywords': len(rollups.unused_for(stale_days)),
             'usage_by_priority': {'high': 0, 'medium': 0, 'low': 0}
         }
         
@@ -132,7 +150,7 @@ class KeywordManager:
                 keyword = row['keyword'].strip()
                 priority = row.get('priority', 'medium').strip()
                 
-                usage_count = self.tracker_data.get('keywords', {}).get(keyword, {}).get('usage_count', 0)
+                usage_count = posts_by_keyword.get(keyword, 0)
                 
                 if row.get('publish', '').lower() == 'yes' and usage_count < 3:
                     stats['publishable_keywords'] += 1
@@ -178,6 +196,43 @@ class KeywordManager:
         
         return [kw['keyword'] for kw in keywords[:count]]
     
+    def cluster_keywords(self, threshold: Optional[float] = None, dry_run: bool = False) -> Dict:
+        """Group near-synonymous keywords and write each one's canonical keyword to a `cluster` column."""
+        from keyword_clusters import CLUSTER_THRESHOLD, cluster_keywords
+        
+        if not self.keywords_path.exists():
+            logger.error(f"Keywords file not found: {self.keywords_path}")
+            return {'keywords': 0, 'clusters': 0, 'merged': {}}
+        
+        with open(self.keywords_path, 'r', newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            fieldnames = list(reader.fieldnames or [])
+            rows = [row for row in reader if (row.get('keyword') or '').strip()]
+        
+        assignment = cluster_keywords(rows, threshold if threshold is not None else CLUSTER_THRESHOLD)
+        members: Dict[str, List[str]] = {}
+        for keyword, canonical in assignment.items():
+            members.setdefault(canonical, []).append(keyword)
+        for row in rows:
+            row['cluster'] = assignment[row['keyword'].strip()]
+        
+        if not dry_run:
+            if 'cluster' not in fieldnames:
+                fieldnames.append('cluster')
+            tmp_path = self.keywords_path.with_suffix('.csv.tmp')
+            with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=fieldnames)
+                writer.writeheader()
+                writer.writerows(rows)
+            os.replace(tmp_path, self.keywords_path)
+        
+        return {
+            'keywords': len(assignment),
+            'clusters': len(members),
+            'merged': {canonical: [kw for kw in keywords if kw != canonical]
+                       for canonical, keywords in members.items() if len(keywords) > 1},
+        }
+    
     def reset_keyword_usage(self, keyword: str) -> bool:
         """Reset usage count for a keyword (admin function)."""
         if keyword in self.tracker_data.get('keywords', {}):
@@ -200,11 +255,12 @@ class KeywordManager:
 def main():
     """CLI interface for keyword management."""
     import sys
+    import time
     
     manager = KeywordManager()
     
     if len(sys.argv) < 2:
-        print("Usage: python keyword_manager.py [stats|suggest|reset <keyword>]")
+        print("Usage: python keyword_manager.py [stats|suggest|reset <keyword>|cluster [--threshold X] [--dry-run]]")
         return 1
     
     command = sys.argv[1]
@@ -216,6 +272,7 @@ def main():
         print(f"Publishable keywords: {stats['publishable_keywords']}")
         print(f"Overused keywords: {stats['overused_keywords']}")
         print(f"Never used keywords: {stats['never_used_keywords']}")
+        print(f"Unused for 30+ days: {stats['stale_keywords']}")
         print(f"\nUsage by priority:")
         for priority, count in stats['usage_by_priority'].items():
             print(f"  {priority}: {count}")
@@ -226,6 +283,18 @@ def main():
         for kw in suggestions:
             print(f"  - {kw}")
         
+    elif command == 'cluster':
+        threshold = float(sys.argv[sys.argv.index('--threshold') + 1]) if '--threshold' in sys.argv else None
+        started = time.perf_counter()
+        result = manager.cluster_keywords(threshold, dry_run='--dry-run' in sys.argv)
+        elapsed = time.perf_counter() - started
+        print(f"\n[CLUSTER] {result['keywords']} keywords in {result['clusters']} clusters ({elapsed:.2f}s)")
+        largest = sorted(result['merged'].items(), key=lambda item: (-len(item[1]), item[0]))
+        for canonical, merged in largest[:20]:
+            print(f"  {canonical} <- {', '.join(merged)}")
+        if '--dry-run' not in sys.argv:
+            print(f"Wrote cluster column to {manager.keywords_path}")
+        
     elif command == 'reset' and len(sys.argv) == 3:
         keyword = sys.argv[2]
         if manager.reset_keyword_usage(keyword):
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Affiliate Link Health Checker for SmartPetBuys
+Resolves every catalog affiliate link and product image, plus the links and images embedded in post
+bodies, concurrently over pooled connections, recording redirect chains and caching results.
+"""
+
+import asyncio
+import json
+import os
+import re
+import ssl
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+from content_audit import iter_post_files
+from frontmatter_io import split_frontmatter
+from site_config import DEFAULT_SITE, SiteConfig, shared_catalog
+
+CACHE_PATH = ".cache/link_health.json"
+CACHE_VERSION = 1
+
+# Healthy links are re-probed daily; broken or unreachable ones sooner, so fixes show up quickly
+OK_TTL = 24 * 3600
+FAILURE_TTL = 3600
+
+CONCURRENCY = 50
+PER_HOST = 8
+TIMEOUT = 10.0
+MAX_REDIRECTS = 10
+
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+# Servers that refuse HEAD (or answer it differently) get a one-byte ranged GET instead
+HEAD_REFUSED = {400, 403, 405, 501}
+# Rate limiting says nothing about the link itself; such results are reported but never cached
+THROTTLED = {429, 503}
+
+USER_AGENT = "SmartPetBuys-LinkCheck/1.0 (+https://www.smartpetbuys.com)"
+
+# Links and images in post bodies: HTML href/src attributes and Markdown links/images
+BODY_URL = re.compile(r'''(?:href|src)=["'](https?://[^"']+)["']|\]\((https?://[^)\s]+)''')
+
+
+def catalog_urls(site: SiteConfig = DEFAULT_SITE) -> Dict[str, List[str]]:
+    """Affiliate link and image URLs of every catalog product, mapped to where they are used."""
+    sources: Dict[str, List[str]] = {}
+    catalog = shared_catalog(site)
+    products = catalog.iter_products() if hasattr(catalog, 'iter_products') else catalog.values()
+    for product in products:
+        for field in ('url', 'image'):
+            url = getattr(product, field)
+            if url.startswith(('http://', 'https://')):
+                sources.setdefault(url, []).append(f"product:{product.id}:{field}")
+    return sources
+
+
+def post_urls(site: SiteConfig = DEFAULT_SITE) -> Dict[str, List[str]]:
+    """Absolute link and image URLs in post bodies, mapped to the posts that use them."""
+    sources: Dict[str, List[str]] = {}
+    for path, _ in iter_post_files(str(site.posts_path)):
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            _, _, body = split_frontmatter(f.read())
+        relative = site.relative(path)
+        for match in BODY_URL.finditer(body):
+            url = match.group(1) or match.group(2)
+            uses = sources.setdefault(url, [])
+            if relative not in uses:
+                uses.append(relative)
+    return sources
+
+
+class ConnectionPool:
+    """Idle keep-alive connections per (scheme, host, port), plus a per-host concurrency cap."""
+
+    def __init__(self, per_host: int = PER_HOST):
+        self.per_host = per_host
+        self.opened = 0
+        self._idle: Dict[Tuple[str, str, int], List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]]] = {}
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+        self._ssl: Optional[ssl.SSLContext] = None
+
+    def slot(self, host: str) -> asyncio.Semaphore:
+        if host not in self._slots:
+            self._slots[host] = asyncio.Semaphore(self.per_host)
+        return self._slots[host]
+
+    async def connect(self, key: Tuple[str, str, int], fresh: bool = False):
+        """(reader, writer, reused) for key, reusing an idle connection unless fresh is requested."""
+        idle = self._idle.get(key)
+        while idle and not fresh:
+            reader, writer = idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer, True
+            writer.close()
+        scheme, host, port = key
+        context = None
+        if scheme == 'https':
+            self._ssl = self._ssl or ssl.create_default_context()
+            context = self._ssl
+        reader, writer = await asyncio.open_connection(host, port, ssl=context,
+                                                       server_hostname=host if context else None)
+        self.opened += 1
+        return reader, writer, False
+
+    def release(self, key: Tuple[str, str, int], reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._idle.setdefault(key, []).append((reader, writer))
+
+    async def close(self):
+        for connections in self._idle.values():
+            for _, writer in connections:
+                writer.close()
+        self._idle.clear()
+
+
+class LinkChecker:
+    """Probes URLs with HEAD (ranged GET fallback), following redirects, with a TTL result cache."""
+
+    def __init__(self, cache_path: Optional[str] = CACHE_PATH, concurrency: int = CONCURRENCY,
+                 per_host: int = PER_HOST, timeout: float = TIMEOUT, ok_ttl: float = OK_TTL,
+                 failure_ttl: float = FAILURE_TTL):
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        self.ok_ttl = ok_ttl
+        self.failure_ttl = failure_ttl
+        self.stats = {'probed': 0, 'cached': 0, 'requests': 0, 'connections': 0}
+
+    def _load_cache(self) -> Dict[str, Dict]:
+        if self.cache_path and self.cache_path.exists():
+            try:
+                with open(self.cache_path, 'r', encoding='utf-8') as f:
+                    cache = json.load(f)
+                if cache.get('version') == CACHE_VERSION:
+                    return cache['results']
+            except (json.JSONDecodeError, KeyError):
+                pass
+        return {}
+
+    def _save_cache(self, results: Dict[str, Dict]):
+        if not self.cache_path:
+            return
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': CACHE_VERSION, 'results': results}, f, separators=(',', ':'))
+        os.replace(tmp_path, self.cache_path)
+
+    def _fresh(self, result: Optional[Dict], now: float) -> bool:
+        if not result or result['state'] == 'throttled':
+            return False
+        ttl = self.ok_ttl if result['state'] == 'ok' else self.failure_ttl
+        return now - result['checked'] < ttl
+
+    async def _request(self, pool: ConnectionPool, method: str, url: str) -> Tuple[int, Dict[str, str]]:
+        """Send one request and return (status, lowercased headers) without reading a GET body."""
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        port = parts.port or (443 if scheme == 'https' else 80)
+        key = (scheme, parts.hostname or '', port)
+        target = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+        lines = [f"{method} {target} HTTP/1.1", f"Host: {parts.netloc}", f"User-Agent: {USER_AGENT}", "Accept: */*"]
+        if method == 'GET':
+            lines.append("Range: bytes=0-0")
+        request = '\r\n'.join(lines) + '\r\n\r\n'
+
+        for attempt in range(2):
+            reader, writer, reused = await pool.connect(key, fresh=attempt > 0)
+            try:
+                writer.write(request.encode('latin-1'))
+                await writer.drain()
+                status_line = await reader.readline()
+                if not status_line:
+                    raise ConnectionResetError("connection closed before response")
+                status = int(status_line.split()[1])
+                headers = {}
+                while True:
+                    line = (await reader.readline()).decode('latin-1').strip()
+                    if not line:
+                        break
+                    name, _, value = line.partition(':')
+                    headers[name.strip().lower()] = value.strip()
+            except asyncio.CancelledError:
+                # Timed out (wait_for cancels us): the half-used connection cannot be reused
+                writer.close()
+                raise
+            except (OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+                writer.close()
+                if reused and attempt == 0:
+                    continue  # the server dropped an idle connection; retry on a new one
+                raise
+            self.stats['requests'] += 1
+            # HEAD responses carry no body, so the connection can be reused straight away
+            if method == 'HEAD' and headers.get('connection', '').lower() != 'close':
+                pool.release(key, reader, writer)
+            else:
+                writer.close()
+            return status, headers
+        raise ConnectionResetError("connection closed before response")
+
+    async def probe(self, pool: ConnectionPool, url: str) -> Dict:
+        """Resolve url through its redirects; the result records every hop."""
+        chain: List[Dict] = []
+        current, error, status, looped = url, None, None, False
+        try:
+            for _ in range(MAX_REDIRECTS + 1):
+                host = urlsplit(current).hostname or ''
+                async with pool.slot(host):
+                    status, headers = await asyncio.wait_for(self._request(pool, 'HEAD', current), self.timeout)
+                    if status in HEAD_REFUSED:
+                        status, headers = await asyncio.wait_for(self._request(pool, 'GET', current), self.timeout)
+                chain.append({'url': current, 'status': status})
+                location = headers.get('location')
+                if status not in REDIRECT_STATUSES or not location:
+                    break
+                current = urljoin(current, location)
+            else:
+                error, looped = f"more than {MAX_REDIRECTS} redirects", True
+        except asyncio.TimeoutError:
+            error = f"timed out after {self.timeout:.0f}s"
+        except (OSError, ValueError, IndexError) as e:
+            error = f"{type(e).__name__}: {e}"
+
+        if error:
+            state = 'broken' if looped else 'unreachable'
+        elif status in THROTTLED:
+            state = 'throttled'
+        else:
+            state = 'ok' if status < 400 else 'broken'
+        return {'state': state, 'status': status, 'final_url': current, 'chain': chain,
+                'error': error, 'checked': time.time()}
+
+    async def _probe_all(self, urls: List[str]) -> Dict[str, Dict]:
+        pool = ConnectionPool(self.per_host)
+        limit = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(url):
+            async with limit:
+                return url, await self.probe(pool, url)
+
+        try:
+            return dict(await asyncio.gather(*(bounded(url) for url in urls)))
+        finally:
+            self.stats['connections'] += pool.opened
+            await pool.close()
+
+    def check(self, urls, force: bool = False) -> Dict[str, Dict]:
+        """Results for every URL, probing only those without a fresh cached result."""
+        cache = self._load_cache()
+        now = time.time()
+        results = {url: cache[url] for url in urls if not force and self._fresh(cache.get(url), now)}
+        pending = [url for url in urls if url not in results]
+        self.stats['cached'] += len(results)
+        self.stats['probed'] += len(pending)
+
+        if pending:
+            probed = asyncio.run(self._probe_all(pending))
+            results.update(probed)
+            cache.update((url, result) for url, result in probed.items() if result['state'] != 'throttled')
+            # Forget links nothing references any more once they have expired anyway
+            cache = {url: result for url, result in cache.items() if url in results or self._fresh(result, now)}
+            self._save_cache(cache)
+        return results
+
+
+def check_site(site: SiteConfig = DEFAULT_SITE, catalog: bool = True, posts: bool = True,
+               force: bool = False, checker: Optional[LinkChecker] = None) -> Dict:
+    """Check catalog and/or post URLs and summarize problems with where each URL is used."""
+    started = time.perf_counter()
+    sources: Dict[str, List[str]] = {}
+    for collected in ((catalog_urls(site) if catalog else {}), (post_urls(site) if posts else {})):
+        for url, uses in collected.items():
+            sources.setdefault(url, []).extend(uses)
+
+    checker = checker or LinkChecker(str(site.path(CACHE_PATH)))
+    results = checker.check(list(sources), force=force)
+    problems = [{'url': url, **result, 'used_by': sources[url]}
+                for url, result in sorted(results.items()) if result['state'] != 'ok']
+    return {
+        'urls': len(sources),
+        'ok': sum(1 for result in results.values() if result['state'] == 'ok'),
+        'redirected': sum(1 for result in results.values() if len(result['chain']) > 1),
+        'problems': problems,
+        **checker.stats,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def main():
+    """CLI interface for link health checks."""
+    args = sys.argv[1:]
+    if '--help' in args:
+        print("Usage: python link_health.py [--catalog-only|--posts-only] [--force] "
+              "[--concurrency N] [--json]")
+        return 0
+    concurrency = int(args[args.index('--concurrency') + 1]) if '--concurrency' in args else CONCURRENCY
+
+    report = check_site(catalog='--posts-only' not in args, posts='--catalog-only' not in args,
+                        force='--force' in args, checker=LinkChecker(concurrency=concurrency))
+
+    if '--json' in args:
+        print(json.dumps(report, indent=2))
+    else:
+        print("\n[LINKS] Affiliate link and image health")
+        print(f"URLs: {report['urls']} ({report['probed']} probed, {report['cached']} from cache)")
+        print(f"Healthy: {report['ok']} ({report['redirected']} via redirects)")
+        print(f"Problems: {len(report['problems'])}")
+        print(f"Requests: {report['requests']} over {report['connections']} connections")
+        print(f"Elapsed: {report['elapsed_ms']:.0f} ms")
+        for problem in report['problems']:
+            detail = problem['error'] or f"HTTP {problem['status']}"
+            hops = ' -> '.join(str(hop['status']) for hop in problem['chain'])
+            print(f"  - [{problem['state']}] {problem['url']}: {detail}{f' ({hops})' if hops else ''}")
+            print(f"      used by: {', '.join(problem['used_by'][:5])}")
+
+    return 1 if any(problem['state'] != 'throttled' for problem in report['problems']) else 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+LLM Usage Ledger for SmartPetBuys
+Appends one record per generation call and summarizes latency and token usage.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from request_controller import percentile
+
+LEDGER_PATH = "logs/llm_usage.jsonl"
+PROMETHEUS_PATH = "logs/llm_usage.prom"
+
+WINDOW_PATTERN = re.compile(r'^(\d+)([mhdw])$')
+WINDOW_UNITS = {'m': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+QUANTILES = (0.5, 0.95, 0.99)
+
+_append_lock = threading.Lock()
+
+
+def record_call(record: Dict, ledger_path: str = LEDGER_PATH):
+    """Append one call record as a single JSON line."""
+    entry = {'ts': datetime.now(timezone.utc).isoformat(timespec='seconds'), **record}
+    line = json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+    path = Path(ledger_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # One write per record on an O_APPEND file keeps concurrent writers from interleaving lines
+    with _append_lock, open(path, 'a', encoding='utf-8') as f:
+        f.write(line)
+
+
+def parse_window(window: str) -> float:
+    """Parse a window such as '30m', '24h', '7d' or '2w' into seconds."""
+    match = WINDOW_PATTERN.match(window.strip())
+    if not match:
+        raise ValueError(f"Invalid window '{window}' (use e.g. 30m, 24h, 7d, 2w)")
+    return int(match.group(1)) * WINDOW_UNITS[match.group(2)]
+
+
+def iter_records(ledger_path: str = LEDGER_PATH, since: Optional[float] = None) -> Iterator[Dict]:
+    """Stream ledger records, optionally only those at or after a Unix timestamp."""
+    path = Path(ledger_path)
+    if not path.exists():
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a torn final line from an interrupted write
+            if since is not None and datetime.fromisoformat(record['ts']).timestamp() < since:
+                continue
+            yield record
+
+
+def summarize(records: Iterator[Dict]) -> Dict:
+    """Aggregate latency percentiles, outcomes and token usage per generated post."""
+    latencies: List[float] = []
+    outcomes: Dict[str, int] = {}
+    totals = {'calls': 0, 'attempts': 0, 'hedged': 0, 'prompt_tokens': 0, 'completion_tokens': 0,
+              'cached_tokens': 0}
+    posts = 0
+
+    for record in records:
+        totals['calls'] += 1
+        totals['attempts'] += record.get('attempts', 0)
+        totals['hedged'] += 1 if record.get('hedged') else 0
+        outcome = record.get('outcome', 'unknown')
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        if outcome == 'ok':
+            posts += 1
+            latencies.append(record['latency_ms'])
+            for field in ('prompt_tokens', 'completion_tokens', 'cached_tokens'):
+                totals[field] += record.get(field) or 0
+
+    latencies.sort()
+    summary = {
+        **totals,
+        'posts': posts,
+        'outcomes': outcomes,
+        'latency_ms': {f"p{int(q * 100)}": percentile(latencies, q) if latencies else None for q in QUANTILES},
+        'latency_sum_ms': round(sum(latencies), 1),
+        'tokens_per_post': {
+            field: round(totals[field] / posts, 1) if posts else None
+            for field in ('prompt_tokens', 'completion_tokens', 'cached_tokens')
+        },
+    }
+    return summary
+
+
+def write_prometheus(ledger_path: str = LEDGER_PATH, output_path: str = PROMETHEUS_PATH,
+                     window: str = '24h') -> str:
+    """Write a node_exporter textfile: lifetime counters plus latency quantiles over the window."""
+    lifetime = summarize(iter_records(ledger_path))
+    recent = summarize(iter_records(ledger_path, since=time.time() - parse_window(window)))
+
+    lines = [
+        '# HELP smartpetbuys_llm_calls_total Generation calls by outcome.',
+        '# TYPE smartpetbuys_llm_calls_total counter',
+    ]
+    for outcome, count in sorted(lifetime['outcomes'].items()):
+        lines.append(f'smartpetbuys_llm_calls_total{{outcome="{outcome}"}} {count}')
+    lines += [
+        '# HELP smartpetbuys_llm_attempts_total Provider requests including retries.',
+        '# TYPE smartpetbuys_llm_attempts_total counter',
+        f"smartpetbuys_llm_attempts_total {lifetime['attempts']}",
+        '# HELP smartpetbuys_llm_hedged_total Calls that sent a hedge request.',
+        '# TYPE smartpetbuys_llm_hedged_total counter',
+        f"smartpetbuys_llm_hedged_total {lifetime['hedged']}",
+        '# HELP smartpetbuys_llm_tokens_total Tokens used by successful calls.',
+        '# TYPE smartpetbuys_llm_tokens_total counter',
+    ]
+    for kind in ('prompt', 'completion', 'cached'):
+        lines.append(f'smartpetbuys_llm_tokens_total{{type="{kind}"}} {lifetime[f"{kind}_tokens"]}')
+    lines += [
+        f'# HELP smartpetbuys_llm_latency_seconds Successful call latency (quantiles over the last {window}).',
+        '# TYPE smartpetbuys_llm_latency_seconds summary',
+    ]
+    for quantile in QUANTILES:
+        value = recent['latency_ms'][f"p{int(quantile * 100)}"]
+        lines.append(f'smartpetbuys_llm_latency_seconds{{quantile="{quantile}"}} '
+                     f'{value / 1000 if value is not None else "NaN"}')
+    # Summary _sum/_count are counters: lifetime totals, so rate() never sees a reset when old calls age out
+    lines += [
+        f"smartpetbuys_llm_latency_seconds_sum {lifetime['latency_sum_ms'] / 1000}",
+        f"smartpetbuys_llm_latency_seconds_count {lifetime['posts']}",
+    ]
+
+    # node_exporter may read the file at any moment, so replace it atomically
+    path = Path(output_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.replace(tmp_path, path)
+    return str(path)
+
+
+def main():
+    """CLI interface for the usage ledger."""
+    import sys
+
+    args = [arg for arg in sys.argv[1:] if arg != '--json']
+    window = None
+    if '--since' in args:
+        index = args.index('--since')
+        if index + 1 >= len(args):
+            print("--since needs a window such as 24h or 7d")
+            return 1
+        window = args[index + 1]
+        del args[index:index + 2]
+
+    if not args or args[0] not in ('summary', 'prometheus'):
+        print("Usage: python llm_ledger.py [summary [--json]|prometheus [output.prom]] [--since 24h]")
+        return 1
+
+    try:
+        since = time.time() - parse_window(window) if window else None
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        return 1
+
+    if args[0] == 'summary':
+        summary = summarize(iter_records(since=since))
+        if '--json' in sys.argv:
+            print(json.dumps(summary, indent=2))
+            return 0
+
+        print(f"\n[LEDGER] LLM usage {'over the last ' + window if window else '(all time)'}:")
+        print(f"Calls: {summary['calls']} ({summary['attempts']} attempts, {summary['hedged']} hedged)")
+        print("Outcomes: " + (', '.join(f"{outcome} {count}" for outcome, count in
+                                        sorted(summary['outcomes'].items())) or 'none'))
+        latency = summary['latency_ms']
+        if summary['posts']:
+            print(f"Latency: p50 {latency['p50']:.0f} ms, p95 {latency['p95']:.0f} ms, p99 {latency['p99']:.0f} ms")
+            per_post = summary['tokens_per_post']
+            print(f"Tokens per post: {per_post['prompt_tokens']:.0f} prompt, "
+                  f"{per_post['completion_tokens']:.0f} completion, {per_post['cached_tokens']:.0f} cached")
+    else:
+        output = args[1] if len(args) > 1 else PROMETHEUS_PATH
+        print(f"Wrote {write_prometheus(output_path=output, window=window or '24h')}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Phrase Index for SmartPetBuys
+Persistent phrase -> posting-list index with document frequencies, used to score content overlap
+between a draft and every existing post in one pass while ignoring shared template boilerplate.
+"""
+
+import json
+import os
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from content_audit import POSTS_DIR, iter_post_files
+from frontmatter_io import parse_header, split_frontmatter
+from title_index import normalize_text
+
+CACHE_PATH = ".cache/phrase_index.json"
+INDEX_VERSION = 1
+
+# Phrases in more than this share of posts (and at least BOILERPLATE_MIN_DOCS of them) come from the
+# prompt scaffolding ("top product recommendations", product-card markup) and are not evidence of copying
+BOILERPLATE_DF = 0.25
+BOILERPLATE_MIN_DOCS = 5
+
+# Rebuild postings once this share of document slots are tombstones from edits and deletions
+COMPACT_RATIO = 0.25
+
+
+def extract_phrases(text: str) -> Set[str]:
+    """Normalized two- and three-word phrases of a text."""
+    words = normalize_text(text).split()
+    phrases = set()
+    for i in range(len(words) - 1):
+        phrase = f"{words[i]} {words[i + 1]}"
+        if len(phrase) > 6:  # Skip very short phrases
+            phrases.add(phrase)
+        if i < len(words) - 2:
+            phrase = f"{phrase} {words[i + 2]}"
+            if len(phrase) > 10:
+                phrases.add(phrase)
+    return phrases
+
+
+def read_post(path: str, text: Optional[str] = None) -> Tuple[str, str]:
+    """Return (title, body) of a post file (or of its already-read text)."""
+    if text is None:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            text = f.read()
+    fmt, header, body = split_frontmatter(text)
+    return str(parse_header(fmt, header, ('title',)).get('title', '') or ''), body
+
+
+class PhraseIndex:
+    """Phrase postings over post bodies, refreshed incrementally from file mtimes and sizes.
+
+    Given an open corpus archive, refresh() lists and reads posts from the pack instead of the tree.
+    """
+
+    def __init__(self, posts_dir: str = POSTS_DIR, cache_path: Optional[str] = CACHE_PATH, archive=None):
+        self.posts_dir = posts_dir
+        self.archive = archive
+        self.cache_path = Path(cache_path) if cache_path else None
+        # Document slots: [key, title, mtime_ns, size, phrase count] or None once removed
+        self.docs: List[Optional[list]] = []
+        self.by_key: Dict[str, int] = {}
+        self.postings: Dict[str, List[int]] = {}
+        # (cutoff, boilerplate phrase -> live document frequency, boilerplate phrases per document)
+        self._boilerplate_cache: Optional[Tuple[int, Dict[str, int], Counter]] = None
+
+    def __len__(self) -> int:
+        return len(self.by_key)
+
+    def load(self) -> bool:
+        """Load the persisted index; returns False when there is none (or it is from another version)."""
+        if not self.cache_path or not self.cache_path.exists():
+            return False
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            return False
+        if cache.get('version') != INDEX_VERSION:
+            return False
+
+        self.docs = cache['docs']
+        self.postings = cache['postings']
+        self.by_key = {doc[0]: doc_id for doc_id, doc in enumerate(self.docs) if doc}
+        self._boilerplate_cache = None
+        return True
+
+    def save(self):
+        if not self.cache_path:
+            return
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': INDEX_VERSION, 'docs': self.docs, 'postings': self.postings}, f,
+                      ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.cache_path)
+
+    def add(self, key: str, title: str, phrases: Iterable[str], mtime_ns: int = 0, size: int = 0) -> int:
+        """Index one post's phrases (replacing any previous version under the same key)."""
+        if key in self.by_key:
+            self.remove(key)
+        phrases = set(phrases)
+        doc_id = len(self.docs)
+        self.docs.append([key, title, mtime_ns, size, len(phrases)])
+        self.by_key[key] = doc_id
+        for phrase in phrases:
+            self.postings.setdefault(phrase, []).append(doc_id)
+        self._boilerplate_cache = None
+        return doc_id
+
+    def remove(self, key: str):
+        """Tombstone a document; its postings are dropped at the next compaction."""
+        self.docs[self.by_key.pop(key)] = None
+        self._boilerplate_cache = None
+
+    def compact(self):
+        """Renumber live documents and drop tombstoned ids from every posting list."""
+        renumbered = {}
+        docs = []
+        for doc_id, doc in enumerate(self.docs):
+            if doc:
+                renumbered[doc_id] = len(docs)
+                docs.append(doc)
+        postings = {}
+        for phrase, ids in self.postings.items():
+            live = [renumbered[doc_id] for doc_id in ids if doc_id in renumbered]
+            if live:
+                postings[phrase] = live
+        self.docs, self.postings = docs, postings
+        self.by_key = {doc[0]: doc_id for doc_id, doc in enumerate(docs)}
+        self._boilerplate_cache = None
+
+    def refresh(self) -> Dict[str, int]:
+        """Sync with the posts directory, re-reading only new or changed files."""
+        if not self.docs:
+            self.load()
+        seen = set()
+        changes = {'added': 0, 'updated': 0, 'removed': 0}
+
+        listing = self.archive.iter_post_files() if self.archive is not None else iter_post_files(self.posts_dir)
+        for path, stat in listing:
+            key = Path(path).as_posix()
+            seen.add(key)
+            doc_id = self.by_key.get(key)
+            if doc_id is not None:
+                doc = self.docs[doc_id]
+                if doc[2] == stat.st_mtime_ns and doc[3] == stat.st_size:
+                    continue
+            try:
+                title, body = read_post(path, self.archive.text(path) if self.archive is not None else None)
+            except OSError:
+                continue
+            changes['updated' if doc_id is not None else 'added'] += 1
+            self.add(key, title, extract_phrases(body), stat.st_mtime_ns, stat.st_size)
+
+        for key in [key for key in self.by_key if key not in seen]:
+            self.remove(key)
+            changes['removed'] += 1
+
+        if any(changes.values()):
+            if len(self.docs) - len(self.by_key) > COMPACT_RATIO * len(self.docs):
+                self.compact()
+            self.save()
+        return changes
+
+    def df_cutoff(self) -> int:
+        """Highest document frequency a phrase may have and still count as evidence of overlap."""
+        return max(BOILERPLATE_MIN_DOCS, int(BOILERPLATE_DF * len(self.by_key)))
+
+    def boilerplate(self, limit: int = 20) -> List[Tuple[str, int]]:
+        """Most widespread phrases above the cutoff: [(phrase, document frequency)]."""
+        common = sorted(self._boilerplate()[0].items(), key=lambda item: (-item[1], item[0]))
+        return common[:limit]
+
+    def _boilerplate(self) -> Tuple[Dict[str, int], Counter]:
+        """Boilerplate phrases with their document frequencies, and the number of them in each document.
+
+        Posting lists keep the ids of edited and deleted posts until the next compaction, so only live
+        documents are counted. Cached until the index changes.
+        """
+        cutoff = self.df_cutoff()
+        if self._boilerplate_cache is None or self._boilerplate_cache[0] != cutoff:
+            frequencies: Dict[str, int] = {}
+            counts: Counter = Counter()
+            for phrase, ids in self.postings.items():
+                # A list no longer than the cutoff cannot hold more live documents than that
+                if len(ids) <= cutoff:
+                    continue
+                live = [doc_id for doc_id in ids if self.docs[doc_id] is not None]
+                if len(live) > cutoff:
+                    frequencies[phrase] = len(live)
+                    counts.update(live)
+            self._boilerplate_cache = (cutoff, frequencies, counts)
+        return self._boilerplate_cache[1], self._boilerplate_cache[2]
+
+    def overlaps(self, phrases: Iterable[str], min_overlap: int = 1) -> List[Tuple[float, int, str, str]]:
+        """Posts sharing non-boilerplate phrases with a draft: [(overlap ratio, shared phrases, key, title)].
+
+        The ratio divides by the smaller of the two non-boilerplate phrase counts, as the pairwise
+        comparison did; the draft's phrases are scanned once against the postings.
+        """
+        boilerplate, per_doc = self._boilerplate()
+        counts: Counter = Counter()
+        kept = 0
+        for phrase in phrases:
+            if phrase in boilerplate:
+                continue
+            kept += 1
+            ids = self.postings.get(phrase)
+            if ids:
+                counts.update(ids)
+
+        if not counts:
+            return []
+        results = []
+        for doc_id, overlap in counts.items():
+            doc = self.docs[doc_id]
+            if doc is None or overlap < min_overlap:
+                continue
+            doc_phrases = doc[4] - per_doc.get(doc_id, 0)
+            ratio = overlap / max(1, min(kept, doc_phrases))
+            results.append((ratio, overlap, doc[0], doc[1]))
+
+        results.sort(key=lambda item: (-item[0], -item[1], item[2]))
+        return results
@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+"""
+Product Catalog Model for SmartPetBuys
+Typed, compact product records plus a memory-mapped, offset-indexed catalog for large product sets.
+"""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Mapping, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+PRODUCTS_PATH = "data/products.json"
+CATALOG_PATH = "catalog/products.jsonl"
+
+# Index layout: header, then fixed-width (id hash, byte offset, byte length) entries sorted by hash
+INDEX_MAGIC = b'SPBIDX01'
+INDEX_HEADER = struct.Struct('<8sQQII')
+INDEX_ENTRY = struct.Struct('<QQI')
+
+_ID_PREFIX = re.compile(rb'^\{"id":\s*("(?:[^"\\]|\\.)*")')
+
+_NON_NUMERIC = re.compile(r'[^0-9.]')
+
+
+def parse_price(value) -> Optional[float]:
+    """Parse a price such as '89.99' or '$1,299.00'."""
+    if value in (None, ''):
+        return None
+    try:
+        price = float(_NON_NUMERIC.sub('', str(value)))
+    except ValueError:
+        return None
+    return price if price > 0 else None
+
+
+def parse_rating(value) -> Optional[float]:
+    """Parse a star rating, rejecting values outside 1-5."""
+    if value in (None, ''):
+        return None
+    try:
+        rating = float(value)
+    except (TypeError, ValueError):
+        return None
+    return rating if 1.0 <= rating <= 5.0 else None
+
+
+def parse_review_count(value) -> Optional[int]:
+    """Parse a review count such as '1,247' or '1,000+'."""
+    if value in (None, ''):
+        return None
+    digits = re.sub(r'[^0-9]', '', str(value))
+    return int(digits) if digits else None
+
+
+@dataclass(frozen=True, slots=True)
+class Product:
+    """A catalog product with numeric fields parsed and search text precomputed."""
+
+    id: str
+    name: str
+    url: str
+    image: str
+    blurb: str
+    brand: str
+    category: str
+    price: Optional[float]
+    rating: Optional[float]
+    review_count: Optional[int]
+    search_text: str
+    # The entry as loaded, written back unchanged so untouched products survive a catalog rewrite
+    raw: Optional[Dict] = field(default=None, compare=False, repr=False)
+
+    @classmethod
+    def from_dict(cls, product_id: str, data: Dict) -> "Product":
+        """Build a Product from a raw products.json entry."""
+        name = data.get('name', '').strip()
+        blurb = data.get('blurb', '').strip()
+        brand = (data.get('brand') or '').strip()
+        category = product_id.rsplit('-', 1)[0].lower() if '-' in product_id else product_id.lower()
+
+        return cls(
+            id=product_id,
+            name=name,
+            url=data.get('url', ''),
+            image=data.get('image', ''),
+            blurb=blurb,
+            # Brands and categories repeat across the catalog; share one string object each
+            brand=sys.intern(brand),
+            category=sys.intern(category),
+            price=parse_price(data.get('price')),
+            rating=parse_rating(data.get('rating')),
+            review_count=parse_review_count(data.get('review_count')),
+            search_text=f"{name} {blurb}".lower(),
+            raw=data,
+        )
+
+    @property
+    def display_brand(self) -> str:
+        """Brand for display, falling back to the first word of the product name."""
+        if self.brand:
+            return self.brand
+        name_parts = self.name.split()
+        return name_parts[0] if name_parts else ''
+
+    @property
+    def price_text(self) -> str:
+        """Price formatted as in products.json, or empty when unknown."""
+        return f"{self.price:.2f}" if self.price is not None else ''
+
+    @property
+    def rating_text(self) -> str:
+        """Rating formatted as in products.json, or empty when unknown."""
+        return f"{self.rating:.1f}" if self.rating is not None else ''
+
+    @property
+    def review_count_text(self) -> str:
+        """Review count with thousands separators, or empty when unknown."""
+        return f"{self.review_count:,}" if self.review_count is not None else ''
+
+    def to_dict(self, canonical: bool = False) -> Dict:
+        """Serialize back to the products.json entry format used by Hugo.
+
+        Loaded products return their original entry, keeping value formats such as "6,782+" and
+        fields the model does not know; canonical=True rebuilds it with the catalog's number formats.
+        """
+        if self.raw is not None and not canonical:
+            return dict(self.raw)
+        data = {
+            'name': self.name,
+            'url': self.url,
+            'image': self.image,
+            'blurb': self.blurb,
+        }
+        if self.brand:
+            data['brand'] = self.brand
+        if self.rating is not None:
+            data['rating'] = self.rating_text
+        if self.review_count is not None:
+            data['review_count'] = self.review_count_text
+        if self.price is not None:
+            data['price'] = self.price_text
+        return data
+
+
+def load_catalog(products_path: str = PRODUCTS_PATH) -> Dict[str, Product]:
+    """Load products.json into typed Product records keyed by product id."""
+    path = Path(products_path)
+    if not path.exists():
+        return {}
+
+    with open(path, 'r', encoding='utf-8') as f:
+        raw = json.load(f)
+
+    catalog = {}
+    for product_id, data in raw.items():
+        try:
+            catalog[product_id] = Product.from_dict(product_id, data)
+        except (AttributeError, TypeError) as e:
+            logger.warning(f"Skipping malformed product {product_id}: {e}")
+    return catalog
+
+
+def _id_hash(product_id: str) -> int:
+    """Stable 64-bit hash of a product id for the offset index."""
+    return int.from_bytes(hashlib.blake2b(product_id.encode(), digest_size=8).digest(), 'little')
+
+
+def _index_path(catalog_path: Path) -> Path:
+    return catalog_path.with_suffix('.idx')
+
+
+def write_catalog(products: Iterable[Union[Product, tuple]], catalog_path: str = CATALOG_PATH) -> int:
+    """Write products as JSON Lines plus a sidecar offset index, atomically."""
+    path = Path(catalog_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.jsonl.tmp')
+
+    count = 0
+    with open(tmp_path, 'wb') as f:
+        for item in products:
+            product_id, data = (item.id, item.to_dict()) if isinstance(item, Product) else item
+            # "id" goes first so ids can be read without decoding the whole line
+            line = json.dumps({'id': product_id, **data}, ensure_ascii=False, separators=(',', ':'))
+            f.write(line.encode('utf-8') + b'\n')
+            count += 1
+    os.replace(tmp_path, path)
+
+    build_index(str(path))
+    return count
+
+
+def build_index(catalog_path: str = CATALOG_PATH) -> int:
+    """Scan a JSON Lines catalog once and write its offset index."""
+    path = Path(catalog_path)
+    stat = path.stat()
+    entries = []
+
+    with open(path, 'rb') as f:
+        offset = 0
+        for line in f:
+            length = len(line.rstrip(b'\n'))
+            if length:
+                match = _ID_PREFIX.match(line)
+                product_id = json.loads(match.group(1)) if match else json.loads(line)['id']
+                entries.append((_id_hash(product_id), offset, length))
+            offset += len(line)
+
+    entries.sort()
+    index_path = _index_path(path)
+    tmp_path = index_path.with_suffix('.idx.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(INDEX_HEADER.pack(INDEX_MAGIC, stat.st_size, stat.st_mtime_ns, len(entries), 0))
+        for entry in entries:
+            f.write(INDEX_ENTRY.pack(*entry))
+    os.replace(tmp_path, index_path)
+
+    return len(entries)
+
+
+class IndexedCatalog(Mapping):
+    """Read-only product mapping that decodes individual JSON Lines records on demand."""
+
+    def __init__(self, catalog_path: str = CATALOG_PATH, cache_size: int = 1024):
+        self.catalog_path = Path(catalog_path)
+        self.index_path = _index_path(self.catalog_path)
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Product]" = OrderedDict()
+        # Catalogs are shared across sites and worker threads (see site_config.shared_catalog)
+        self._cache_lock = threading.Lock()
+
+        if not self._index_is_current():
+            logger.info(f"Rebuilding stale product index {self.index_path}")
+            build_index(str(self.catalog_path))
+
+        self._data_file = open(self.catalog_path, 'rb')
+        self._index_file = open(self.index_path, 'rb')
+        self._data = self._map(self._data_file)
+        self._index = self._map(self._index_file)
+        self._count = INDEX_HEADER.unpack_from(self._index, 0)[3] if self._index else 0
+
+    @staticmethod
+    def _map(f) -> Union[mmap.mmap, bytes]:
+        """Memory-map a file read-only (empty files cannot be mapped)."""
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _index_is_current(self) -> bool:
+        """Check the index header against the catalog file it was built from."""
+        if not self.index_path.exists():
+            return False
+        with open(self.index_path, 'rb') as f:
+            header = f.read(INDEX_HEADER.size)
+        if len(header) < INDEX_HEADER.size:
+            return False
+        magic, size, mtime_ns, _, _ = INDEX_HEADER.unpack(header)
+        stat = self.catalog_path.stat()
+        return magic == INDEX_MAGIC and size == stat.st_size and mtime_ns == stat.st_mtime_ns
+
+    def close(self):
+        """Release the memory maps and file handles."""
+        for handle in (self._data, self._index):
+            if isinstance(handle, mmap.mmap):
+                handle.close()
+        self._data_file.close()
+        self._index_file.close()
+
+    def _entry(self, position: int) -> tuple:
+        return INDEX_ENTRY.unpack_from(self._index, INDEX_HEADER.size + position * INDEX_ENTRY.size)
+
+    def _decode(self, offset: int, length: int) -> Dict:
+        return json.loads(self._data[offset:offset + length])
+
+    def __getitem__(self, product_id: str) -> Product:
+        with self._cache_lock:
+            cached = self._cache.get(product_id)
+            if cached is not None:
+                self._cache.move_to_end(product_id)
+                return cached
+
+        # Binary search the sorted hashes, then confirm the id (hash collisions are adjacent)
+        target = _id_hash(product_id)
+        low, high = 0, self._count
+        while low < high:
+            mid = (low + high) // 2
+            if self._entry(mid)[0] < target:
+                low = mid + 1
+            else:
+                high = mid
+
+        position = low
+        while position < self._count:
+            key_hash, offset, length = self._entry(position)
+            if key_hash != target:
+                break
+            data = self._decode(offset, length)
+            if data.pop('id') == product_id:
+                product = Product.from_dict(product_id, data)
+                with self._cache_lock:
+                    self._cache[product_id] = product
+                    if len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+                return product
+            position += 1
+
+        raise KeyError(product_id)
+
+    def __contains__(self, product_id) -> bool:
+        try:
+            self[product_id]
+        except KeyError:
+            return False
+        return True
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _lines(self) -> Iterator[bytes]:
+        """Iterate raw JSON Lines records in file order."""
+        start = 0
+        end = len(self._data)
+        while start < end:
+            newline = self._data.find(b'\n', start)
+            if newline == -1:
+                newline = end
+            if newline > start:
+                yield self._data[start:newline]
+            start = newline + 1
+
+    def __iter__(self) -> Iterator[str]:
+        for line in self._lines():
+            match = _ID_PREFIX.match(line)
+            yield json.loads(match.group(1)) if match else json.loads(line)['id']
+
+    def iter_products(self) -> Iterator[Product]:
+        """Decode every product sequentially (bypasses the lookup cache)."""
+        for line in self._lines():
+            data = json.loads(line)
+            yield Product.from_dict(data.pop('id'), data)
+
+    def candidates(self, terms: Iterable[str]) -> Iterator[Product]:
+        """Decode only records whose raw text mentions one of the terms (case-insensitive)."""
+        needles = [term.lower().encode('utf-8') for term in terms if term]
+        for line in self._lines():
+            lowered = line.lower()
+            if any(needle in lowered for needle in needles):
+                data = json.loads(line)
+                yield Product.from_dict(data.pop('id'), data)
+
+
+def open_catalog(catalog_path: str = CATALOG_PATH,
+                 products_path: str = PRODUCTS_PATH) -> Mapping[str, Product]:
+    """Open the indexed JSON Lines catalog when present, else load products.json eagerly."""
+    if Path(catalog_path).exists():
+        return IndexedCatalog(catalog_path)
+    return load_catalog(products_path)
+
+
+def write_products_json(entries: Iterable[Tuple[str, Dict]], products_path: str = PRODUCTS_PATH) -> int:
+    """Stream (id, entry) pairs into products.json with a single atomic replace."""
+    path = Path(products_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.json.tmp')
+    count = 0
+
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        # Write one entry at a time so large catalogs are never held in memory as one document
+        f.write('{')
+        for product_id, data in entries:
+            f.write(',\n' if count else '\n')
+            f.write(f"  {json.dumps(product_id)}: ")
+            entry = json.dumps(data, indent=2, ensure_ascii=False)
+            f.write(entry.replace('\n', '\n  '))
+            count += 1
+        f.write('\n}\n' if count else '}\n')
+
+    os.replace(tmp_path, path)
+    return count
+
+
+def export_products_json(catalog_path: str = CATALOG_PATH, products_path: str = PRODUCTS_PATH) -> int:
+    """Export the JSON Lines catalog to products.json for Hugo's site.Data.products."""
+    catalog = IndexedCatalog(catalog_path)
+    try:
+        return write_products_json(((product.id, product.to_dict()) for product in catalog.iter_products()),
+                                   products_path)
+    finally:
+        catalog.close()
+
+
+def main():
+    """CLI interface for the product catalog."""
+    if len(sys.argv) < 2:
+        print("Usage: python product_catalog.py [build|export|index|get <id>|stats]")
+        return 1
+
+    command = sys.argv[1]
+
+    if command == 'build':
+        catalog = load_catalog()
+        count = write_catalog(catalog.values())
+        print(f"[SUCCESS] Wrote {count} products to {CATALOG_PATH} with offset index")
+
+    elif command == 'export':
+        count = export_products_json()
+        print(f"[SUCCESS] Exported {count} products to {PRODUCTS_PATH}")
+
+    elif command == 'index':
+        count = build_index()
+        print(f"[SUCCESS] Indexed {count} products in {CATALOG_PATH}")
+
+    elif command == 'get' and len(sys.argv) == 3:
+        catalog = open_catalog()
+        product_id = sys.argv[2]
+        if product_id not in catalog:
+            print(f"[ERROR] Product not found: {product_id}")
+            return 1
+        print(json.dumps(catalog[product_id].to_dict(), indent=2, ensure_ascii=False))
+
+    elif command == 'stats':
+        catalog = open_catalog()
+        source = CATALOG_PATH if isinstance(catalog, IndexedCatalog) else PRODUCTS_PATH
+        print("\n[STATS] Product Catalog:")
+        print(f"Source: {source}")
+        print(f"Products: {len(catalog)}")
+
+    else:
+        print("Invalid command")
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Content Tracker Reconciliation for SmartPetBuys
+Diffs data/content_tracker.json against the posts on disk and optionally repairs it in one atomic write.
+"""
+
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from content_audit import KEYWORD_FIELDS, iter_post_files, post_keyword
+from frontmatter_io import parse_header, split_frontmatter
+from generate_single_post import ContentTracker, normalize_post_path
+from site_config import DEFAULT_SITE, SiteConfig
+
+CACHE_PATH = ".cache/tracker_reconcile.json"
+
+# Hash changed posts in worker processes only when enough of them changed to pay for the pool
+PARALLEL_THRESHOLD = 256
+BATCH_SIZE = 128
+
+
+def hash_post(path: str, text: Optional[str] = None) -> Tuple[str, Dict]:
+    """Hash a post body the way the generator does (stripped Markdown without frontmatter)."""
+    if text is None:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            text = f.read()
+    fmt, header, body = split_frontmatter(text)
+    metadata = parse_header(fmt, header, KEYWORD_FIELDS + ('date', 'categories'))
+    categories = metadata.get('categories')
+    return path, {
+        'hash': hashlib.sha256(body.strip().encode()).hexdigest(),
+        'title': str(metadata.get('title', '')),
+        'keyword': post_keyword(metadata),
+        'date': str(metadata.get('date', '')),
+        'category': str(categories[0]) if isinstance(categories, list) and categories else '',
+    }
+
+
+def _hash_batch(paths: List[str], archive=None) -> List[Tuple[str, Dict]]:
+    if archive is not None:
+        return [hash_post(path, archive.text(path)) for path in paths]
+    return [hash_post(path) for path in paths]
+
+
+def _hash_archived_batch(args) -> List[Tuple[str, Dict]]:
+    """Hash a batch from the corpus archive, mapped afresh in each worker process."""
+    from corpus_archive import CorpusArchive
+
+    paths, posts_dir, archive_path = args
+    with CorpusArchive(posts_dir, archive_path) as archive:
+        return _hash_batch(paths, archive)
+
+
+class TrackerReconciler:
+    """Compares tracker entries with post files and repairs drift.
+
+    Given an open corpus archive, posts are listed and read from the pack instead of the tree.
+    """
+
+    def __init__(self, posts_dir: Optional[str] = None, tracker_path: Optional[str] = None,
+                 cache_path: Optional[str] = CACHE_PATH, site: SiteConfig = DEFAULT_SITE, archive=None):
+        self.site = site
+        self.posts_dir = posts_dir or str(site.posts_path)
+        self.archive = archive
+        self.tracker = ContentTracker(tracker_path, site=site)
+        self.cache_path = site.path(cache_path) if cache_path else None
+
+    def _load_cache(self) -> Dict:
+        if self.cache_path and self.cache_path.exists():
+            try:
+                with open(self.cache_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except json.JSONDecodeError:
+                pass
+        return {}
+
+    def _save_cache(self, cache: Dict):
+        if not self.cache_path:
+            return
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, separators=(',', ':'))
+        os.replace(tmp_path, self.cache_path)
+
+    def scan(self, workers: Optional[int] = None) -> Tuple[Dict[str, Dict], int]:
+        """Hash every post, skipping files whose mtime and size match the cache; returns (files, rehashed)."""
+        cache = self._load_cache()
+        files: Dict[str, Dict] = {}
+        stale: List[str] = []
+
+        # Files are keyed by their site-relative path, the form the tracker stores
+        listing = self.archive.iter_post_files() if self.archive is not None else iter_post_files(self.posts_dir)
+        for path, stat in listing:
+            key = self.site.relative(path)
+            cached = cache.get(key)
+            if cached and cached['mtime_ns'] == stat.st_mtime_ns and cached['size'] == stat.st_size:
+                files[key] = cached
+            else:
+                files[key] = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+                stale.append(key)
+
+        paths = [str(self.site.path(key)) for key in stale]
+        if len(paths) >= PARALLEL_THRESHOLD:
+            from concurrent.futures import ProcessPoolExecutor
+            batches = [paths[i:i + BATCH_SIZE] for i in range(0, len(paths), BATCH_SIZE)]
+            with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+                if self.archive is not None:
+                    batches = [(batch, self.archive.posts_dir, str(self.archive.pack_path)) for batch in batches]
+                    results = [item for batch in pool.map(_hash_archived_batch, batches) for item in batch]
+                else:
+                    results = [item for batch in pool.map(_hash_batch, batches) for item in batch]
+        else:
+            results = _hash_batch(paths, self.archive)
+
+        for key, (_, info) in zip(stale, results):
+            files[key].update(info)
+
+        self._save_cache(files)
+        return files, len(stale)
+
+    def diff(self, files: Dict[str, Dict]) -> Dict[str, List[Dict]]:
+        """Classify tracker/disk differences."""
+        report = {'path_normalized': [], 'missing': [], 'hash_mismatch': [], 'untracked': []}
+        tracked_paths = set()
+
+        for post_id, post in self.tracker.data.get('posts', {}).items():
+            recorded = post.get('file_path', '')
+            path = normalize_post_path(recorded)
+            tracked_paths.add(path)
+
+            if path != recorded:
+                report['path_normalized'].append({'id': post_id, 'from': recorded, 'to': path})
+            if path not in files:
+                report['missing'].append({'id': post_id, 'path': path, 'keyword': post.get('keyword')})
+            elif files[path]['hash'] != post.get('content_hash'):
+                report['hash_mismatch'].append({'id': post_id, 'path': path, 'recorded': post.get('content_hash'),
+                                                'actual': files[path]['hash']})
+
+        for path, info in sorted(files.items()):
+            if path not in tracked_paths:
+                report['untracked'].append({'path': path, 'keyword': info['keyword'], 'title': info['title']})
+
+        return report
+
+    def repair(self, files: Dict[str, Dict], report: Dict[str, List[Dict]]) -> int:
+        """Apply the diff to the tracker and save it with a single atomic write; returns changes made."""
+        data = self.tracker.data
+        posts = data.setdefault('posts', {})
+        keywords = data.setdefault('keywords', {})
+
+        for change in report['path_normalized']:
+            posts[change['id']]['file_path'] = change['to']
+
+        for change in report['hash_mismatch']:
+            posts[change['id']]['content_hash'] = change['actual']
+
+        for change in report['missing']:
+            post = posts.pop(change['id'])
+            usage = keywords.get(post.get('keyword'))
+            if usage and change['id'] in usage.get('posts', []):
+                usage['posts'].remove(change['id'])
+                usage['usage_count'] = max(0, usage.get('usage_count', 1) - 1)
+
+        for change in report['untracked']:
+            info = files[change['path']]
+            keyword = info['keyword']
+            post_id = hashlib.sha256(f"{keyword}_{info['title']}".encode()).hexdigest()[:12]
+            if post_id in posts:
+                post_id = hashlib.sha256(f"{keyword}_{info['title']}_{change['path']}".encode()).hexdigest()[:12]
+            created = info['date'] or datetime.fromtimestamp(info['mtime_ns'] / 1e9, timezone.utc).isoformat()
+            posts[post_id] = {
+                'keyword': keyword,
+                'title': info['title'],
+                'content_hash': info['hash'],
+                'file_path': change['path'],
+                'created': created,
+                'status': 'published',
+            }
+            if info.get('category'):
+                posts[post_id]['category'] = info['category']
+            usage = keywords.setdefault(keyword, {'usage_count': 0, 'last_used': None, 'posts': []})
+            usage['posts'].append(post_id)
+            usage['usage_count'] = usage.get('usage_count', 0) + 1
+            if not usage.get('last_used') or created > usage['last_used']:
+                usage['last_used'] = created
+
+        changes = sum(len(entries) for entries in report.values())
+        if changes:
+            self.tracker.save()
+        return changes
+
+    def reconcile(self, apply: bool = False) -> Dict:
+        """Scan, diff and (optionally) repair; returns the report with timings."""
+        started = time.perf_counter()
+        files, rehashed = self.scan()
+        report = self.diff(files)
+        repaired = self.repair(files, report) if apply else 0
+        return {
+            'posts_on_disk': len(files),
+            'tracked': len(self.tracker.data.get('posts', {})),
+            'rehashed': rehashed,
+            'repaired': repaired,
+            **report,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+        }
+
+
+def main():
+    """CLI interface for tracker reconciliation."""
+    import sys
+
+    args = sys.argv[1:]
+    unknown = [arg for arg in args if arg not in ('--repair', '--json', '--archive')]
+    if unknown:
+        print("Usage: python reconcile_tracker.py [--repair] [--json] [--archive]")
+        return 1
+
+    archive = None
+    if '--archive' in args:
+        from corpus_archive import open_archive
+        archive = open_archive()
+    result = TrackerReconciler(archive=archive).reconcile(apply='--repair' in args)
+    drift = any(result[kind] for kind in ('path_normalized', 'missing', 'hash_mismatch', 'untracked'))
+
+    if '--json' in args:
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+        return 1 if drift and not result['repaired'] else 0
+
+    print(f"\n[RECONCILE] {result['posts_on_disk']} posts on disk ({result['rehashed']} re-hashed), "
+          f"{result['tracked']} tracked, {result['elapsed_ms']:.0f} ms")
+    print(f"Paths to normalize: {len(result['path_normalized'])}")
+    print(f"Missing on disk: {len(result['missing'])}")
+    print(f"Hash mismatches: {len(result['hash_mismatch'])}")
+    print(f"Untracked posts: {len(result['untracked'])}")
+    for entry in result['missing']:
+        print(f"  - missing: {entry['path']} ({entry['id']})")
+    for entry in result['hash_mismatch']:
+        print(f"  - edited: {entry['path']} ({entry['id']})")
+    for entry in result['untracked']:
+        print(f"  - untracked: {entry['path']}")
+
+    if result['repaired']:
+        print(f"\nRepaired tracker ({result['repaired']} changes)")
+    elif drift:
+        print("\nRun with --repair to update data/content_tracker.json")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Product Card Refresh for SmartPetBuys
+Updates the price, rating, review count, name and links inside the product-card HTML of existing
+posts from the current catalog, without regenerating the article around them.
+"""
+
+import hashlib
+import html
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from content_audit import iter_post_files
+from frontmatter_io import split_frontmatter
+from product_catalog import parse_price, parse_rating, parse_review_count
+from site_config import DEFAULT_SITE, SiteConfig, shared_catalog
+
+PARALLEL_THRESHOLD = 64
+BATCH_SIZE = 32
+
+CARD_START = re.compile(r'<div\b[^>]*\bclass="product-card"[^>]*>')
+DIV_TAG = re.compile(r'<(/?)div\b[^>]*>')
+CARD_ID = re.compile(r'\bdata-product-id="([^"]*)"')
+
+# Data slots of the card template: each pattern's single group is the value to keep current
+CARD_SLOTS = {
+    'image': re.compile(r'<img\b[^>]*?\bsrc="([^"]*)"'),
+    'alt': re.compile(r'<img\b[^>]*?\balt="([^"]*)"'),
+    'name': re.compile(r'<h4\b[^>]*\bitemprop="name"[^>]*>(.*?)(?= by <span\b[^>]*\bitemprop="brand"|</h4>)'),
+    'brand': re.compile(r'<span\b[^>]*\bitemprop="brand"[^>]*>([^<]*)</span>'),
+    'price': re.compile(r'<span\b[^>]*\bitemprop="price"[^>]*>\$?([^<]*)</span>'),
+    'offer_url': re.compile(r'<meta\b[^>]*\bitemprop="url"[^>]*\bcontent="([^"]*)"'),
+    'rating': re.compile(r'\bitemprop="ratingValue"[^>]*>([^<]*)<'),
+    'review_count': re.compile(r'\bitemprop="reviewCount"[^>]*>([^<]*)<'),
+    'cta_url': re.compile(r'<div\b[^>]*\bclass="product-cta"[^>]*>\s*<a\b[^>]*?\bhref="([^"]*)"'),
+}
+# Which catalog value fills each slot, and whether the slot is an HTML attribute
+SLOT_SOURCES = {
+    'image': ('image', True), 'alt': ('name', True), 'name': ('name', False), 'brand': ('brand', False),
+    'price': ('price', False), 'offer_url': ('url', True), 'rating': ('rating', False),
+    'review_count': ('review_count', False), 'cta_url': ('url', True),
+}
+NUMERIC_SLOTS = {'price': parse_price, 'rating': parse_rating, 'review_count': parse_review_count}
+
+# Header lines holding the modification dates (YAML or TOML, top level or under schema)
+LASTMOD = re.compile(r'^lastmod\s*[:=].*$', re.MULTILINE)
+DATE_MODIFIED = re.compile(r'^(\s*["\']?dateModified["\']?\s*[:=]\s*).*$', re.MULTILINE)
+
+
+def card_data(product) -> Dict[str, Optional[str]]:
+    """Slot values for a catalog product, as the generator's card template writes them."""
+    return {
+        'name': product.name,
+        'brand': product.display_brand,
+        'image': product.image,
+        'url': product.url,
+        'price': product.price_text or None,
+        'rating': product.rating_text or None,
+        'review_count': product.review_count_text or None,
+    }
+
+
+def iter_cards(body: str) -> Iterable[Tuple[int, int]]:
+    """(start, end) offsets of every product-card block, matching nested divs to find its end."""
+    position = 0
+    while True:
+        start = CARD_START.search(body, position)
+        if not start:
+            return
+        depth, end = 0, None
+        for tag in DIV_TAG.finditer(body, start.start()):
+            depth += -1 if tag.group(1) else 1
+            if depth == 0:
+                end = tag.end()
+                break
+        if end is None:
+            return  # unbalanced card; leave the rest of the post alone
+        yield start.start(), end
+        position = end
+
+
+def _same(slot: str, old: str, new: str) -> bool:
+    if slot in NUMERIC_SLOTS:
+        parse = NUMERIC_SLOTS[slot]
+        return parse(old) == parse(new)
+    if slot == 'alt':
+        # Alt text is free-form ("Name by Brand"); it only needs to follow renames
+        return new.strip() in html.unescape(old)
+    return html.unescape(old).strip() == new.strip()
+
+
+def refresh_card(card: str, products: Dict[str, Dict], by_url: Dict[str, str]) -> Tuple[str, Optional[str], List[str]]:
+    """Rewrite stale slots of one card; returns (card, product id, changed slots)."""
+    product_id = None
+    marker = CARD_ID.search(card[:CARD_START.match(card).end()])
+    if marker and marker.group(1) in products:
+        product_id = marker.group(1)
+    else:
+        for slot in ('offer_url', 'cta_url', 'image'):
+            match = CARD_SLOTS[slot].search(card)
+            if match and html.unescape(match.group(1)) in by_url:
+                product_id = by_url[html.unescape(match.group(1))]
+                break
+    if product_id is None:
+        return card, None, []
+
+    data = products[product_id]
+    changed = []
+    for slot, pattern in CARD_SLOTS.items():
+        field, attribute = SLOT_SOURCES[slot]
+        value = data.get(field)
+        match = pattern.search(card)
+        # Slots the card omitted, or the catalog cannot fill, stay as they are
+        if not match or not value or _same(slot, match.group(1), value):
+            continue
+        card = card[:match.start(1)] + html.escape(value, quote=attribute) + card[match.end(1):]
+        changed.append(slot)
+    return card, product_id, changed
+
+
+def bump_modified(text: str, timestamp: str) -> str:
+    """Set lastmod (adding it if missing) and any schema dateModified in a post's frontmatter."""
+    for fence in ('---', '+++'):
+        if text.startswith(fence + '\n') or text.startswith(fence + '\r\n'):
+            break
+    else:
+        return text
+    end = text.find('\n' + fence, len(fence))
+    if end == -1:
+        return text
+    header, rest = text[:end + 1], text[end + 1:]
+    newline = '\r\n' if text.startswith(fence + '\r\n') else '\n'
+    quoted = f"'{timestamp}'" if fence == '---' else f'"{timestamp}"'
+    lastmod = f"lastmod: {quoted}" if fence == '---' else f"lastmod = {quoted}"
+
+    if LASTMOD.search(header):
+        header = LASTMOD.sub(lambda m: lastmod + ('\r' if m.group(0).endswith('\r') else ''), header, count=1)
+    else:
+        header += lastmod + newline
+    header = DATE_MODIFIED.sub(lambda m: m.group(1) + quoted + ('\r' if m.group(0).endswith('\r') else ''), header)
+    return header + rest
+
+
+def _refresh_batch(args) -> List[Tuple[str, List[Dict], Optional[str]]]:
+    """Refresh the cards of a batch of posts; module-level so worker processes can run it.
+
+    Returns (path, card changes, new body hash) per touched post; the hash is None on dry runs.
+    """
+    paths, products, timestamp, dry_run = args
+    by_url = {}
+    for product_id, data in products.items():
+        for field in ('image', 'url'):
+            if data.get(field):
+                by_url.setdefault(data[field], product_id)
+
+    results = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            text = f.read()
+        if 'product-card' not in text:
+            continue
+        pieces, changes, position = [], [], 0
+        for start, end in iter_cards(text):
+            card, product_id, changed = refresh_card(text[start:end], products, by_url)
+            if changed:
+                pieces.append(text[position:start])
+                pieces.append(card)
+                position = end
+                changes.append({'product': product_id, 'slots': changed})
+        if not changes:
+            continue
+        if dry_run:
+            results.append((path, changes, None))
+            continue
+        pieces.append(text[position:])
+        text = bump_modified(''.join(pieces), timestamp)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+        # Hashed as the generator and reconcile_tracker.py hash posts: the stripped body, as read back
+        body = split_frontmatter(text.replace('\r\n', '\n'))[2]
+        results.append((path, changes, hashlib.sha256(body.strip().encode()).hexdigest()))
+    return results
+
+
+class ProductCardRefresher:
+    """Brings the product cards of every post in line with the catalog."""
+
+    def __init__(self, site: SiteConfig = DEFAULT_SITE, workers: Optional[int] = None):
+        self.site = site
+        self.workers = workers
+
+    def refresh(self, product_ids: Optional[Iterable[str]] = None, dry_run: bool = False) -> Dict:
+        """Rewrite stale cards (optionally only those of product_ids) in place; touched posts only."""
+        started = time.perf_counter()
+        catalog = shared_catalog(self.site)
+        if product_ids is not None:
+            selected = (catalog[product_id] for product_id in product_ids if product_id in catalog)
+        else:
+            selected = catalog.iter_products() if hasattr(catalog, 'iter_products') else catalog.values()
+        products = {product.id: card_data(product) for product in selected}
+
+        paths = [path for path, _ in iter_post_files(str(self.site.posts_path))]
+        timestamp = datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+        if products and len(paths) >= PARALLEL_THRESHOLD:
+            from concurrent.futures import ProcessPoolExecutor
+            batches = [(paths[i:i + BATCH_SIZE], products, timestamp, dry_run)
+                       for i in range(0, len(paths), BATCH_SIZE)]
+            with ProcessPoolExecutor(max_workers=self.workers or os.cpu_count()) as pool:
+                results = [item for batch in pool.map(_refresh_batch, batches) for item in batch]
+        elif products:
+            results = _refresh_batch((paths, products, timestamp, dry_run))
+        else:
+            results = []
+
+        tracked = self._update_tracker(results) if not dry_run else 0
+
+        return {
+            'posts': len(paths),
+            'products': len(products),
+            'updated': [{'path': self.site.relative(path), 'cards': changes} for path, changes, _ in results],
+            'cards': sum(len(changes) for _, changes, _ in results),
+            'tracker_updated': tracked,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+        }
+
+    def _update_tracker(self, results: List[Tuple[str, List[Dict], Optional[str]]]) -> int:
+        """Record the new body hashes of rewritten posts in the content tracker with a single save."""
+        if not results:
+            return 0
+        from generate_single_post import ContentTracker, normalize_post_path
+
+        tracker = ContentTracker(site=self.site)
+        hashes = {normalize_post_path(self.site.relative(path)): content_hash for path, _, content_hash in results}
+        updated = 0
+        for post in tracker.data.get('posts', {}).values():
+            content_hash = hashes.get(normalize_post_path(post.get('file_path', '')))
+            if content_hash and post.get('content_hash') != content_hash:
+                post['content_hash'] = content_hash
+                updated += 1
+        if updated:
+            # save() rebuilds the rollups, so the hash-collision table follows the new hashes
+            tracker.save()
+        return updated
+
+
+def main():
+    """CLI interface for product card refresh."""
+    args = sys.argv[1:]
+    if '--help' in args:
+        print("Usage: python refresh_product_cards.py [--products id1,id2] [--dry-run] [--json]")
+        return 0
+    product_ids = args[args.index('--products') + 1].split(',') if '--products' in args else None
+    dry_run = '--dry-run' in args
+
+    report = ProductCardRefresher().refresh(product_ids, dry_run=dry_run)
+
+    if '--json' in args:
+        print(json.dumps(report, indent=2))
+        return 0
+    print(f"\n[CARDS] {'Dry run: ' if dry_run else ''}Product card refresh")
+    print(f"Posts scanned: {report['posts']}")
+    print(f"Cards updated: {report['cards']} in {len(report['updated'])} posts")
+    if not dry_run:
+        print(f"Tracker hashes updated: {report['tracker_updated']}")
+    print(f"Elapsed: {report['elapsed_ms']:.0f} ms")
+    for post in report['updated']:
+        for card in post['cards']:
+            print(f"  - {post['path']}: {card['product']} ({', '.join(card['slots'])})")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
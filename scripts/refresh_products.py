@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+Product Data Refresh for SmartPetBuys
+Pulls current prices, ratings and review counts from a product-data source and writes only the
+fields that changed back to the catalog in one atomic pass.
+"""
+
+import http.client
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from product_catalog import (IndexedCatalog, export_products_json, parse_price, parse_rating,
+                             parse_review_count, write_catalog, write_products_json)
+from request_controller import parse_retry_after
+from site_config import DEFAULT_SITE, SiteConfig
+from validate_product_data import iter_products
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CACHE_PATH = ".cache/product_refresh.json"
+CACHE_VERSION = 1
+
+# Fields the source is authoritative for, with the parser used to compare old and new values
+# and the formatting products.json uses for them
+REFRESH_FIELDS = {
+    'price': (parse_price, lambda value: f"{value:.2f}"),
+    'rating': (parse_rating, lambda value: f"{value:.1f}"),
+    'review_count': (parse_review_count, lambda value: f"{value:,}"),
+}
+
+BATCH_SIZE = 50
+MAX_WORKERS = 8
+# Requests per second allowed against any one host (bursts up to HOST_BURST)
+HOST_RATE = 10.0
+HOST_BURST = 5
+MAX_ATTEMPTS = 3
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class ProductSourceError(RuntimeError):
+    """Raised when a source cannot answer for a batch of products."""
+
+
+class ProductSource:
+    """Where fresh product data comes from.
+
+    fetch() receives a batch of product ids with the validator (ETag) stored for each from the
+    previous refresh, and returns (updates, not_modified): updates maps product ids to their
+    current field values plus a new 'etag'; not_modified lists ids the source confirmed unchanged.
+    Ids in neither are unknown to the source and left alone.
+    """
+
+    batch_size = BATCH_SIZE
+
+    def fetch(self, batch: Dict[str, Optional[str]]) -> Tuple[Dict[str, Dict], List[str]]:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class JsonFeedSource(ProductSource):
+    """A local JSON feed of {product_id: {price, rating, review_count}}, e.g. a supplier export."""
+
+    batch_size = 1000
+
+    def __init__(self, feed_path: str):
+        with open(feed_path, 'r', encoding='utf-8') as f:
+            self.feed = json.load(f)
+
+    def fetch(self, batch: Dict[str, Optional[str]]) -> Tuple[Dict[str, Dict], List[str]]:
+        updates, not_modified = {}, []
+        for product_id, etag in batch.items():
+            data = self.feed.get(product_id)
+            if data is None:
+                continue
+            fields = {field: data[field] for field in REFRESH_FIELDS if field in data}
+            current = json.dumps(fields, sort_keys=True)
+            if current == etag:
+                not_modified.append(product_id)
+            else:
+                updates[product_id] = {**fields, 'etag': current}
+        return updates, not_modified
+
+
+class HostRateLimiter:
+    """Token bucket per host, shared by every worker thread."""
+
+    def __init__(self, rate: float = HOST_RATE, burst: int = HOST_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[str, List[float]] = {}  # host -> [tokens, last refill]
+        self._lock = threading.Lock()
+
+    def acquire(self, host: str):
+        """Block until host has a free request slot, then take it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                bucket = self._buckets.setdefault(host, [float(self.burst), now])
+                bucket[0] = min(float(self.burst), bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+                if bucket[0] >= 1:
+                    bucket[0] -= 1
+                    return
+                wait = (1 - bucket[0]) / self.rate
+            time.sleep(wait)
+
+    def penalize(self, host: str, seconds: float):
+        """Drain host's bucket so nobody calls it for the next seconds (after a 429)."""
+        with self._lock:
+            self._buckets[host] = [-seconds * self.rate, time.monotonic()]
+
+
+class ConnectionPool:
+    """Keep-alive HTTP connections per host, handed out to one worker at a time."""
+
+    def __init__(self, timeout: float = 30.0):
+        self.timeout = timeout
+        self.opened = 0
+        self._idle: Dict[Tuple[str, str], List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, scheme: str, netloc: str) -> http.client.HTTPConnection:
+        with self._lock:
+            idle = self._idle.get((scheme, netloc))
+            if idle:
+                return idle.pop()
+            self.opened += 1
+        connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        return connection_class(netloc, timeout=self.timeout)
+
+    def release(self, scheme: str, netloc: str, connection: http.client.HTTPConnection):
+        with self._lock:
+            self._idle.setdefault((scheme, netloc), []).append(connection)
+
+    def close(self):
+        with self._lock:
+            for connections in self._idle.values():
+                for connection in connections:
+                    connection.close()
+            self._idle.clear()
+
+
+class ProductApiSource(ProductSource):
+    """Client for a product-data API answering batched, conditional lookups.
+
+    POST {base_url}/products/lookup with {"products": [{"id": ..., "etag": ...}]} returns
+    {"products": {id: {price, rating, review_count, etag}}, "not_modified": [ids]}, or an empty
+    304 when every product in the batch still matches its ETag.
+    """
+
+    def __init__(self, base_url: str, api_key: Optional[str] = None, batch_size: int = BATCH_SIZE,
+                 rate: float = HOST_RATE, burst: int = HOST_BURST, timeout: float = 30.0):
+        parts = urlsplit(base_url.rstrip('/'))
+        self.scheme, self.netloc, self.path = parts.scheme or 'http', parts.netloc, parts.path
+        self.api_key = api_key if api_key is not None else os.getenv('PRODUCT_API_KEY')
+        self.batch_size = batch_size
+        self.limiter = HostRateLimiter(rate, burst)
+        self.pool = ConnectionPool(timeout)
+
+    def _post(self, body: bytes) -> Tuple[int, Dict[str, str], bytes]:
+        connection = self.pool.acquire(self.scheme, self.netloc)
+        headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
+        if self.api_key:
+            headers['Authorization'] = f"Bearer {self.api_key}"
+        try:
+            connection.request('POST', f"{self.path}/products/lookup", body=body, headers=headers)
+            response = connection.getresponse()
+            payload = response.read()
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            raise
+        response_headers = {name.lower(): value for name, value in response.getheaders()}
+        if response.will_close:
+            connection.close()
+        else:
+            self.pool.release(self.scheme, self.netloc, connection)
+        return response.status, response_headers, payload
+
+    def fetch(self, batch: Dict[str, Optional[str]]) -> Tuple[Dict[str, Dict], List[str]]:
+        body = json.dumps({'products': [{'id': product_id, 'etag': etag}
+                                        for product_id, etag in batch.items()]}).encode()
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            self.limiter.acquire(self.netloc)
+            try:
+                status, headers, payload = self._post(body)
+            except (OSError, http.client.HTTPException) as e:
+                if attempt == MAX_ATTEMPTS:
+                    raise ProductSourceError(f"{self.netloc}: {e}") from e
+                time.sleep(0.5 * 2 ** (attempt - 1))
+                continue
+
+            if status == 304:
+                return {}, list(batch)
+            if status == 200:
+                data = json.loads(payload)
+                return data.get('products', {}), data.get('not_modified', [])
+            if status not in RETRYABLE_STATUSES or attempt == MAX_ATTEMPTS:
+                raise ProductSourceError(f"{self.netloc} answered {status}")
+            delay = parse_retry_after(headers)
+            if status == 429:
+                self.limiter.penalize(self.netloc, delay or 1.0)
+            else:
+                time.sleep(delay if delay is not None else 0.5 * 2 ** (attempt - 1))
+        raise ProductSourceError(f"{self.netloc}: out of attempts")
+
+    def close(self):
+        self.pool.close()
+
+
+def open_source(spec: str, **options) -> ProductSource:
+    """An API source for http(s) URLs, otherwise a local JSON feed file."""
+    if spec.startswith(('http://', 'https://')):
+        return ProductApiSource(spec, **options)
+    return JsonFeedSource(spec)
+
+
+class ProductRefresher:
+    """Refreshes catalog prices, ratings and review counts from a ProductSource."""
+
+    def __init__(self, source: ProductSource, site: SiteConfig = DEFAULT_SITE,
+                 cache_path: Optional[str] = CACHE_PATH, workers: int = MAX_WORKERS):
+        self.source = source
+        self.site = site
+        self.products_path = site.products_path
+        self.catalog_path = site.catalog_path
+        self.cache_path = site.path(cache_path) if cache_path else None
+        self.workers = workers
+
+    def _existing_entries(self) -> Iterator[Tuple[str, Dict]]:
+        """Stream (id, entry) pairs from the current catalog source of truth."""
+        if self.catalog_path.exists():
+            catalog = IndexedCatalog(str(self.catalog_path))
+            try:
+                for product in catalog.iter_products():
+                    yield product.id, product.to_dict()
+            finally:
+                catalog.close()
+        elif self.products_path.exists():
+            yield from iter_products(str(self.products_path))
+
+    def _load_cache(self) -> Dict[str, str]:
+        if self.cache_path and self.cache_path.exists():
+            try:
+                with open(self.cache_path, 'r', encoding='utf-8') as f:
+                    cache = json.load(f)
+                if cache.get('version') == CACHE_VERSION:
+                    return cache['etags']
+            except (json.JSONDecodeError, KeyError):
+                pass
+        return {}
+
+    def _save_cache(self, etags: Dict[str, str]):
+        if not self.cache_path:
+            return
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': CACHE_VERSION, 'etags': etags}, f, separators=(',', ':'))
+        os.replace(tmp_path, self.cache_path)
+
+    def _fetch_all(self, ids: List[str], etags: Dict[str, str], stats: Dict) -> Dict[str, Dict]:
+        """Fetch every batch, concurrently when there is more than one."""
+        size = max(1, self.source.batch_size)
+        batches = [{product_id: etags.get(product_id) for product_id in ids[start:start + size]}
+                   for start in range(0, len(ids), size)]
+        stats['batches'] = len(batches)
+        updates: Dict[str, Dict] = {}
+
+        def record(batch, result):
+            fresh, not_modified = result
+            updates.update((product_id, data) for product_id, data in fresh.items() if product_id in batch)
+            stats['not_modified'] += len(not_modified)
+
+        if len(batches) == 1 or self.workers <= 1:
+            for batch in batches:
+                try:
+                    record(batch, self.source.fetch(batch))
+                except ProductSourceError as e:
+                    stats['failed'].append(str(e))
+            return updates
+
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self.source.fetch, batch): batch for batch in batches}
+            for future in as_completed(futures):
+                try:
+                    record(futures[future], future.result())
+                except ProductSourceError as e:
+                    stats['failed'].append(str(e))
+        return updates
+
+    def refresh(self, dry_run: bool = False) -> Dict:
+        """Fetch fresh data for every product and write changed fields with one atomic replace."""
+        started = time.perf_counter()
+        stats = {'products': 0, 'batches': 0, 'not_modified': 0, 'changes': [], 'failed': []}
+
+        current: Dict[str, Dict] = {}
+        for product_id, entry in self._existing_entries():
+            current[product_id] = {field: entry.get(field) for field in REFRESH_FIELDS}
+        stats['products'] = len(current)
+
+        etags = self._load_cache()
+        updates = self._fetch_all(list(current), etags, stats)
+
+        changed: Dict[str, Dict[str, str]] = {}
+        for product_id, data in updates.items():
+            if product_id not in current:
+                continue
+            for field, (parse, render) in REFRESH_FIELDS.items():
+                new_value = parse(data.get(field))
+                if new_value is None or new_value == parse(current[product_id][field]):
+                    continue
+                changed.setdefault(product_id, {})[field] = render(new_value)
+                stats['changes'].append({'id': product_id, 'field': field,
+                                         'old': current[product_id][field], 'new': render(new_value)})
+
+        if not dry_run:
+            if changed:
+                self._write(changed)
+            # Validators are only kept once the data they vouch for is on disk
+            etags.update((product_id, data['etag']) for product_id, data in updates.items()
+                         if product_id in current and data.get('etag'))
+            if updates:
+                self._save_cache({product_id: etags[product_id] for product_id in current if product_id in etags})
+
+        stats['changed_products'] = len(changed)
+        stats['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        return stats
+
+    def _write(self, changed: Dict[str, Dict[str, str]]):
+        """Rewrite the catalog with changed fields applied, as a single atomic replace per file."""
+        entries = ((product_id, {**entry, **changed[product_id]} if product_id in changed else entry)
+                   for product_id, entry in self._existing_entries())
+        if self.catalog_path.exists():
+            write_catalog(entries, str(self.catalog_path))
+            export_products_json(str(self.catalog_path), str(self.products_path))
+        else:
+            write_products_json(entries, str(self.products_path))
+        logger.info(f"Refreshed {len(changed)} products in the catalog")
+
+
+def main():
+    """CLI interface for product data refresh."""
+    import sys
+
+    args = sys.argv[1:]
+    dry_run = '--dry-run' in args
+    source_spec = args[args.index('--source') + 1] if '--source' in args else os.getenv('PRODUCT_API_URL')
+    workers = int(args[args.index('--workers') + 1]) if '--workers' in args else MAX_WORKERS
+    if not source_spec:
+        print("Usage: python refresh_products.py --source <api-url|feed.json> [--workers N] [--dry-run]")
+        print("       (or set PRODUCT_API_URL)")
+        return 1
+
+    source = open_source(source_spec)
+    try:
+        stats = ProductRefresher(source, workers=workers).refresh(dry_run=dry_run)
+    finally:
+        source.close()
+
+    print(f"\n[REFRESH] {'Dry run: ' if dry_run else ''}Product data refresh from {source_spec}")
+    print(f"Products: {stats['products']} in {stats['batches']} batches")
+    print(f"Unchanged (ETag match): {stats['not_modified']}")
+    print(f"Products changed: {stats['changed_products']} ({len(stats['changes'])} fields)")
+    print(f"Failed batches: {len(stats['failed'])}")
+    print(f"Elapsed: {stats['elapsed_ms']:.0f} ms")
+
+    for change in stats['changes'][:50]:
+        print(f"  - {change['id']} {change['field']}: {change['old'] or '—'} -> {change['new']}")
+    for failure in stats['failed']:
+        print(f"  ! {failure}")
+
+    return 1 if stats['failed'] else 0
+
+
+if __name__ == "__main__":
+    exit(main())
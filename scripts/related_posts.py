@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Related Posts Index for SmartPetBuys
+Ranks related posts by tag/keyword overlap and sparse TF-IDF body similarity and writes data/related.json.
+"""
+
+import hashlib
+import heapq
+import json
+import logging
+import math
+import os
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+from content_audit import HTML_TAG, KEYWORD_FIELDS, POSTS_DIR, WORD, iter_post_files, post_keyword
+from frontmatter_io import parse_header, split_frontmatter
+
+logger = logging.getLogger(__name__)
+
+RELATED_PATH = "data/related.json"
+CACHE_PATH = ".cache/related_index.json"
+TOP_K = 5
+
+# Bump when tokenization or weighting changes so cached term vectors are rebuilt
+INDEX_VERSION = 1
+
+# Sparse vectors keep each post's strongest terms only, which keeps postings short
+TERMS_PER_POST = 60
+# Terms or tags found in more than this share of posts are boilerplate and carry no signal
+MAX_DOC_FREQUENCY = 0.5
+TEXT_WEIGHT = 0.6
+TAG_WEIGHT = 0.4
+
+STOPWORDS = frozenset("""
+a about above after again all also an and any are as at be because been before being below best between
+both but by can could did do does doing down during each few for from further get had has have having he
+her here hers him his how i if in into is it its itself just like make many may me more most much must my
+no nor not now of off on once only or other our out over own same she should so some such than that the
+their them then there these they this those through to too under until up use very was we were what when
+where which while who whom why will with would you your yours
+""".split())
+
+
+def post_key(path: str) -> str:
+    """Bundle directory name for index.md posts, file stem for loose posts (Hugo's ContentBaseName)."""
+    path_obj = Path(path)
+    return path_obj.parent.name if path_obj.name == 'index.md' else path_obj.stem
+
+
+def extract_terms(body: str) -> Dict[str, int]:
+    """Term counts of a post body with markup, shortcodes and stopwords removed."""
+    counts: Counter = Counter()
+    for line in body.splitlines():
+        if '<' in line or '{{' in line:
+            line = HTML_TAG.sub(' ', line)
+        counts.update(word for word in WORD.findall(line.lower())
+                      if len(word) > 2 and word not in STOPWORDS and not word.isdigit())
+    return dict(counts)
+
+
+def post_features(metadata: Dict, body: str) -> Dict:
+    """Title, tag set (tags plus target keyword) and term counts for one post."""
+    tags = metadata.get('tags') if isinstance(metadata.get('tags'), list) else []
+    keyword = post_keyword(metadata)
+    return {
+        'title': str(metadata.get('title', '')).split(' — ')[0].strip(),
+        'tags': sorted({str(tag).strip().lower() for tag in tags if str(tag).strip()} | ({keyword} if keyword else set())),
+        'terms': extract_terms(body),
+    }
+
+
+def _read_post(path: str) -> Dict:
+    with open(path, 'rb') as f:
+        raw = f.read()
+    fmt, header, body = split_frontmatter(raw.decode('utf-8', errors='replace'))
+    features = post_features(parse_header(fmt, header, KEYWORD_FIELDS), body)
+    features['hash'] = hashlib.sha256(raw).hexdigest()[:16]
+    return features
+
+
+class RelatedIndex:
+    """Top-k related posts per post, maintained incrementally as posts are added or changed."""
+
+    def __init__(self, posts_dir: str = POSTS_DIR, output_path: str = RELATED_PATH,
+                 cache_path: str = CACHE_PATH, top_k: int = TOP_K):
+        self.posts_dir = posts_dir
+        self.output_path = Path(output_path)
+        self.cache_path = Path(cache_path)
+        self.top_k = top_k
+
+        self.docs: Dict[str, Dict] = {}
+        self.related: Dict[str, List[Dict]] = {}
+        self._load()
+
+        # Corpus statistics and sparse vectors, derived from self.docs
+        self.term_df: Counter = Counter()
+        self.tag_df: Counter = Counter()
+        for doc in self.docs.values():
+            self._count(doc, 1)
+        self._vectors: Dict[str, Dict[str, float]] = {}
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._tag_postings: Dict[str, Set[str]] = {}
+
+    def _load(self):
+        if self.cache_path.exists():
+            try:
+                with open(self.cache_path, 'r', encoding='utf-8') as f:
+                    cache = json.load(f)
+                if cache.get('version') == INDEX_VERSION:
+                    self.docs = cache['posts']
+            except (json.JSONDecodeError, KeyError):
+                self.docs = {}
+        if self.output_path.exists() and self.docs:
+            try:
+                with open(self.output_path, 'r', encoding='utf-8') as f:
+                    self.related = json.load(f)
+            except json.JSONDecodeError:
+                self.related = {}
+
+    def save(self):
+        """Write the Hugo data file and the term cache, each with an atomic replace."""
+        for path, payload, options in (
+            (self.output_path, dict(sorted(self.related.items())), {'indent': 2}),
+            (self.cache_path, {'version': INDEX_VERSION, 'posts': self.docs}, {'separators': (',', ':')}),
+        ):
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(payload, f, ensure_ascii=False, **options)
+            os.replace(tmp_path, path)
+
+    def _count(self, doc: Dict, delta: int):
+        for term in doc['terms']:
+            self.term_df[term] += delta
+        for tag in doc['tags']:
+            self.tag_df[tag] += delta
+
+    def _boilerplate_cutoff(self) -> float:
+        # Small corpora share vocabulary heavily; never treat a term used by fewer than 3 posts as boilerplate
+        return max(3, MAX_DOC_FREQUENCY * len(self.docs))
+
+    def _vector(self, doc: Dict) -> Dict[str, float]:
+        """Unit-length sparse TF-IDF vector over the post's strongest terms."""
+        total = len(self.docs) + 1
+        cutoff = self._boilerplate_cutoff()
+        weights = {}
+        for term, count in doc['terms'].items():
+            df = self.term_df.get(term, 0)
+            if df > cutoff:
+                continue
+            weights[term] = (1 + math.log(count)) * math.log(total / (1 + df))
+        strongest = heapq.nlargest(TERMS_PER_POST, weights.items(), key=lambda item: item[1])
+        norm = math.sqrt(sum(weight * weight for _, weight in strongest)) or 1.0
+        return {term: weight / norm for term, weight in strongest if weight > 0}
+
+    def _tags(self, doc: Dict) -> Set[str]:
+        cutoff = self._boilerplate_cutoff()
+        return {tag for tag in doc['tags'] if self.tag_df.get(tag, 0) <= cutoff}
+
+    def _ensure_vectors(self):
+        """Build vectors and term/tag postings for posts that do not have them yet."""
+        for key, doc in self.docs.items():
+            if key in self._vectors:
+                continue
+            vector = self._vector(doc)
+            self._vectors[key] = vector
+            for term, weight in vector.items():
+                self._postings.setdefault(term, {})[key] = weight
+            for tag in doc['tags']:
+                self._tag_postings.setdefault(tag, set()).add(key)
+
+    def _detach(self, key: str):
+        """Drop a post's vector and postings (before it is re-indexed or removed)."""
+        for term in self._vectors.pop(key, {}):
+            postings = self._postings.get(term)
+            if postings:
+                postings.pop(key, None)
+        for tag in self.docs.get(key, {}).get('tags', ()):
+            self._tag_postings.get(tag, set()).discard(key)
+
+    def _scores(self, key: str, vector: Dict[str, float], tags: Set[str]) -> Dict[str, float]:
+        """Blend of cosine similarity (via postings) and tag Jaccard against every other post."""
+        dots: Dict[str, float] = {}
+        for term, weight in vector.items():
+            for other, other_weight in self._postings.get(term, {}).items():
+                dots[other] = dots.get(other, 0.0) + weight * other_weight
+
+        scores = {other: TEXT_WEIGHT * dot for other, dot in dots.items()}
+        candidates = set()
+        for tag in tags:
+            candidates.update(self._tag_postings.get(tag, ()))
+        for other in candidates:
+            other_tags = self._tags(self.docs[other])
+            scores[other] = scores.get(other, 0.0) + TAG_WEIGHT * len(tags & other_tags) / len(tags | other_tags)
+        scores.pop(key, None)
+        return scores
+
+    def _top(self, scores: Dict[str, float]) -> List[Dict]:
+        best = heapq.nlargest(self.top_k, scores.items(), key=lambda item: (item[1], item[0]))
+        return [{'post': other, 'title': self.docs[other]['title'], 'score': round(score, 4)}
+                for other, score in best if score > 0]
+
+    def _offer(self, key: str, other: str, score: float):
+        """Insert other into key's top-k list if it beats the current k-th entry."""
+        entries = [entry for entry in self.related.get(key, []) if entry['post'] != other]
+        if len(entries) >= self.top_k and score <= entries[-1]['score']:
+            if len(entries) != len(self.related.get(key, [])):
+                self.related[key] = entries
+            return
+        entries.append({'post': other, 'title': self.docs[other]['title'], 'score': round(score, 4)})
+        entries.sort(key=lambda entry: (-entry['score'], entry['post']))
+        self.related[key] = entries[:self.top_k]
+
+    def build(self) -> Dict:
+        """Refresh changed posts from disk and recompute every post's top-k list."""
+        started = time.perf_counter()
+        changed, removed = self._scan()
+        self._vectors, self._postings, self._tag_postings = {}, {}, {}
+        self._ensure_vectors()
+        self.related = {key: self._top(self._scores(key, self._vectors[key], self._tags(doc)))
+                        for key, doc in self.docs.items()}
+        self.save()
+        return {'posts': len(self.docs), 'changed': changed, 'removed': removed,
+                'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)}
+
+    def update(self) -> Dict:
+        """Incrementally apply added, changed and deleted posts without rescoring the whole corpus."""
+        if not self.docs:
+            return self.build()
+        started = time.perf_counter()
+        before = {key: doc['hash'] for key, doc in self.docs.items()}
+        changed, removed = self._scan(defer=True)
+        self._ensure_vectors()
+        for key in removed:
+            self._remove(key)
+        for key in changed:
+            self._insert(key)
+        self.save()
+        return {'posts': len(self.docs), 'changed': changed, 'removed': removed,
+                'new': [key for key in changed if key not in before],
+                'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)}
+
+    def _scan(self, defer: bool = False) -> Tuple[List[str], List[str]]:
+        """Re-read posts whose mtime/size changed; returns (changed keys, removed keys)."""
+        seen = set()
+        changed = []
+        for path, stat in iter_post_files(self.posts_dir):
+            key = post_key(path)
+            seen.add(key)
+            doc = self.docs.get(key)
+            if doc and doc.get('mtime_ns') == stat.st_mtime_ns and doc.get('size') == stat.st_size:
+                continue
+            features = _read_post(path)
+            features.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+            if doc and doc['hash'] == features['hash']:
+                doc.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+                continue
+            if doc:
+                self._count(doc, -1)
+                self._detach(key)
+            self.docs[key] = features
+            self._count(features, 1)
+            changed.append(key)
+
+        removed = [key for key in self.docs if key not in seen]
+        # Incremental updates remove posts one by one so their neighbours can be refilled
+        if not defer:
+            for key in removed:
+                self._count(self.docs.pop(key), -1)
+                self.related.pop(key, None)
+        return changed, removed
+
+    def _remove(self, key: str):
+        """Delete a post and refill the lists that referenced it."""
+        self._detach(key)
+        self._count(self.docs.pop(key), -1)
+        self.related.pop(key, None)
+        for other, entries in list(self.related.items()):
+            if any(entry['post'] == key for entry in entries):
+                self.related[other] = self._top(self._scores(other, self._vectors[other], self._tags(self.docs[other])))
+
+    def _insert(self, key: str) -> List[Dict]:
+        """Score one new or changed post against the corpus and update affected neighbour lists."""
+        self._detach(key)
+        self._ensure_vectors()
+        scores = self._scores(key, self._vectors[key], self._tags(self.docs[key]))
+        # A changed post may have dropped out of lists it used to be in
+        for other, entries in self.related.items():
+            if other != key and other not in scores and any(entry['post'] == key for entry in entries):
+                self.related[other] = [entry for entry in entries if entry['post'] != key]
+        for other, score in scores.items():
+            self._offer(other, key, score)
+        self.related[key] = self._top(scores)
+        return self.related[key]
+
+    def add_document(self, key: str, metadata: Dict, body: str) -> List[Dict]:
+        """Index a post that is about to be written (e.g. a new draft) and return its top-k related posts."""
+        previous = self.docs.get(key)
+        if previous:
+            self._count(previous, -1)
+            self._detach(key)
+        features = post_features(metadata, body)
+        features['hash'] = ''
+        self.docs[key] = features
+        self._count(features, 1)
+        return self._insert(key)
+
+    def related_to(self, key: str) -> List[Dict]:
+        """Precomputed related posts for a post (O(k))."""
+        return self.related.get(key, [])
+
+
+def load_related(output_path: str = RELATED_PATH) -> Dict[str, List[Dict]]:
+    """Read data/related.json for O(k) lookups without building the index."""
+    path = Path(output_path)
+    if not path.exists():
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    """CLI interface for the related-posts index."""
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) < 2 or sys.argv[1] not in ('build', 'update', 'show'):
+        print("Usage: python related_posts.py [build|update|show <post>]")
+        return 1
+
+    command = sys.argv[1]
+    if command == 'show':
+        if len(sys.argv) != 3:
+            print("Usage: python related_posts.py show <post>")
+            return 1
+        related = load_related().get(sys.argv[2])
+        if related is None:
+            print(f"No related posts recorded for '{sys.argv[2]}' (run build first)")
+            return 1
+        for entry in related:
+            print(f"  {entry['score']:.3f}  {entry['post']}  ({entry['title']})")
+        return 0
+
+    index = RelatedIndex()
+    stats = index.build() if command == 'build' else index.update()
+    print(f"\n[RELATED] {command.title()}: {stats['posts']} posts, {len(stats['changed'])} re-indexed, "
+          f"{len(stats['removed'])} removed in {stats['elapsed_ms']:.0f} ms")
+    print(f"Wrote {index.output_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""
+Adaptive Request Controller for SmartPetBuys
+Shared rate limiting, jittered retries and circuit breaking for LLM provider calls.
+"""
+
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Statuses worth retrying; everything else in the 4xx range is a caller error
+RETRYABLE_STATUSES = {408, 409, 429}
+
+DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+DURATION_UNITS = {'ms': 0.001, 's': 1.0, 'm': 60.0, 'h': 3600.0}
+
+# Recent call latencies drive the hedging threshold; kept across runs so short-lived CLIs benefit too
+HISTORY_PATH = ".cache/openai_latency.json"
+HEDGE_WINDOW = 200
+HEDGE_MIN_SAMPLES = 20
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without contacting the provider while the circuit breaker is open."""
+
+    def __init__(self, retry_in: float):
+        super().__init__(f"Provider circuit open, retry in {retry_in:.1f}s")
+        self.retry_in = retry_in
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse a reset duration such as '1s', '6m0s', '20ms' or '0.5' into seconds."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parts = DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """Seconds the server asked us to wait (retry-after-ms, or Retry-After seconds/HTTP date)."""
+    retry_ms = headers.get('retry-after-ms')
+    if retry_ms:
+        try:
+            return max(0.0, float(retry_ms) / 1000)
+        except ValueError:
+            pass
+
+    retry_after = headers.get('retry-after')
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    from email.utils import parsedate_to_datetime
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted, non-empty list."""
+    rank = int(round(fraction * len(sorted_values))) - 1
+    return sorted_values[min(len(sorted_values) - 1, max(0, rank))]
+
+
+def _header_int(headers: Mapping[str, str], name: str) -> Optional[int]:
+    value = headers.get(name)
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class RateLimitBucket:
+    """Token bucket whose level and refill rate are synced from x-ratelimit-* headers."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.capacity: Optional[int] = None
+        self.level: Optional[float] = None
+        self.rate = 0.0
+        self.reset_at = 0.0
+        self.updated = 0.0
+
+    def sync(self, limit: Optional[int], remaining: int, reset_seconds: Optional[float], now: float):
+        """Adopt the provider's view of the bucket after a response."""
+        self.capacity = limit if limit is not None else max(self.capacity or 0, remaining)
+        self.level = float(remaining)
+        self.updated = now
+        if reset_seconds is not None:
+            self.reset_at = now + reset_seconds
+            # The provider refills the whole deficit by the reset time
+            deficit = self.capacity - remaining
+            if reset_seconds > 0 and deficit > 0:
+                self.rate = deficit / reset_seconds
+
+    def wait_time(self, cost: float, now: float) -> float:
+        """How long until cost tokens are available, without taking them."""
+        if self.level is None or cost <= 0:
+            return 0.0
+
+        if self.rate:
+            self.level = min(float(self.capacity), self.level + (now - self.updated) * self.rate)
+        elif now >= self.reset_at:
+            self.level = float(self.capacity)
+        self.updated = now
+
+        shortfall = cost - self.level
+        if shortfall <= 0:
+            return 0.0
+        if self.rate:
+            return shortfall / self.rate
+        return max(0.0, self.reset_at - now)
+
+    def reserve(self, cost: float, now: float) -> float:
+        """Take cost tokens; return how long to wait before they are actually available."""
+        wait = self.wait_time(cost, now)
+        if self.level is not None and cost > 0:
+            self.level -= cost
+        return wait
+
+
+class CircuitBreaker:
+    """Opens after consecutive provider failures and lets a single probe through after a cooldown."""
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+
+    def before_request(self, now: float):
+        if self.state == 'open':
+            retry_in = self.opened_at + self.recovery_timeout - now
+            if retry_in > 0:
+                raise CircuitOpenError(retry_in)
+            self.state = 'half_open'
+        if self.state == 'half_open':
+            if self._probe_in_flight:
+                raise CircuitOpenError(self.recovery_timeout)
+            self._probe_in_flight = True
+
+    def record_success(self):
+        if self.state != 'closed':
+            logger.info("Provider recovered, closing circuit")
+        self.state = 'closed'
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self, now: float):
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == 'half_open' or self.failures >= self.failure_threshold:
+            if self.state != 'open':
+                logger.warning(f"Provider failing ({self.failures} consecutive errors), opening circuit "
+                               f"for {self.recovery_timeout:.0f}s")
+            self.state = 'open'
+            self.opened_at = now
+
+    def release(self):
+        """Forget an in-flight probe that ended without a verdict (e.g. a caller error)."""
+        self._probe_in_flight = False
+
+
+class RequestController:
+    """Paces, retries and circuit-breaks calls to one provider; share one instance per process."""
+
+    def __init__(self, max_attempts: int = 4, base_delay: float = 0.5, max_delay: float = 30.0,
+                 failure_threshold: int = 5, recovery_timeout: float = 30.0,
+                 transient_errors: Tuple[type, ...] = (OSError,),
+                 hedge_percentile: Optional[float] = None, hedge_max_extra: float = 0.1,
+                 history_path: Optional[str] = None,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep,
+                 rng: Optional[random.Random] = None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.transient_errors = transient_errors
+        self.clock = clock
+        self.sleep = sleep
+        self.rng = rng or random.Random()
+
+        self.requests = RateLimitBucket('requests')
+        self.tokens = RateLimitBucket('tokens')
+        self.breaker = CircuitBreaker(failure_threshold, recovery_timeout)
+        self.paused_until = 0.0
+        self.stats = {'calls': 0, 'attempts': 0, 'retries': 0, 'throttled_s': 0.0, 'short_circuited': 0,
+                      'hedges': 0, 'hedge_wins': 0}
+        self._lock = threading.Lock()
+
+        # Opt-in hedging: a duplicate request once the primary exceeds this latency percentile
+        self.hedge_percentile = hedge_percentile
+        self.hedge_max_extra = hedge_max_extra
+        self.history_path = Path(history_path) if history_path else None
+        self.history: "deque[Tuple[float, bool]]" = deque(self._load_history(), maxlen=HEDGE_WINDOW)
+        self._executor = None
+
+    def _load_history(self) -> List[Tuple[float, bool]]:
+        if not self.history_path or not self.history_path.exists():
+            return []
+        try:
+            with open(self.history_path, 'r', encoding='utf-8') as f:
+                return [(float(latency), bool(hedged)) for latency, hedged in json.load(f)['latencies']]
+        except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+            return []
+
+    def _record_latency(self, latency: float, hedged: bool):
+        """Remember a successful call's latency and persist the window atomically."""
+        with self._lock:
+            self.history.append((round(latency, 3), hedged))
+            snapshot = list(self.history)
+        if not self.history_path:
+            return
+        self.history_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.history_path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'latencies': snapshot}, f, separators=(',', ':'))
+        os.replace(tmp_path, self.history_path)
+
+    def hedge_delay(self) -> Optional[float]:
+        """Latency after which a hedge fires, or None while hedging is off or history is too short."""
+        if self.hedge_percentile is None:
+            return None
+        with self._lock:
+            latencies = sorted(latency for latency, _ in self.history)
+        if len(latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        return percentile(latencies, self.hedge_percentile)
+
+    def _try_start_hedge(self, token_cost: int) -> bool:
+        """Claim budget for a hedge without waiting; hedges never queue behind rate limits."""
+        with self._lock:
+            now = self.clock()
+            hedged = sum(1 for _, was_hedged in self.history if was_hedged)
+            if hedged + 1 > self.hedge_max_extra * (len(self.history) + 1):
+                return False
+            if self.breaker.state != 'closed' or self.paused_until > now:
+                return False
+            if self.requests.wait_time(1, now) > 0 or self.tokens.wait_time(token_cost, now) > 0:
+                return False
+            self.requests.reserve(1, now)
+            self.tokens.reserve(token_cost, now)
+            self.stats['hedges'] += 1
+            return True
+
+    def _abandon(self, future):
+        """Cancel a losing request; if it is already in flight, drop its result when it lands."""
+        if future.cancel():
+            return
+
+        def discard(finished):
+            if finished.exception() is None:
+                self.observe(getattr(finished.result(), 'headers', None) or {})
+
+        future.add_done_callback(discard)
+
+    def _send(self, send: Callable[[], Any], token_cost: int) -> Tuple[Any, bool]:
+        """Run one attempt, hedging it when enabled; returns (response, hedged)."""
+        delay = self.hedge_delay()
+        if delay is None:
+            return send(), False
+
+        from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='hedge')
+
+        primary = self._executor.submit(send)
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._try_start_hedge(token_cost):
+            return primary.result(), False
+
+        logger.info(f"No response after {delay:.2f}s (p{self.hedge_percentile * 100:.0f}), sending hedge request")
+        backup = self._executor.submit(send)
+        pending = {primary, backup}
+        first_error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for loser in pending:
+                        self._abandon(loser)
+                    if future is backup:
+                        self.stats['hedge_wins'] += 1
+                    return future.result(), True
+                first_error = first_error or future.exception()
+        raise first_error
+
+    def observe(self, headers: Mapping[str, str]):
+        """Sync the buckets from a response's rate-limit headers."""
+        with self._lock:
+            now = self.clock()
+            for bucket in (self.requests, self.tokens):
+                remaining = _header_int(headers, f'x-ratelimit-remaining-{bucket.name}')
+                if remaining is not None:
+                    bucket.sync(_header_int(headers, f'x-ratelimit-limit-{bucket.name}'), remaining,
+                                parse_duration(headers.get(f'x-ratelimit-reset-{bucket.name}')), now)
+
+    def _acquire(self, token_cost: int) -> float:
+        """Wait for a request slot and enough token budget; returns seconds waited.
+
+        Raises CircuitOpenError while the circuit is open.
+        """
+        with self._lock:
+            now = self.clock()
+            try:
+                self.breaker.before_request(now)
+            except CircuitOpenError:
+                self.stats['short_circuited'] += 1
+                raise
+            wait = max(self.paused_until - now,
+                       self.requests.reserve(1, now),
+                       self.tokens.reserve(token_cost, now))
+        if wait > 0:
+            logger.info(f"Throttling for {wait:.2f}s to stay within provider rate limits")
+            self.stats['throttled_s'] += wait
+            self.sleep(wait)
+        return max(0.0, wait)
+
+    def _classify(self, error: Exception) -> Tuple[bool, bool, Mapping[str, str]]:
+        """Return (retryable, provider_fault, headers) for a failed attempt."""
+        status = getattr(error, 'status_code', None)
+        response = getattr(error, 'response', None)
+        headers = getattr(response, 'headers', None) or {}
+
+        if status is None:
+            transient = isinstance(error, self.transient_errors)
+            return transient, transient, headers
+        if status >= 500:
+            return True, True, headers
+        return status in RETRYABLE_STATUSES, False, headers
+
+    def _backoff(self, previous: float, retry_after: Optional[float]) -> float:
+        """Decorrelated jitter; a server-provided Retry-After is a floor plus a little spread."""
+        if retry_after is not None:
+            return min(self.max_delay, retry_after) + self.rng.uniform(0, self.base_delay)
+        return min(self.max_delay, self.rng.uniform(self.base_delay, previous * 3))
+
+    def call(self, send: Callable[[], Any], token_cost: int = 0, report: Optional[Dict] = None) -> Any:
+        """Run send() under the controller; its return value must expose response .headers.
+
+        When given, report is filled with this call's attempts, hedging and throttling, even on failure.
+        """
+        self.stats['calls'] += 1
+        delay = self.base_delay
+        last_error: Optional[Exception] = None
+        if report is None:
+            report = {}
+        report.update(attempts=0, hedged=False, throttled_ms=0.0)
+
+        for attempt in range(1, self.max_attempts + 1):
+            report['throttled_ms'] += round(self._acquire(token_cost) * 1000, 1)
+            self.stats['attempts'] += 1
+            report['attempts'] = attempt
+            started = self.clock()
+            try:
+                response, hedged = self._send(send, token_cost)
+            except Exception as e:
+                retryable, provider_fault, headers = self._classify(e)
+                retry_after = parse_retry_after(headers)
+                self.observe(headers)
+                with self._lock:
+                    now = self.clock()
+                    if provider_fault:
+                        self.breaker.record_failure(now)
+                    else:
+                        self.breaker.release()
+                    if retry_after is not None:
+                        # Everyone sharing this controller waits out the server's pause
+                        self.paused_until = max(self.paused_until, now + min(self.max_delay, retry_after))
+
+                if not retryable or attempt == self.max_attempts:
+                    raise
+                last_error = e
+                delay = self._backoff(delay, retry_after)
+                logger.warning(f"Provider error on attempt {attempt}/{self.max_attempts} "
+                               f"({getattr(e, 'status_code', type(e).__name__)}), retrying in {delay:.2f}s")
+                self.stats['retries'] += 1
+                self.sleep(delay)
+                continue
+
+            self.observe(getattr(response, 'headers', None) or {})
+            with self._lock:
+                self.breaker.record_success()
+            self._record_latency(self.clock() - started, hedged)
+            report['hedged'] = hedged
+            return response
+
+        raise last_error  # pragma: no cover - the loop always returns or raises
+
+    def snapshot(self) -> Dict:
+        """Current limiter, breaker and counter state for logging."""
+        hedge_after = self.hedge_delay()
+        with self._lock:
+            return {
+                'requests_remaining': self.requests.level,
+                'tokens_remaining': self.tokens.level,
+                'circuit': self.breaker.state,
+                'hedge_after_s': hedge_after,
+                **self.stats,
+            }
+
+
+_controllers: Dict[str, RequestController] = {}
+_controllers_lock = threading.Lock()
+
+
+def get_controller(provider: str = 'openai', **options) -> RequestController:
+    """Process-wide controller for a provider, so concurrent jobs share one budget."""
+    with _controllers_lock:
+        if provider not in _controllers:
+            _controllers[provider] = RequestController(**options)
+        return _controllers[provider]
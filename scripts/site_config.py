@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Site Configuration for SmartPetBuys
+Resolves every data path against a site root so several sites (or test fixtures) can share one process.
+"""
+
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Mapping, Optional, Tuple, Union
+
+
+@dataclass(frozen=True)
+class SiteConfig:
+    """Immutable description of one Hugo site's files; relative paths resolve against root."""
+
+    root: Path = Path('.')
+    name: str = ''
+    keywords_csv: str = "keywords.csv"
+    tracker: str = "data/content_tracker.json"
+    posts_dir: str = "content/posts"
+    products: str = "data/products.json"
+    catalog: str = "catalog/products.jsonl"
+
+    def __post_init__(self):
+        object.__setattr__(self, 'root', Path(self.root))
+        if not self.name:
+            object.__setattr__(self, 'name', self.root.resolve().name)
+
+    @classmethod
+    def from_root(cls, root: Union[str, Path], **overrides) -> "SiteConfig":
+        """Config for a site checked out at root, using the standard layout unless overridden."""
+        return cls(root=Path(root), **overrides)
+
+    def path(self, relative: Union[str, Path]) -> Path:
+        """Resolve a site-relative path (absolute paths are returned unchanged)."""
+        return self.root / relative
+
+    def relative(self, path: Union[str, Path]) -> str:
+        """Site-relative POSIX form of a path, as stored in the content tracker."""
+        path = Path(path)
+        try:
+            path = path.relative_to(self.root)
+        except ValueError:
+            pass
+        return path.as_posix()
+
+    @property
+    def keywords_path(self) -> Path:
+        return self.path(self.keywords_csv)
+
+    @property
+    def tracker_path(self) -> Path:
+        return self.path(self.tracker)
+
+    @property
+    def posts_path(self) -> Path:
+        return self.path(self.posts_dir)
+
+    @property
+    def products_path(self) -> Path:
+        return self.path(self.products)
+
+    @property
+    def catalog_path(self) -> Path:
+        return self.path(self.catalog)
+
+
+DEFAULT_SITE = SiteConfig()
+
+# Read-only resources shared by every site in the process that points at the same files
+_catalogs: Dict[Tuple[str, str], Tuple[Optional[int], Mapping]] = {}
+_shared_lock = threading.Lock()
+
+
+def catalog_signature(site: SiteConfig) -> Optional[int]:
+    """Modification time of whichever catalog file the site reads."""
+    for path in (site.catalog_path, site.products_path):
+        if path.exists():
+            return path.stat().st_mtime_ns
+    return None
+
+
+def shared_catalog(site: SiteConfig = DEFAULT_SITE) -> Mapping:
+    """Open a site's product catalog once per process, reopening it only when the file changes."""
+    from product_catalog import open_catalog
+
+    key = (str(site.catalog_path.resolve()), str(site.products_path.resolve()))
+    signature = catalog_signature(site)
+    with _shared_lock:
+        cached = _catalogs.get(key)
+        if cached and cached[0] == signature:
+            return cached[1]
+        catalog = open_catalog(str(site.catalog_path), str(site.products_path))
+        _catalogs[key] = (signature, catalog)
+        return catalog
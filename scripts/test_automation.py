@@ -7,9 +7,14 @@ Validates all components of the Phase 1 implementation.
 import os
 import sys
 import json
+import hashlib
 import csv
 import tempfile
 import shutil
+import threading
+import asyncio
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 from datetime import datetime, timezone
 
@@ -20,12 +25,195 @@ try:
     from generate_single_post import SmartPetBuysGenerator, ContentTracker
     from keyword_manager import KeywordManager
     from duplicate_checker import DuplicateChecker
+    from generation_worker import GenerationWorker, make_handler
+    from validate_product_data import validate_catalog, validate_product
+    from product_catalog import (IndexedCatalog, export_products_json, load_catalog, write_catalog,
+                                 write_products_json)
+    from ingest_products import ProductIngester
+    from build_hero_images import VARIANT_WIDTHS, HeroImageBuilder, _available_formats
+    from benchmark_imports import IMPORT_BUDGETS_MS, measure_import
+    from request_controller import CircuitOpenError, RequestController
+    from llm_ledger import iter_records, summarize, write_prometheus
+    import content_audit
+    from content_audit import analyze_markdown, audit_posts
+    from corpus_archive import CorpusArchive
+    from tracker_rollups import TrackerRollups
+    from frontmatter_io import load_post, read_header, write_post
+    from related_posts import RelatedIndex, load_related
+    from reconcile_tracker import TrackerReconciler
+    from site_config import SiteConfig, shared_catalog
+    from title_index import TitleIndex, normalize_text as title_normalize
+    from phrase_index import PhraseIndex
+    from duplicate_risk import DuplicateRiskPredictor
+    from keyword_clusters import CLUSTER_THRESHOLD, KeywordClusterer, canonical_order
+    from refresh_products import ProductApiSource, ProductRefresher
+    from link_health import ConnectionPool, LinkChecker, check_site
+    import refresh_product_cards
+    from refresh_product_cards import ProductCardRefresher
+    from frontmatter_io import dumps
+    from validate_post import PostValidator, content_pages, known_shortcodes, validate_text
 except ImportError as e:
     print(f"❌ Import error: {e}")
     print("Make sure all required scripts are in the same directory")
     sys.exit(1)
 
 
+class StubProvider:
+    """Local chat-completions stub that replays scripted (status, headers[, delay]) responses."""
+    
+    def __init__(self, script, content="Stub article"):
+        self.script = list(script)
+        self.hits = 0
+        stub = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                stub.hits += 1
+                status, headers, *delay = stub.script.pop(0) if stub.script else (200, {})
+                time.sleep(delay[0] if delay else 0)
+                if status == 200:
+                    payload = {"id": "stub", "object": "chat.completion", "created": 0, "model": "gpt-4o-mini",
+                               "choices": [{"index": 0, "finish_reason": "stop",
+                                            "message": {"role": "assistant", "content": content}}],
+                               "usage": {"prompt_tokens": 900, "completion_tokens": 1200, "total_tokens": 2100}}
+                else:
+                    payload = {"error": {"message": f"Injected {status}", "type": "stub"}}
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+    
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+class StubProductApi:
+    """Local product-data API stub answering batched lookups with per-product ETags."""
+    
+    def __init__(self, products, script=()):
+        self.products = products
+        self.script = list(script)
+        self.hits = 0
+        self.connections = set()
+        stub = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                stub.hits += 1
+                stub.connections.add(self.client_address)
+                status, headers = stub.script.pop(0) if stub.script else (200, {})
+                if status == 200:
+                    fresh, not_modified = {}, []
+                    for item in request['products']:
+                        data = stub.products.get(item['id'])
+                        if data is None:
+                            continue
+                        etag = hashlib.md5(json.dumps(data, sort_keys=True).encode()).hexdigest()
+                        if etag == item['etag']:
+                            not_modified.append(item['id'])
+                        else:
+                            fresh[item['id']] = {**data, 'etag': etag}
+                    if not fresh:
+                        status = 304
+                    payload = {'products': fresh, 'not_modified': not_modified}
+                else:
+                    payload = {'error': f"Injected {status}"}
+                body = json.dumps(payload).encode() if status != 304 else b''
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+    
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+class StubLinkServer:
+    """Local HTTP server with redirects, dead links and HEAD-refusing routes for link checks."""
+    
+    ROUTES = {
+        '/ok': (200, None),
+        '/short': (301, '/ok'),
+        '/hop': (302, '/short'),
+        '/gone': (404, None),
+        '/loop': (302, '/loop'),
+    }
+    
+    def __init__(self, delay=0.0):
+        self.hits = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.connections = set()
+        self.lock = threading.Lock()
+        stub = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            
+            def respond(self):
+                with stub.lock:
+                    stub.hits += 1
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                    stub.connections.add(self.client_address)
+                time.sleep(delay)
+                with stub.lock:
+                    stub.in_flight -= 1
+                if self.path == '/nohead' and self.command == 'HEAD':
+                    status, location = 405, None
+                else:
+                    status, location = stub.ROUTES.get(self.path.split('?')[0], (200, None))
+                body = b'' if self.command == 'HEAD' else b'x'
+                try:
+                    self.send_response(status)
+                    if location:
+                        self.send_header('Location', location)
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client timed out and hung up while we were sleeping
+            
+            do_HEAD = respond
+            do_GET = respond
+            
+            def log_message(self, format, *args):
+                pass
+        
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+    
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
 class AutomationTester:
     """Comprehensive testing for blog automation system."""
     
@@ -152,6 +340,67 @@ Choose toys appropriate for your puppy's size and age.
         
         print("[SUCCESS] ContentTracker tests passed")
     
+    def test_tracker_rollups(self):
+        """Test the incrementally maintained tracker rollups against a rebuild."""
+        print("\n[TEST] Testing tracker rollups...")
+        
+        tracker = ContentTracker("data/rollup_tracker.json")
+        tracker.add_post("dog beds", "Best Dog Beds", "hash-a", "content/posts/a/index.md", category="Reviews")
+        tracker.add_post("dog beds", "Dog Bed Guide", "hash-a", "content/posts/b/index.md", category="Guides")
+        tracker.add_post("cat trees", "Cat Trees", "hash-c", "content/posts/c/index.md")
+        # Backdated entries, as reconcile_tracker.py repairs them from frontmatter dates
+        for name, created in (("fish tanks", "2024-01-03"), ("bird cages", "2024-02-10T09:00:00-05:00")):
+            tracker.data["posts"][name] = {"keyword": name, "title": name.title(), "content_hash": name,
+                                           "file_path": f"content/posts/{name}/index.md", "created": created}
+        tracker.save()
+        
+        rollups = ContentTracker("data/rollup_tracker.json").rollups
+        assert rollups.keyword("dog beds")["posts"] == 2, rollups.keyword("dog beds")
+        assert rollups.category("Reviews") == 1 and rollups.category("Uncategorized") == 3
+        assert rollups.posts_on("2024-W01") == 1 and rollups.posts_on("2024-02-10") == 1
+        assert rollups.collisions() == {"hash-a": 2}, rollups.collisions()
+        assert [keyword for keyword, _ in rollups.unused_for(30)] == ["fish tanks", "bird cages"], \
+            rollups.unused_for(30)
+        
+        # Incremental updates agree with a full rebuild, including reuse of a stale keyword
+        tracker = ContentTracker("data/rollup_tracker.json")
+        tracker.add_post("fish tanks", "Fish Tank Filters", "hash-f", "content/posts/f/index.md", category="Guides")
+        rebuilt = TrackerRollups.build(tracker.data["posts"].values()).data
+        # Heap layout depends on insertion order; every table must match
+        assert all(tracker.rollups.data[key] == rebuilt[key] for key in rebuilt if key != "last_used_heap"), \
+            "Incremental rollups drifted from a rebuild"
+        assert [keyword for keyword, _ in tracker.rollups.unused_for(30)] == ["bird cages"], "Reused keyword still stale"
+        
+        # Rollups edited around (here: a post deleted by hand) are rebuilt on load
+        with open("data/rollup_tracker.json", "r", encoding="utf-8") as f:
+            data = json.load(f)
+        del data["posts"]["bird cages"]
+        with open("data/rollup_tracker.json", "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        rollups = ContentTracker("data/rollup_tracker.json").rollups
+        assert rollups.summary()["posts"] == 5 and not rollups.unused_for(30), rollups.summary()
+        
+        # Duplicate and keyword stats come from the rollups rather than a scan of the posts
+        checker = DuplicateChecker(tracker_path="data/rollup_tracker.json")
+        stats = checker.get_duplicate_stats()
+        assert checker._existing_posts is None, "Duplicate stats loaded every post"
+        assert (stats["total_posts"], stats["unique_hashes"], stats["duplicate_hashes"]) == (5, 4, 1), stats
+        assert stats["keyword_usage"] == {"dog beds": 2, "cat trees": 1, "fish tanks": 2}, stats["keyword_usage"]
+        assert stats["most_used_keywords"][0][1] == 2 and stats["most_used_keywords"][-1] == ("cat trees", 1)
+        with open("rollup_keywords.csv", "w", newline="", encoding="utf-8") as f:
+            f.write("keyword,publish,priority\ndog beds,yes,high\nfish tanks,no,low\n"
+                    "hamster wheels,yes,medium\nparrot perches,no,medium\n")
+        tracker = ContentTracker("data/rollup_tracker.json")
+        tracker.data["posts"]["hamster wheels"] = {"keyword": "hamster wheels", "title": "Hamster Wheels",
+                                                   "content_hash": "hamster", "created": "2023-05-01",
+                                                   "file_path": "content/posts/hamster-wheels/index.md"}
+        tracker.save()
+        stats = KeywordManager("rollup_keywords.csv", "data/rollup_tracker.json").get_keyword_stats()
+        assert stats["usage_by_priority"] == {"high": 2, "medium": 1, "low": 2}, stats
+        assert stats["never_used_keywords"] == 1 and stats["stale_keywords"] == 1, stats
+        
+        print("[SUCCESS] Tracker rollups tests passed")
+    
     def test_keyword_manager(self):
         """Test KeywordManager functionality."""
         print("\n[TEST] Testing KeywordManager...")
@@ -177,6 +426,73 @@ Choose toys appropriate for your puppy's size and age.
         
         print("[SUCCESS] KeywordManager tests passed")
     
+    def test_keyword_clusters(self):
+        """Test keyword cannibalization clustering and one-post-per-cluster scheduling."""
+        print("\n[TEST] Testing keyword clustering...")
+        
+        root = self.test_dir / "sites" / "clusters"
+        (root / "content" / "posts").mkdir(parents=True)
+        (root / "data").mkdir()
+        shutil.copy("data/products.json", root / "data" / "products.json")
+        with open(root / "keywords.csv", "w", newline="", encoding="utf-8") as f:
+            f.write("keyword,publish,priority,estimated_volume\n"
+                    "dog training treats,yes,medium,900\n"
+                    "best dog treats for training,yes,high,1400\n"
+                    "dog treats for training,yes,low,300\n"
+                    "Best Dog Training Treat — Reviews,no,low,50\n"
+                    "dog food for puppies,yes,high,2000\n"
+                    "dog food for allergies,yes,high,1800\n"
+                    "cat litter box cleaning tips,yes,medium,800\n")
+        site = SiteConfig.from_root(root)
+        
+        manager = KeywordManager(site=site)
+        result = manager.cluster_keywords()
+        assert result["merged"] == {"best dog treats for training": [
+            "dog training treats", "dog treats for training", "Best Dog Training Treat — Reviews"]}, \
+            f"Unexpected clusters: {result['merged']}"
+        assert result["clusters"] == 4, f"Distinct intents merged: {result}"
+        with open(root / "keywords.csv", newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        assert list(rows[0]) == ["keyword", "publish", "priority", "estimated_volume", "cluster"], "Columns changed"
+        assert rows[0]["cluster"] == "best dog treats for training" and rows[4]["cluster"] == "dog food for puppies"
+        assert rows[1]["priority"] == "high" and rows[3]["publish"] == "no", "Existing columns not preserved"
+        
+        # Blocking only skips pairs that cannot cluster: check every keyword against every canonical one
+        modifiers = ["cheap", "durable", "organic", "heated", "portable", "quiet", "smart", "premium"]
+        products = ["bed", "crate", "fountain", "harness", "feeder", "carrier", "shampoo", "ramp"]
+        suffixes = ["", " for travel", " for large breeds", " reviews", " for senior pets"]
+        bulk = [{"keyword": f"{modifier} {pet} {product}{suffix}", "priority": "medium",
+                 "estimated_volume": str(len(modifier) * 100 + len(suffix))}
+                for modifier in modifiers for pet in ("dog", "cat") for product in products for suffix in suffixes]
+        bulk += [{"keyword": f"best {pet} {product}s{suffix}", "priority": "high", "estimated_volume": "900"}
+                 for pet in ("dog", "cat") for product in products for suffix in suffixes]
+        clusterer = KeywordClusterer()
+        assignment = clusterer.cluster(bulk)
+        leaders = []
+        for row in sorted(bulk, key=canonical_order):
+            keyword = row["keyword"]
+            if assignment[keyword] == keyword:
+                missed = [leader for leader in leaders if clusterer.similarity(keyword, leader) >= CLUSTER_THRESHOLD]
+                assert not missed, f"Blocking missed {keyword!r} ~ {missed}"
+                leaders.append(keyword)
+            else:
+                assert clusterer.similarity(keyword, assignment[keyword]) >= CLUSTER_THRESHOLD
+        assert assignment["best dog beds for travel"] != assignment["best dog crates for travel"], "Products merged"
+        assert assignment["best cat beds"] != assignment["best dog beds"], "Pets merged"
+        assert 30 < len(leaders) < len(bulk) / 2, f"Unexpected cluster count: {len(leaders)}"
+        
+        # Once one keyword of a cluster has a post, its cluster-mates are held back
+        generator = SmartPetBuysGenerator(site)
+        generator.content_tracker.add_post("dog training treats", "Dog Training Treats", "hash",
+                                           str(site.posts_path / "dog-training-treats" / "index.md"))
+        publishable = [kw["keyword"] for kw in KeywordManager(site=site).get_publishable_keywords()]
+        assert "best dog treats for training" not in publishable and "dog training treats" in publishable, \
+            f"Cluster not held back: {publishable}"
+        selected = generator._select_keyword(generator._load_keywords())
+        assert selected["keyword"] == "dog food for puppies", f"Cluster-mate selected: {selected}"
+        
+        print("[SUCCESS] Keyword clustering tests passed")
+    
     def test_duplicate_checker(self):
         """Test DuplicateChecker functionality."""
         print("\n[TEST] Testing DuplicateChecker...")
@@ -212,6 +528,221 @@ Choose toys appropriate for your puppy's size and age.
         
         print("[SUCCESS] DuplicateChecker tests passed")
     
+    def test_site_config(self):
+        """Test that injected site configs keep several sites isolated within one process."""
+        print("\n[TEST] Testing multi-site configuration...")
+        
+        sites = {}
+        for name, keyword in (("cats", "cat litter box cleaning tips"), ("dogs", "best dog toys for puppies")):
+            root = self.test_dir / "sites" / name
+            (root / "content" / "posts" / f"{name}-guide").mkdir(parents=True)
+            (root / "data").mkdir()
+            shutil.copy("data/products.json", root / "data" / "products.json")
+            with open(root / "keywords.csv", "w", newline="", encoding="utf-8") as f:
+                f.write(f"keyword,publish,priority,estimated_volume\n{keyword},yes,high,900\n")
+            with open(root / "content" / "posts" / f"{name}-guide" / "index.md", "w", encoding="utf-8") as f:
+                f.write(f'---\ntitle: "{name.title()} Guide"\n---\n\nAll about {name}.\n')
+            sites[name] = SiteConfig.from_root(root)
+        
+        results = {}
+        
+        def run_site(name):
+            site = sites[name]
+            generator = SmartPetBuysGenerator(site)
+            keyword = generator._load_keywords()[0]["keyword"]
+            generator.content_tracker.add_post(keyword, f"{name} title", "hash",
+                                               str(site.posts_path / f"{name}-guide" / "index.md"))
+            generator.update_keywords_csv(keyword)
+            checker = DuplicateChecker(site=site)
+            results[name] = {
+                "keyword": keyword,
+                "posts": [post["title"] for post in checker.existing_posts],
+                "publishable": KeywordManager(site=site).get_publishable_keywords(),
+                "tracked": ContentTracker(site=site).data["posts"],
+                "products": generator.products,
+            }
+        
+        threads = [threading.Thread(target=run_site, args=(name,)) for name in sites]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert results["cats"]["keyword"].startswith("cat") and results["dogs"]["keyword"].startswith("best dog"), \
+            "Sites read each other's keywords"
+        assert results["cats"]["posts"] == ["Cats Guide"], f"Wrong corpus: {results['cats']['posts']}"
+        assert results["dogs"]["publishable"] == [], "Keyword CSV update went to the wrong site"
+        tracked = next(iter(results["dogs"]["tracked"].values()))
+        assert tracked["file_path"] == "content/posts/dogs-guide/index.md", f"Path not site-relative: {tracked}"
+        assert not ContentTracker().data["posts"].get(next(iter(results["dogs"]["tracked"]))), \
+            "Site tracker leaked into the default site"
+        assert results["cats"]["products"] is shared_catalog(sites["cats"]), "Catalog not shared per file"
+        assert "toy-01" in results["dogs"]["products"], "Site catalog not loaded"
+        
+        print("[SUCCESS] Multi-site configuration tests passed")
+    
+    def test_title_index(self):
+        """Test the persistent trigram title index and fuzzy title lookups."""
+        print("\n[TEST] Testing title trigram index...")
+        
+        posts_dir = Path("title_posts")
+        titles = {"litter": "Best Clumping Cat Litter for Multiple Cats", "harness": "No-Pull Dog Harness Guide",
+                  "beds": "Orthopedic Dog Beds for Senior Dogs"}
+        for slug, title in titles.items():
+            (posts_dir / slug).mkdir(parents=True)
+            with open(posts_dir / slug / "index.md", "w", encoding="utf-8") as f:
+                f.write(f'+++\ntitle = "{title}"\n+++\n\nBody.\n')
+        
+        index = TitleIndex(str(posts_dir), ".cache/title_index_test.json")
+        assert index.refresh()["added"] == 3, "Titles not indexed"
+        assert index.find_duplicate("best  clumping CAT litter for the multiple cats")[0] == 1.0, "Exact match missed"
+        near = index.find_duplicate("Best Clumping Cat Litters for Multiple Cats")
+        assert near and near[1].endswith("litter/index.md"), f"Near-duplicate title missed: {near}"
+        assert index.find_duplicate("Automatic Fish Feeders Compared") is None, "Unrelated title flagged"
+        assert index.search("dog harness", limit=1)[0][2] == titles["harness"], "Search ranking wrong"
+        
+        # A fresh instance loads postings from disk and only re-reads changed files
+        shutil.rmtree(posts_dir / "beds")
+        with open(posts_dir / "harness" / "index.md", "w", encoding="utf-8") as f:
+            f.write('+++\ntitle = "Escape-Proof Cat Harness Guide"\n+++\n\nBody.\n')
+        reloaded = TitleIndex(str(posts_dir), ".cache/title_index_test.json")
+        changes = reloaded.refresh()
+        assert changes == {"added": 0, "updated": 1, "removed": 1}, f"Incremental refresh wrong: {changes}"
+        assert reloaded.find_duplicate("Orthopedic Dog Beds for Senior Dogs") is None, "Deleted title still indexed"
+        assert reloaded.find_duplicate("Escape Proof Cat Harness Guide"), "Edited title not re-indexed"
+        assert len(reloaded) == 2, f"Unexpected index size: {len(reloaded)}"
+        
+        # Titles built from one shared vocabulary share most trigrams; the index must still flag exactly
+        # what a SequenceMatcher scan over every title flags
+        import random
+        from difflib import SequenceMatcher
+        rng = random.Random(40)
+        vocab = ("dog cat puppy kitten senior best top indoor automatic litter box harness leash collar toys chew "
+                 "puzzle treats food bed carrier crate fountain bowl feeder brush grooming dental joint guide").split()
+        corpus = TitleIndex(str(posts_dir), None)
+        titles = [' '.join(rng.choice(vocab) for _ in range(rng.randint(3, 6))).title() for _ in range(800)]
+        for i, title in enumerate(titles):
+            corpus.add(f"post-{i}", title)
+        norms = [title_normalize(title) for title in titles]
+        
+        def perturb(title):
+            words = title.split()
+            for _ in range(rng.randint(1, 2)):
+                position = rng.randrange(len(words))
+                choice = rng.random()
+                if choice < 0.3:
+                    words[position] += "s"
+                elif choice < 0.5 and len(words) > 3:
+                    del words[position]
+                elif choice < 0.7:
+                    words.insert(position, rng.choice(vocab).title())
+                else:
+                    word = words[position]
+                    cut = rng.randrange(len(word))
+                    words[position] = word[:cut] + rng.choice("aeiou") + word[cut + 1:]
+            return ' '.join(words)
+        
+        flagged = 0
+        for query in (perturb(rng.choice(titles)) for _ in range(150)):
+            norm = title_normalize(query)
+            ratios = [1.0 if norm == existing else SequenceMatcher(None, norm, existing).ratio() for existing in norms]
+            expected = max((ratio for ratio in ratios if ratio > 0.85), default=None)
+            match = corpus.find_duplicate(query)
+            assert (match and match[0]) == expected, f"Index and full scan disagree on '{query}': {match} vs {expected}"
+            flagged += expected is not None
+        assert flagged > 50, f"Corpus produced too few near-duplicates to compare ({flagged})"
+        
+        print("[SUCCESS] Title index tests passed")
+    
+    def test_phrase_index(self):
+        """Test the phrase index and boilerplate-aware content overlap."""
+        print("\n[TEST] Testing phrase index...")
+        
+        template = ("## Top Product Recommendations\n\nKeep your furry friend happy and healthy with these picks. "
+                    "Consider your pet's size, age and daily routine when choosing the right option. "
+                    "## Frequently Asked Questions\n\nHow often should you replace it? Check with your vet.\n\n")
+        topics = {
+            "litter": "clumping clay litter traps ammonia odor while corn blends stay lightweight and flushable",
+            "harness": "padded chest plates spread pressure evenly and front clips discourage strong pulling",
+            "fountain": "recirculating water fountains encourage hydration through charcoal filtered streams",
+            "beds": "memory foam bolsters cradle aging joints and removable covers survive weekly washing",
+            "feeder": "timed feeders portion kibble automatically and prevent gulping during long workdays",
+            "carrier": "airline approved carriers need ventilated mesh panels and seatbelt loops for safety",
+        }
+        posts_dir = Path("phrase_posts")
+        for slug, words in topics.items():
+            (posts_dir / slug).mkdir(parents=True)
+            with open(posts_dir / slug / "index.md", "w", encoding="utf-8") as f:
+                f.write(f'---\ntitle: "{slug.title()} Guide"\n---\n\n{template}{words}.\n')
+        
+        index = PhraseIndex(str(posts_dir), ".cache/phrase_index_test.json")
+        assert index.refresh()["added"] == 6, "Posts not indexed"
+        assert ("frequently asked questions", 6) in index.boilerplate(), "Template phrases not treated as boilerplate"
+        
+        checker = DuplicateChecker(content_dir=str(posts_dir))
+        fresh = template + "stainless steel bowls resist bacteria and weighted rims stop messy tipping at mealtime."
+        is_dup, msg = checker.check_content_duplicate(fresh, similarity_threshold=0.95)
+        assert not is_dup, f"Shared template flagged as duplicate: {msg}"
+        copied = f"{template}{topics['harness']} {topics['harness']}"
+        is_dup, msg = checker.check_content_duplicate(copied, similarity_threshold=0.95)
+        assert is_dup and "Harness Guide" in msg, f"Copied post not flagged: {msg}"
+        
+        # Reloaded from disk, deletions are picked up without re-reading unchanged posts
+        shutil.rmtree(posts_dir / "harness")
+        reloaded = PhraseIndex(str(posts_dir), ".cache/phrase_index_test.json")
+        assert reloaded.refresh() == {"added": 0, "updated": 0, "removed": 1}, "Incremental refresh wrong"
+        assert not reloaded.overlaps({"padded chest plates"}), "Deleted post still indexed"
+        
+        # Edits leave tombstoned ids in the postings until compaction; they must not count towards boilerplate
+        edited = PhraseIndex(str(posts_dir), None)
+        for slug in ("a", "b", "c", "d", "e"):
+            edited.add(slug, slug.upper(), {"padded chest plates", f"{slug} only phrase"})
+        for _ in range(3):
+            edited.add("a", "A", {"padded chest plates", "a only phrase"})
+        assert len(edited.postings["padded chest plates"]) == 8 and edited.df_cutoff() == 5
+        assert edited.boilerplate() == [], f"Tombstones counted as documents: {edited.boilerplate()}"
+        assert len(edited.overlaps({"padded chest plates"})) == 5, "Phrase skipped as boilerplate after edits"
+        
+        print("[SUCCESS] Phrase index tests passed")
+    
+    def test_duplicate_risk(self):
+        """Test pre-generation duplicate risk prediction and risk-aware keyword selection."""
+        print("\n[TEST] Testing duplicate risk prediction...")
+        
+        root = self.test_dir / "sites" / "risk"
+        (root / "content" / "posts" / "puppy-toys").mkdir(parents=True)
+        (root / "data").mkdir()
+        shutil.copy("data/products.json", root / "data" / "products.json")
+        shutil.copy("keywords.csv", root / "keywords.csv")
+        with open(root / "content" / "posts" / "puppy-toys" / "index.md", "w", encoding="utf-8") as f:
+            f.write('---\ntitle: "Best Dog Toys for Puppies — SmartPetBuys"\ntags: ["dog toys"]\n---\n\n'
+                    '{{< product id="toy-01" >}}\n\nChew toys for teething puppies.\n')
+        site = SiteConfig.from_root(root)
+        generator = SmartPetBuysGenerator(site)
+        
+        predictor = DuplicateRiskPredictor(str(site.posts_path), None)
+        assert predictor.refresh() == 1, "Post features not extracted"
+        toys = generator._get_relevant_products("best dog toys for puppies")
+        existing = predictor.predict("best dog toys for puppies", toys)
+        assert existing["action"] == "skip", f"Covered topic not skipped: {existing}"
+        assert existing["closest_post"].startswith("Best Dog Toys"), f"Wrong closest post: {existing}"
+        fresh = predictor.predict("cat litter box cleaning tips", generator._get_relevant_products("cat litter"))
+        assert fresh["action"] == "generate" and fresh["risk"] < 0.4, f"Unrelated topic flagged: {fresh}"
+        
+        # Earlier posts and discarded drafts for a keyword raise its risk on their own
+        used = predictor.predict("cat litter box cleaning tips", history={"usage_count": 2, "rejected": 1})
+        assert used["history_risk"] > 0.5 and used["risk"] > fresh["risk"], f"History ignored: {used}"
+        generator.content_tracker.record_rejection("cat litter box cleaning tips")
+        assert generator.content_tracker.data["keywords"]["cat litter box cleaning tips"]["rejected"] == 1, \
+            "Rejection not recorded"
+        
+        # The high-priority keyword already has a post, so selection falls through to the next one
+        selected = generator._select_keyword(generator._load_keywords())
+        assert selected["keyword"] == "cat litter box cleaning tips", f"High-risk keyword selected: {selected}"
+        assert selected["risk"]["action"] == "generate" and selected["products"], "Selection lost risk details"
+        
+        print("[SUCCESS] Duplicate risk tests passed")
+    
     def test_generator_validation(self):
         """Test SmartPetBuysGenerator validation methods."""
         print("\n[TEST] Testing Generator validation...")
@@ -233,23 +764,28 @@ This is a comprehensive article about pet products.
 
 ## Section 1
 
-Here is the first section with detailed information about pet care and products.
+Here is the first section with detailed information about pet care and products. It explains how to
+compare options, which materials hold up to daily use, and what to expect from each price range.
 
 ## Section 2
 
-Another section with more valuable content for pet owners.
+Another section with more valuable content for pet owners. It covers sizing, safety considerations
+and the questions worth asking before buying anything new for your dog or cat.
 
 ### Subsection
 
-Even more detailed information here.
+Even more detailed information here, including cleaning routines, replacement schedules and the
+warning signs that a product is no longer safe for your pet to use.
 
 ## Section 3
 
-A third section with practical advice.
+A third section with practical advice on introducing new products gradually and rewarding calm,
+curious behavior so your pet builds positive associations.
 
 ## Conclusion
 
-Final thoughts and recommendations.
+Final thoughts and recommendations: start with the essentials, buy for your pet's size and age, and
+replace worn items early.
 
 This content has multiple paragraphs and proper structure to meet quality standards.
 """
@@ -262,6 +798,995 @@ This content has multiple paragraphs and proper structure to meet quality standa
         
         print("[SUCCESS] Generator validation tests passed")
     
+    def test_generation_worker(self):
+        """Test the resident worker's job API, bounded queue and incremental refresh."""
+        print("\n[TEST] Testing generation worker...")
+        import openai
+        import urllib.error
+        import urllib.request
+        
+        root = self.test_dir / "sites" / "worker"
+        (root / "content" / "posts" / "dog-harness-guide").mkdir(parents=True)
+        (root / "data").mkdir()
+        shutil.copy("data/products.json", root / "data" / "products.json")
+        with open(root / "content" / "posts" / "dog-harness-guide" / "index.md", "w", encoding="utf-8") as f:
+            f.write('---\ntitle: "Dog Harness Guide"\n---\n\nPick a harness that fits the chest.\n')
+        site = SiteConfig.from_root(root)
+        
+        article = "\n\n".join(f"## Feeder Tip {i}\n\n" + f"Puzzle feeder tip {i} slows fast eaters down. " * 6
+                              for i in range(6))
+        # The first completion is held back so the worker stays busy while the queue fills
+        stub = StubProvider([(200, {}, 1.0)], content=article)
+        worker = GenerationWorker(max_queued=1, site=site)
+        worker.generator._client = openai.OpenAI(api_key="test", base_url=stub.base_url, max_retries=0)
+        worker.generator.request_controller = RequestController(base_delay=0.01)
+        server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(worker))
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        api_key = os.environ.get('OPENAI_API_KEY')
+        os.environ['OPENAI_API_KEY'] = "test"
+        
+        def call(path, payload=None):
+            data = json.dumps(payload).encode() if payload is not None else None
+            try:
+                with urllib.request.urlopen(urllib.request.Request(base + path, data=data), timeout=10) as response:
+                    return response.status, json.load(response)
+            except urllib.error.HTTPError as e:
+                return e.code, json.load(e)
+        
+        def wait_for(job_id, statuses):
+            deadline = time.monotonic() + 10
+            while time.monotonic() < deadline:
+                status, job = call(f"/jobs/{job_id}")
+                if job['status'] in statuses:
+                    return job
+                time.sleep(0.02)
+            raise AssertionError(f"Job {job_id} stuck in {job['status']}")
+        
+        try:
+            worker.start()
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            
+            status, job = call("/jobs", {"type": "generate", "keyword": "dog puzzle feeders"})
+            assert status == 202 and job['status'] == 'queued', f"Generate job not accepted: {status} {job}"
+            wait_for(job['id'], ('running',))
+            
+            # One job running and one waiting fills a queue of one; the next submission is turned away
+            status, check = call("/jobs", {"type": "check", "keyword": "dog puzzle feeders", "content": article})
+            assert status == 202, f"Check job not queued: {status} {check}"
+            status, rejected = call("/jobs", {"type": "check", "keyword": "cat trees", "content": article})
+            assert status == 503 and 'full' in rejected['error'], f"Full queue accepted a job: {status}"
+            
+            job = wait_for(job['id'], ('succeeded', 'failed'))
+            assert job['status'] == 'succeeded', f"Generate job failed: {job['result']}"
+            assert Path(job['result']['post_path']).exists(), "Generated post not written"
+            check = wait_for(check['id'], ('succeeded', 'failed'))
+            assert check['result']['duplicate'], "Post generated by the previous job not visible to the next check"
+            
+            assert call("/jobs/0123456789ab")[0] == 404, "Unknown job not reported as 404"
+            
+            # Posts and tracker entries written by other processes are picked up without a restart
+            (site.posts_path / "cat-tree-guide").mkdir()
+            with open(site.posts_path / "cat-tree-guide" / "index.md", "w", encoding="utf-8") as f:
+                f.write('---\ntitle: "Cat Tree Guide"\n---\n\nSisal posts wear well.\n')
+            ContentTracker(site=site).add_post("cat trees", "Cat Tree Guide", "hash",
+                                               str(site.posts_path / "cat-tree-guide" / "index.md"))
+            assert "Cat Tree Guide" not in [post['title'] for post in worker.checker.existing_posts]
+            worker.refresh()
+            titles = [post['title'] for post in worker.generator.existing_posts]
+            assert "Cat Tree Guide" in titles and "Dog Harness Guide" in titles, f"New post not loaded: {titles}"
+            assert worker.generator.content_tracker.get_keyword_usage("cat trees") == 1, "Tracker change missed"
+            assert any(post['keyword'] == "cat trees" for post in worker.checker.tracker_data['posts'].values()), \
+                "Checker tracker not refreshed"
+        finally:
+            server.shutdown()
+            server.server_close()
+            worker.stop()
+            stub.close()
+            if api_key is None:
+                os.environ.pop('OPENAI_API_KEY', None)
+            else:
+                os.environ['OPENAI_API_KEY'] = api_key
+        
+        print("[SUCCESS] Generation worker tests passed")
+    
+    def test_request_controller(self):
+        """Test rate limiting, retries and circuit breaking against a stub provider."""
+        print("\n[TEST] Testing request controller...")
+        import openai
+        
+        sleeps = []
+        limits = {'x-ratelimit-limit-requests': '100', 'x-ratelimit-remaining-requests': '0',
+                  'x-ratelimit-reset-requests': '2s'}
+        stub = StubProvider([(429, {'retry-after': '3'}), (503, {}), (200, limits)])
+        try:
+            generator = SmartPetBuysGenerator()
+            generator._client = openai.OpenAI(api_key="test", base_url=stub.base_url, max_retries=0)
+            generator.request_controller = RequestController(base_delay=0.01, sleep=sleeps.append)
+            generator.ledger_path = "logs/llm_usage.jsonl"
+            
+            content = generator._generate_content("dog toys", [])
+            assert content == "Stub article", "Stub response not returned after retries"
+            assert stub.hits == 3, f"Expected 3 attempts, got {stub.hits}"
+            assert sleeps[0] >= 3, "Retry-After was not honored"
+            assert generator.request_controller.requests.level == 0, "Rate-limit headers not tracked"
+            
+            # Exhausted request bucket: the next call waits for the server-reported refill
+            wait = generator.request_controller.requests.reserve(1, generator.request_controller.clock())
+            assert 0 < wait <= 2, f"Unexpected throttle delay {wait}"
+            
+            # Every call lands in the usage ledger
+            records = list(iter_records("logs/llm_usage.jsonl"))
+            assert len(records) == 1, "Generation call not recorded in the ledger"
+            assert records[0]['outcome'] == 'ok' and records[0]['attempts'] == 3, f"Bad record: {records[0]}"
+            assert records[0]['completion_tokens'] == 1200, "Token usage not recorded"
+            summary = summarize(iter(records))
+            assert summary['tokens_per_post']['prompt_tokens'] == 900, "Tokens per post miscomputed"
+            prom_path = write_prometheus("logs/llm_usage.jsonl", "logs/llm_usage.prom")
+            with open(prom_path, 'r', encoding='utf-8') as f:
+                assert 'smartpetbuys_llm_calls_total{outcome="ok"} 1' in f.read(), "Prometheus export incomplete"
+            
+            # Quantiles cover the window; the summary's _sum and _count keep counting every call ever made
+            with open("logs/llm_usage.jsonl", "a", encoding="utf-8") as f:
+                f.write(json.dumps({"ts": "2020-01-01T00:00:00+00:00", "outcome": "ok", "latency_ms": 4000.0}) + "\n")
+            with open(write_prometheus("logs/llm_usage.jsonl", "logs/llm_usage.prom"), 'r', encoding='utf-8') as f:
+                exported = dict(line.rsplit(' ', 1) for line in f.read().splitlines() if not line.startswith('#'))
+            assert exported['smartpetbuys_llm_latency_seconds_count'] == '2', "Summary count not a lifetime total"
+            assert float(exported['smartpetbuys_llm_latency_seconds_sum']) >= 4.0, "Summary sum not a lifetime total"
+            assert float(exported['smartpetbuys_llm_latency_seconds{quantile="0.99"}']) < 4.0, \
+                "Quantiles include calls outside the window"
+        finally:
+            stub.close()
+        
+        stub = StubProvider([(500, {})] * 10)
+        try:
+            client = openai.OpenAI(api_key="test", base_url=stub.base_url, max_retries=0)
+            controller = RequestController(max_attempts=2, base_delay=0.01, failure_threshold=2,
+                                           sleep=lambda seconds: None)
+            send = lambda: client.chat.completions.with_raw_response.create(
+                model="gpt-4o-mini", messages=[{"role": "user", "content": "hi"}])
+            try:
+                controller.call(send)
+                assert False, "5xx responses should raise after retries"
+            except openai.InternalServerError:
+                pass
+            try:
+                controller.call(send)
+                assert False, "Open circuit should fail fast"
+            except CircuitOpenError:
+                pass
+            assert stub.hits == 2, "Circuit breaker let requests through while open"
+        finally:
+            stub.close()
+        
+        # Hedging: a slow primary is overtaken by a duplicate fired at the latency percentile
+        stub = StubProvider([(200, {}, 1.5), (200, {})])
+        try:
+            client = openai.OpenAI(api_key="test", base_url=stub.base_url, max_retries=0)
+            controller = RequestController(hedge_percentile=0.9, hedge_max_extra=0.5)
+            controller.history.extend([(0.05, False)] * 20)
+            send = lambda: client.chat.completions.with_raw_response.create(
+                model="gpt-4o-mini", messages=[{"role": "user", "content": "hi"}])
+            started = time.perf_counter()
+            controller.call(send)
+            assert time.perf_counter() - started < 1.0, "Hedge did not cut the slow request short"
+            assert controller.stats['hedge_wins'] == 1, "Hedge request did not win"
+            
+            # Spend cap: no hedge once the window already holds the allowed share of hedged calls
+            controller.history.extend([(0.05, True)] * 20)
+            stub.script = [(200, {}, 0.3)]
+            controller.call(send)
+            assert controller.stats['hedges'] == 1, "Hedge budget cap not enforced"
+        finally:
+            stub.close()
+        
+        print("[SUCCESS] Request controller tests passed")
+    
+    def test_product_validation(self):
+        """Test incremental product catalog validation."""
+        print("\n[TEST] Testing product validation...")
+        
+        results = validate_catalog(cache_path=".cache/product_validation.json")
+        assert results['products'] == 2, "Catalog not streamed completely"
+        assert results['errors'] == 0, f"Valid products flagged: {results['issues']}"
+        assert results['revalidated'] == 2, "First run should validate every product"
+        
+        results = validate_catalog(cache_path=".cache/product_validation.json")
+        assert results['revalidated'] == 0, "Unchanged products were revalidated"
+        
+        issues = validate_product("bad-01", {
+            "name": "Bad Product",
+            "url": "amzn.to/bad",
+            "image": "https://example.com/bad.jpg",
+            "blurb": "Malformed fields",
+            "brand": "Bad",
+            "price": "$29.99",
+            "rating": "6.1",
+            "review_count": "lots"
+        })
+        flagged = {issue['field'] for issue in issues if issue['severity'] == 'error'}
+        assert flagged == {'url', 'price', 'rating', 'review_count'}, f"Unexpected issues: {flagged}"
+        
+        print("[SUCCESS] Product validation tests passed")
+    
+    def test_product_catalog(self):
+        """Test typed product catalog parsing."""
+        print("\n[TEST] Testing product catalog...")
+        
+        catalog = load_catalog()
+        kong = catalog["toy-01"]
+        assert kong.price == 12.99, "Price not parsed as a number"
+        assert kong.review_count == 15423, "Review count not parsed"
+        assert "durable rubber toy" in kong.search_text, "Search text not precomputed"
+        assert kong.to_dict()["review_count"] == "15,423", "Catalog export changed formatting"
+        
+        print("[SUCCESS] Product catalog tests passed")
+    
+    def test_indexed_catalog(self):
+        """Test the memory-mapped JSON Lines catalog against the products.json it replaces."""
+        print("\n[TEST] Testing indexed product catalog...")
+        
+        source = self.original_dir.parent / "data" / "products.json"
+        root = self.test_dir / "sites" / "indexed"
+        (root / "data").mkdir(parents=True)
+        shutil.copy(source, root / "data" / "products.json")
+        site = SiteConfig.from_root(root)
+        products = load_catalog(str(site.products_path))
+        assert write_catalog(products.values(), str(site.catalog_path)) == len(products)
+        
+        # Lookups binary-search the mapped index and decode single records
+        catalog = IndexedCatalog(str(site.catalog_path))
+        try:
+            assert len(catalog) == len(products) and set(catalog) == set(products), "Index lost products"
+            for product_id in ("toy-01", "kibble-01", list(products)[-1]):
+                assert catalog[product_id] == products[product_id], f"{product_id} decoded differently"
+            assert "missing-99" not in catalog and catalog.get("missing-99") is None
+        finally:
+            catalog.close()
+        
+        # Export back to products.json keeps every product, field and order
+        exported = root / "data" / "exported.json"
+        assert export_products_json(str(site.catalog_path), str(exported)) == len(products)
+        with open(source, "r", encoding="utf-8") as f:
+            original = json.load(f)
+        with open(exported, "r", encoding="utf-8") as f:
+            assert json.dumps(json.load(f)) == json.dumps(original), "Catalog round trip changed products.json"
+        
+        # Ranking over indexed candidates matches the in-memory search over products.json
+        indexed = SmartPetBuysGenerator(site)
+        in_memory = SmartPetBuysGenerator(site)
+        in_memory.products = products
+        assert isinstance(indexed.products, IndexedCatalog), "Generator did not open the indexed catalog"
+        for keyword in ("best dog puzzle toys", "cat litter box cleaning", "dog training treats",
+                        "senior dog joint supplements", "cat grooming brush", "automatic cat feeder"):
+            ranked = [product.id for product in indexed._get_relevant_products(keyword)]
+            assert ranked == [product.id for product in in_memory._get_relevant_products(keyword)], \
+                f"Ranking for '{keyword}' differs: {ranked}"
+        
+        # Editing the JSON Lines file by hand leaves the index stale; opening the catalog rebuilds it
+        index_path = site.catalog_path.with_suffix(".idx")
+        index_mtime = index_path.stat().st_mtime_ns
+        line = json.dumps({"id": "bowl-99", "name": "Slow Feeder Bowl", "url": "https://amzn.to/bowl99",
+                           "image": "https://m.media-amazon.com/images/I/bowl99.jpg", "blurb": "Slows fast eaters."})
+        with open(site.catalog_path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+        catalog = IndexedCatalog(str(site.catalog_path))
+        try:
+            assert catalog["bowl-99"].name == "Slow Feeder Bowl", "Stale index not rebuilt"
+            assert len(catalog) == len(products) + 1
+        finally:
+            catalog.close()
+        assert index_path.stat().st_mtime_ns != index_mtime, "Index file was not rewritten"
+        
+        print("[SUCCESS] Indexed product catalog tests passed")
+    
+    def test_product_ingestion(self):
+        """Test CSV product ingestion: header aliases, dedupe, rejects, dry runs and the atomic merge."""
+        print("\n[TEST] Testing product ingestion...")
+        
+        root = self.test_dir / "sites" / "ingest"
+        site = SiteConfig.from_root(root)
+        existing = {
+            "toy-01": {"name": "Chew Toy", "url": "https://amzn.to/toy01",
+                       "image": "https://m.media-amazon.com/images/I/toy01.jpg", "blurb": "Tough rubber.",
+                       "rating": "4.50", "review_count": "6,782+", "badge": "Best Seller"},
+        }
+        write_catalog(existing.items(), str(site.catalog_path))
+        write_products_json(existing.items(), str(site.products_path))
+        # The NEW_PRODUCTS_TO_ADD.csv layout: no blurb column, Category and Notes alongside
+        csv_path = root / "new_products.csv"
+        with open(csv_path, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["Product ID", "Product Name", "Category", "Keywords Supported", "Priority", "Notes",
+                             "Affiliate Link", "Image URL"])
+            writer.writerow(["feeder-01", "Automatic Feeder", "Feeding", "cat feeder", "high", "Missing from keywords",
+                             "https://amzn.to/feeder01", "https://m.media-amazon.com/images/I/feeder01.jpg"])
+            writer.writerow(["toy-01", "Chew Toy Again", "Toys", "", "low", "", "https://amzn.to/other",
+                             "https://m.media-amazon.com/images/I/other.jpg"])
+            writer.writerow(["toy-02", "Same Link Toy", "Toys", "", "low", "", "https://amzn.to/toy01",
+                             "https://m.media-amazon.com/images/I/toy02.jpg"])
+            writer.writerow(["mat-01", "Cooling Mat", "Cooling", "", "medium", "", "https://amzn.to/mat01",
+                             "http://example.com/mat01.jpg"])
+        
+        before = {path: path.read_bytes() for path in (site.catalog_path, site.products_path)}
+        ingester = ProductIngester(str(csv_path), str(site.products_path), str(site.catalog_path))
+        stats = ingester.ingest(dry_run=True)
+        assert stats["added"] == ["feeder-01"], f"Real CSV layout not ingested: {stats}"
+        assert stats["missing_blurbs"] == ["feeder-01"], "Missing blurb not reported"
+        assert stats["duplicate_ids"] == ["toy-01"], stats["duplicate_ids"]
+        assert stats["duplicate_urls"] == [{"id": "toy-02", "existing": "toy-01"}], stats["duplicate_urls"]
+        assert [(row["line"], row["id"]) for row in stats["rejected"]] == [(5, "mat-01")], stats["rejected"]
+        assert "image" in stats["rejected"][0]["reasons"][0], stats["rejected"]
+        assert all(path.read_bytes() == data for path, data in before.items()), "Dry run wrote files"
+        
+        inodes = {path: path.stat().st_ino for path in before}
+        stats = ingester.ingest()
+        assert stats["added"] == ["feeder-01"], stats
+        # Both files are swapped in whole (new inodes, no temp files left), never rewritten in place
+        assert all(path.stat().st_ino != inode for path, inode in inodes.items()), "Catalog rewritten in place"
+        assert not list(root.rglob("*.tmp")), "Temporary files left behind"
+        catalog = IndexedCatalog(str(site.catalog_path))
+        try:
+            feeder = catalog["feeder-01"]
+            assert (feeder.name, feeder.url, feeder.blurb) == ("Automatic Feeder", "https://amzn.to/feeder01", ""), \
+                feeder
+            assert catalog["toy-01"].name == "Chew Toy", "Existing product overwritten"
+        finally:
+            catalog.close()
+        with open(site.products_path, "r", encoding="utf-8") as f:
+            exported = json.load(f)
+        assert set(exported) == {"toy-01", "feeder-01"}, "products.json not re-exported"
+        assert exported["toy-01"] == existing["toy-01"], f"Untouched product rewritten: {exported['toy-01']}"
+        assert "category" not in exported["feeder-01"], "CSV-only columns leaked into the catalog"
+        assert [(issue["field"], issue["severity"]) for issue in validate_product("feeder-01", exported["feeder-01"])
+                if issue["field"] == "blurb"] == [("blurb", "warning")], "Missing blurb not flagged by the validator"
+        assert ingester.ingest()["added"] == [], "Re-ingesting the same CSV added products again"
+        
+        print("[SUCCESS] Product ingestion tests passed")
+    
+    def test_product_refresh(self):
+        """Test batched, rate-limited, conditional product data refresh against a stub API."""
+        print("\n[TEST] Testing product refresh...")
+        
+        root = self.test_dir / "sites" / "refresh"
+        (root / "data").mkdir(parents=True)
+        site = SiteConfig.from_root(root)
+        catalog = {f"toy-{i:02d}": {"name": f"Toy {i}", "url": f"https://amzn.to/toy{i}",
+                                    "image": f"https://m.media-amazon.com/images/I/toy{i}.jpg",
+                                    "blurb": "Chew toy.", "rating": "4.0", "review_count": "1,000",
+                                    "price": "10.00"} for i in range(12)}
+        with open(site.products_path, 'w', encoding='utf-8') as f:
+            json.dump(catalog, f, indent=2)
+        
+        live = {product_id: {"price": "10.00", "rating": "4.0", "review_count": "1000"} for product_id in catalog}
+        live["toy-03"] = {"price": "$12.49", "rating": "4.0", "review_count": "1,000"}
+        live["toy-07"] = {"price": "10", "rating": "4.2", "review_count": "1,250"}
+        stub = StubProductApi(live, script=[(429, {'retry-after': '0.1'})])
+        try:
+            source = ProductApiSource(stub.base_url, batch_size=2, rate=40, burst=2)
+            refresher = ProductRefresher(source, site=site, workers=3)
+            started = time.perf_counter()
+            stats = refresher.refresh()
+            elapsed = time.perf_counter() - started
+            
+            assert stats['batches'] == 6 and not stats['failed'], f"Batches failed: {stats}"
+            assert stub.hits == 7, f"Expected 6 batches plus one throttled retry, got {stub.hits}"
+            # Two burst slots, then 40/s for the remaining five requests, plus the 0.1s Retry-After
+            assert elapsed >= 0.2, f"Per-host rate limit not enforced ({elapsed:.2f}s)"
+            assert len(stub.connections) <= 3, f"Connections not pooled: {len(stub.connections)} opened"
+            
+            changed = {(change['id'], change['field']) for change in stats['changes']}
+            assert changed == {('toy-03', 'price'), ('toy-07', 'rating'), ('toy-07', 'review_count')}, \
+                f"Unexpected changes: {changed}"
+            with open(site.products_path, 'r', encoding='utf-8') as f:
+                refreshed = json.load(f)
+            assert refreshed["toy-03"]["price"] == "12.49", "Changed price not written in catalog format"
+            assert refreshed["toy-07"]["review_count"] == "1,250", "Review count not formatted"
+            assert refreshed["toy-07"]["price"] == "10.00", "Unchanged field was rewritten"
+            assert refreshed["toy-01"] == catalog["toy-01"], "Unchanged product was modified"
+            assert not list((root / "data").glob("*.tmp")), "Temporary catalog file left behind"
+            
+            # Second run: every batch matches its stored ETags and nothing is written
+            mtime = site.products_path.stat().st_mtime_ns
+            stub.hits = 0
+            stats = refresher.refresh()
+            assert stats['not_modified'] == 12 and not stats['changes'], f"ETags not honored: {stats}"
+            assert stub.hits == 6, "Conditional run made extra requests"
+            assert site.products_path.stat().st_mtime_ns == mtime, "Catalog rewritten without changes"
+            
+            # Only the product whose data moved comes back in full
+            live["toy-11"] = {"price": "8.99", "rating": "4.0", "review_count": "1,000"}
+            stats = refresher.refresh(dry_run=True)
+            assert stats['changes'] == [{'id': 'toy-11', 'field': 'price', 'old': '10.00', 'new': '8.99'}], \
+                f"Unexpected dry-run changes: {stats['changes']}"
+            assert site.products_path.stat().st_mtime_ns == mtime, "Dry run wrote the catalog"
+            source.close()
+        finally:
+            stub.close()
+        
+        print("[SUCCESS] Product refresh tests passed")
+    
+    def test_link_health(self):
+        """Test concurrent affiliate link/image checks with redirects and a TTL cache."""
+        print("\n[TEST] Testing link health checks...")
+        
+        stub = StubLinkServer()
+        try:
+            root = self.test_dir / "sites" / "links"
+            (root / "content" / "posts" / "dog-toys").mkdir(parents=True)
+            (root / "data").mkdir()
+            base = stub.base_url
+            products = {
+                "toy-01": {"name": "Short Link Toy", "url": f"{base}/hop", "image": f"{base}/ok",
+                           "blurb": "Redirects twice."},
+                "toy-02": {"name": "Dead Link Toy", "url": f"{base}/gone", "image": f"{base}/nohead",
+                           "blurb": "Retired listing."},
+            }
+            with open(root / "data" / "products.json", "w", encoding="utf-8") as f:
+                json.dump(products, f)
+            with open(root / "content" / "posts" / "dog-toys" / "index.md", "w", encoding="utf-8") as f:
+                f.write(f'---\ntitle: "Dog Toys"\nimage: "{base}/frontmatter-only"\n---\n\n'
+                        f'See [this toy]({base}/hop) and <img src="{base}/ok">, or <a href="{base}/loop">this</a>.\n'
+                        f'<div itemtype="https://schema.org/Product"></div>\n')
+            site = SiteConfig.from_root(root)
+            
+            checker = LinkChecker(str(root / ".cache" / "link_health.json"), per_host=4)
+            report = check_site(site, checker=checker)
+            assert report['urls'] == 5, f"Expected 5 distinct catalog/body URLs, got {report['urls']}"
+            problems = {problem['url'].replace(base, ''): problem for problem in report['problems']}
+            assert set(problems) == {'/gone', '/loop'}, f"Unexpected problems: {sorted(problems)}"
+            assert problems['/gone']['status'] == 404 and problems['/gone']['used_by'] == ['product:toy-02:url']
+            assert problems['/loop']['state'] == 'broken' and 'redirects' in problems['/loop']['error']
+            assert problems['/loop']['used_by'] == ['content/posts/dog-toys/index.md'], "Post source not recorded"
+            
+            results = checker.check([f"{base}/hop", f"{base}/nohead"])
+            hops = [(hop['url'].replace(base, ''), hop['status']) for hop in results[f"{base}/hop"]['chain']]
+            assert hops == [('/hop', 302), ('/short', 301), ('/ok', 200)], f"Redirect chain not captured: {hops}"
+            assert results[f"{base}/nohead"]['status'] == 200, "HEAD-refusing host not retried with GET"
+            assert checker.stats['connections'] < checker.stats['requests'], "Connections not reused"
+            
+            # Fresh results come from the cache; forcing re-probes everything
+            hits = stub.hits
+            report = check_site(site, checker=LinkChecker(str(root / ".cache" / "link_health.json")))
+            assert report['probed'] == 0 and report['cached'] == 5, f"TTL cache not used: {report}"
+            assert stub.hits == hits, "Cached links were probed again"
+            expired = LinkChecker(str(root / ".cache" / "link_health.json"), failure_ttl=0)
+            assert len(expired.check([f"{base}/gone", f"{base}/ok"])) == 2 and expired.stats['probed'] == 1, \
+                "Failed links should expire on their own TTL"
+        finally:
+            stub.close()
+        
+        # Concurrency stays within the per-host bound and checks overlap instead of running serially
+        stub = StubLinkServer(delay=0.05)
+        try:
+            checker = LinkChecker(None, per_host=5)
+            started = time.perf_counter()
+            results = checker.check([f"{stub.base_url}/ok?item={i}" for i in range(40)])
+            elapsed = time.perf_counter() - started
+            assert all(result['state'] == 'ok' for result in results.values()), "Parallel probes failed"
+            assert stub.max_in_flight <= 5, f"Per-host limit exceeded: {stub.max_in_flight}"
+            assert elapsed < 40 * 0.05 / 2, f"Probes not concurrent ({elapsed:.2f}s)"
+        finally:
+            stub.close()
+        
+        # A probe that times out closes its connection instead of leaving it to the garbage collector
+        stub = StubLinkServer(delay=1.0)
+        try:
+            class RecordingPool(ConnectionPool):
+                writers = []
+                
+                async def connect(self, key, fresh=False):
+                    reader, writer, reused = await super().connect(key, fresh)
+                    self.writers.append(writer)
+                    return reader, writer, reused
+            
+            pool = RecordingPool()
+            result = asyncio.run(LinkChecker(None, timeout=0.2).probe(pool, f"{stub.base_url}/ok"))
+            assert result['state'] == 'unreachable' and 'timed out' in result['error'], result
+            assert pool.writers and all(writer.is_closing() for writer in pool.writers), "Timed-out socket leaked"
+        finally:
+            stub.close()
+        
+        print("[SUCCESS] Link health tests passed")
+    
+    def test_product_card_refresh(self):
+        """Test in-place refresh of product cards in existing posts."""
+        print("\n[TEST] Testing product card refresh...")
+        
+        root = self.test_dir / "sites" / "cards"
+        (root / "data").mkdir(parents=True)
+        catalog = {
+            "toy-01": {"name": "Puzzle Toy", "url": "https://amzn.to/puzzle", "image": "https://m.media-amazon.com/p.jpg",
+                       "blurb": "Brain games.", "brand": "Outward Hound", "rating": "4.3", "review_count": "8,924",
+                       "price": "12.99"},
+            "toy-02": {"name": "Chew & Fetch Ball", "url": "https://amzn.to/ball", "image": "https://m.media-amazon.com/b.jpg",
+                       "blurb": "Bouncy.", "brand": "KONG", "rating": "4.6", "review_count": "15,234", "price": "9.99"},
+        }
+        with open(root / "data" / "products.json", "w", encoding="utf-8") as f:
+            json.dump(catalog, f)
+        
+        def card(product_id, price, rating, reviews, marker=True):
+            data = catalog[product_id]
+            attribute = f' data-product-id="{product_id}"' if marker else ''
+            return (f'<div class="product-card"{attribute} itemscope itemtype="https://schema.org/Product">\n'
+                    f'  <div class="product-card-image">\n'
+                    f'    <img src="{data["image"]}" alt="{data["name"]} by {data["brand"]}" loading="lazy" itemprop="image">\n'
+                    f'  </div>\n  <div class="product-card-content">\n'
+                    f'    <h4 itemprop="name">{data["name"]} by <span itemprop="brand">{data["brand"]}</span></h4>\n'
+                    f'    <span itemprop="price">${price}</span>\n'
+                    f'    <meta itemprop="url" content="{data["url"]}">\n'
+                    f'    <span class="stars" itemprop="ratingValue">{rating}</span>★\n'
+                    f'    <span>(<span itemprop="reviewCount">{reviews}</span> reviews)</span>\n'
+                    f'    <div class="product-features"><ul><li>Hand-written feature</li></ul></div>\n'
+                    f'    <div class="product-cta">\n      <a href="{data["url"]}" target="_blank">View on Amazon →</a>\n    </div>\n'
+                    f'  </div>\n</div>')
+        
+        header = ("---\ntitle: Dog Toys\nlastmod: '2025-01-01T00:00:00Z'\nschema:\n  '@type': Article\n"
+                  "  dateModified: '2025-01-01T00:00:00Z'\n---\n\n")
+        stale_body = (f"## Picks\n\n{card('toy-01', '14.99', '4.1', '8,000')}\n\nMiddle text.\n\n"
+                      f"{card('toy-02', 'N/A', '4.6', '15,234', marker=False)}\n\nOutro.\n")
+        current_body = f"{card('toy-01', '12.99', '4.3', '8,924')}\n"
+        for slug, body in (("stale", stale_body), ("current", current_body), ("plain", "No cards here.\n")):
+            (root / "content" / "posts" / slug).mkdir(parents=True)
+            with open(root / "content" / "posts" / slug / "index.md", "w", encoding="utf-8") as f:
+                f.write(header + body)
+        site = SiteConfig.from_root(root)
+        stale_path = root / "content" / "posts" / "stale" / "index.md"
+        current_path = root / "content" / "posts" / "current" / "index.md"
+        current_mtime = current_path.stat().st_mtime_ns
+        
+        tracker = ContentTracker(site=site)
+        for slug, body in (("stale", stale_body), ("current", current_body)):
+            tracker.add_post(f"{slug} dog toys", slug.title(), hashlib.sha256(body.strip().encode()).hexdigest(),
+                             str(root / "content" / "posts" / slug / "index.md"))
+        
+        refresher = ProductCardRefresher(site)
+        report = refresher.refresh(dry_run=True)
+        assert [post['path'] for post in report['updated']] == ["content/posts/stale/index.md"], \
+            f"Unexpected posts flagged: {report['updated']}"
+        with open(stale_path, "r", encoding="utf-8") as f:
+            assert f.read() == header + stale_body, "Dry run rewrote the post"
+        
+        report = refresher.refresh()
+        cards = {card_report['product']: card_report['slots'] for card_report in report['updated'][0]['cards']}
+        assert cards == {'toy-01': ['price', 'rating', 'review_count'], 'toy-02': ['price']}, \
+            f"Wrong slots refreshed: {cards}"
+        with open(stale_path, "r", encoding="utf-8") as f:
+            text = f.read()
+        assert '<span itemprop="price">$12.99</span>' in text and '>8,924<' in text, "Stale card values remain"
+        assert '<span itemprop="price">$9.99</span>' in text, "Card matched by affiliate URL not refreshed"
+        assert 'Hand-written feature' in text and 'Middle text.' in text, "Text outside data slots changed"
+        assert "lastmod: '2025-01-01" not in text and "dateModified: '2025-01-01" not in text, "Dates not bumped"
+        assert current_path.stat().st_mtime_ns == current_mtime, "Up-to-date post was rewritten"
+        # Rewritten bodies are re-hashed in the tracker, so reconciliation sees no drift
+        assert report['tracker_updated'] == 1, f"Tracker hash not updated: {report}"
+        drift = TrackerReconciler(cache_path=None, site=site).reconcile()
+        assert not drift['hash_mismatch'] and not drift['missing'], f"Tracker out of step after refresh: {drift}"
+        assert refresher.refresh()['cards'] == 0, "Second refresh found work left over"
+        
+        # Renamed products are rewritten with escaping; other products' cards are left alone
+        catalog["toy-01"]["price"] = "11.49"
+        catalog["toy-02"]["name"] = 'Chew & Fetch "Pro" Ball'
+        with open(root / "data" / "products.json", "w", encoding="utf-8") as f:
+            json.dump(catalog, f)
+        os.utime(root / "data" / "products.json", ns=(time.time_ns(), time.time_ns() + 10**9))
+        report = refresher.refresh(product_ids=["toy-02"])
+        with open(stale_path, "r", encoding="utf-8") as f:
+            text = f.read()
+        assert 'alt="Chew &amp; Fetch &quot;Pro&quot; Ball"' in text, "Attribute not escaped"
+        assert '$12.99' in text, "Product outside the selection was refreshed"
+        
+        # Large sites are refreshed in worker processes with the same result
+        threshold = refresh_product_cards.PARALLEL_THRESHOLD
+        refresh_product_cards.PARALLEL_THRESHOLD = 2
+        try:
+            report = refresher.refresh()
+        finally:
+            refresh_product_cards.PARALLEL_THRESHOLD = threshold
+        assert report['cards'] == 2 and len(report['updated']) == 2, f"Parallel refresh incomplete: {report}"
+        
+        print("[SUCCESS] Product card refresh tests passed")
+    
+    def test_post_validation(self):
+        """Test in-process validation of generated posts (frontmatter, shortcodes, cards, JSON-LD)."""
+        print("\n[TEST] Testing post validation...")
+        
+        root = self.test_dir / "sites" / "validate"
+        (root / "layouts" / "shortcodes").mkdir(parents=True)
+        (root / "themes" / "PaperMod" / "layouts" / "shortcodes").mkdir(parents=True)
+        (root / "layouts" / "shortcodes" / "product.html").write_text("{{ .Get \"id\" }}", encoding="utf-8")
+        (root / "themes" / "PaperMod" / "layouts" / "shortcodes" / "collapse.html").write_text(
+            "<details>{{ .Inner }}</details>", encoding="utf-8")
+        (root / "hugo.toml").write_text('baseURL = "/"\ntheme = "PaperMod"\n', encoding="utf-8")
+        (root / "data").mkdir()
+        shutil.copy("data/products.json", root / "data" / "products.json")
+        site = SiteConfig.from_root(root)
+        shortcodes = known_shortcodes(site)
+        assert shortcodes['collapse'] and not shortcodes['product'] and 'figure' in shortcodes, \
+            f"Shortcodes not discovered: {shortcodes}"
+        products = {'toy-01', 'litter-01'}
+        
+        generator = SmartPetBuysGenerator()
+        metadata = generator._create_frontmatter("dog toys", "Best Dog Toys — SmartPetBuys", "dog-toys")
+        card = ('<div class="product-card" data-product-id="toy-01" itemscope itemtype="https://schema.org/Product">\n'
+                '  <div class="product-card-content">\n    <h4 itemprop="name">KONG Classic</h4>\n'
+                '    <span itemprop="price">$12.99</span><br>\n    <img src="https://m.media-amazon.com/k.jpg">\n'
+                '  </div>\n</div>')
+        body = (f"## Top Product Recommendations\n\n{{{{< product id=\"toy-01\" >}}}}\n\n{card}\n\n"
+                f"{{{{< collapse summary=\"More\" >}}}}Details{{{{< /collapse >}}}}\n\n"
+                f"Use {{{{</* product id=\"example\" */>}}}} in your own posts.\n")
+        post = dumps(metadata, body)
+        
+        issues = validate_text(post, products, shortcodes)
+        assert issues == [], f"Generated post flagged: {issues}"
+        
+        # Write it out and validate through the CLI-facing class, too
+        (root / "content" / "posts" / "dog-toys").mkdir(parents=True)
+        post_path = root / "content" / "posts" / "dog-toys" / "index.md"
+        post_path.write_text(post, encoding="utf-8")
+        started = time.perf_counter()
+        results = PostValidator(site).validate_many([post_path])
+        assert results['errors'] == 0 and results['posts'] == 1, f"Validator failed on a clean post: {results}"
+        assert time.perf_counter() - started < 0.5, "Validation of one post should take milliseconds"
+        
+        def errors(text):
+            return [issue['message'] for issue in validate_text(text, products, shortcodes)
+                    if issue['severity'] == 'error']
+        
+        broken = {
+            'date': post.replace(f"date: '{metadata['date']}'", "date: 'last tuesday'"),
+            'draft': post.replace("draft: false", "draft: 'no'"),
+            'unknown product': post.replace('product id="toy-01"', 'product id="toy-99"'),
+            'unknown shortcode': post.replace("< collapse summary", "< spoiler summary"),
+            'unterminated': post.replace('{{< product id="toy-01" >}}', '{{< product id="toy-01"'),
+            'unclosed pair': post.replace("{{< /collapse >}}", ""),
+            'closed leaf': post.replace('{{< product id="toy-01" >}}', '{{< product id="toy-01" >}}{{< /product >}}'),
+            'unbalanced card': post.replace("    <h4 itemprop=\"name\">KONG Classic</h4>", "    <h4 itemprop=\"name\">KONG"),
+            'card product': post.replace('data-product-id="toy-01"', 'data-product-id="gone-01"'),
+            'schema date': post.replace(f"datePublished: '{metadata['schema']['datePublished']}'",
+                                        "datePublished: 'soon'"),
+            'schema context': post.replace("'@context': https://schema.org", "'@context': https://example.com"),
+            'json-ld': post + '\n<script type="application/ld+json">{"@type": "FAQPage",}</script>\n',
+            'yaml': post.replace("draft: false", "draft: [unclosed"),
+        }
+        for name, text in broken.items():
+            assert text != post, f"Fixture for '{name}' did not change the post"
+            assert errors(text), f"Broken {name} not reported"
+        assert any('toy-99' in message for message in errors(broken['unknown product'])), "Product id not named"
+        line = [issue for issue in validate_text(broken['unbalanced card'], products, shortcodes)
+                if issue['check'] == 'product_card'][0]['line']
+        assert post.splitlines()[line - 1].startswith('<div class="product-card"'), "Card issue line is wrong"
+        placeholder = post.replace('$12.99', '$N/A')
+        assert [issue['severity'] for issue in validate_text(placeholder, products, shortcodes)] == ['warning'], \
+            "Placeholder price should warn"
+        
+        # ref/relref targets must exist under content/, since Hugo fails the build otherwise
+        (root / "content" / "about.md").write_text('---\ntitle: "About"\n---\n', encoding="utf-8")
+        pages = content_pages(site)
+        assert pages == {"posts/dog-toys", "about"}, f"Pages not discovered: {pages}"
+        linked = post + '\nSee [our toys]({{< relref "/posts/dog-toys" >}}), [us]({{< ref "about.md#team" >}}).\n'
+        assert not validate_text(linked, products, shortcodes, pages), "Existing ref targets flagged"
+        dangling = post + '\nSee [old guide]({{< relref "/posts/deleted-guide" >}}).\n'
+        assert any("deleted-guide" in issue['message'] for issue in validate_text(dangling, products, shortcodes, pages)
+                   if issue['severity'] == 'error'), "Missing relref target not reported"
+        post_path.write_text(dangling, encoding="utf-8")
+        assert PostValidator(site).validate_many([post_path])['errors'] == 1, "Validator skipped ref targets"
+        
+        print("[SUCCESS] Post validation tests passed")
+    
+    def test_content_audit(self):
+        """Test single-pass post analysis and the cached corpus audit."""
+        print("\n[TEST] Testing content audit...")
+        
+        sections = "\n\n".join(f"## Section {i}\n\nPractical dog toys advice for owners, part {i}. " * 2
+                                for i in range(1, 5))
+        body = (f"Dog toys keep puppies busy and happy.\n\n{sections}\n\n"
+                "## Top Product Recommendations\n\n"
+                '{{< product id="toy-01" >}}\n\n{{< product id="missing-99" >}}\n\n'
+                "## Frequently Asked Questions\n\n### Are dog toys safe?\n\nYes, when sized correctly.\n")
+        analysis = analyze_markdown(body, "dog toys")
+        assert analysis['has_top_picks'] and analysis['has_faq'], "Required sections not detected"
+        assert analysis['product_ids'] == ['toy-01', 'missing-99'], f"Shortcodes misparsed: {analysis['product_ids']}"
+        assert analysis['keyword_mentions'] == 10, f"Keyword count wrong: {analysis['keyword_mentions']}"
+        
+        post_dir = Path("audit_posts") / "dog-toys"
+        post_dir.mkdir(parents=True)
+        with open(post_dir / "index.md", "w", encoding="utf-8") as f:
+            f.write('+++\ntitle = "Dog Toys"\ntags = ["dog toys"]\n+++\n\n' + body)
+        
+        results = audit_posts("audit_posts", ".cache/content_audit.json", product_ids={"toy-01", "litter-01"})
+        issues = [issue['message'] for issue in results['posts'][0]['issues']]
+        assert results['reanalyzed'] == 1, "Post was not analyzed"
+        assert any("missing-99" in message for message in issues), f"Broken product id not flagged: {issues}"
+        assert not any("toy-01" in message for message in issues), "Valid product id flagged"
+        
+        results = audit_posts("audit_posts", ".cache/content_audit.json", product_ids={"toy-01", "missing-99"})
+        assert results['reanalyzed'] == 0, "Unchanged post re-analyzed"
+        assert results['posts'][0]['errors'] == 1, "Catalog changes should apply to cached analyses"
+        
+        print("[SUCCESS] Content audit tests passed")
+    
+    def test_frontmatter_io(self):
+        """Test header-only and selective frontmatter parsing and the streaming post writer."""
+        print("\n[TEST] Testing frontmatter reader/writer...")
+        
+        posts_dir = Path("frontmatter_posts")
+        (posts_dir / "yaml-post").mkdir(parents=True)
+        metadata = {
+            "title": "Best Cat Fountains: Quiet Picks — SmartPetBuys",
+            "date": "2025-08-21T10:00:00Z",
+            "tags": ["cat fountains", "hydration"],
+            "draft": False,
+            "schema": {"@type": "Article", "author": {"@type": "Organization", "name": "SmartPetBuys"},
+                       "keywords": ["cat fountain"]},
+        }
+        yaml_path = posts_dir / "yaml-post" / "index.md"
+        write_post(yaml_path, metadata, "\n## Why Fountains\n\nCats drink more from moving water.\n\n")
+        with open(yaml_path, encoding="utf-8") as f:
+            text = f.read()
+        assert text.startswith("---\n") and "\n---\n\n## Why Fountains" in text and text.endswith("water."), \
+            f"Unexpected post layout: {text!r}"
+        assert not list(posts_dir.glob("*/*.tmp")), "Temporary file left behind"
+        assert load_post(yaml_path) == (metadata, "\n## Why Fountains\n\nCats drink more from moving water."), \
+            "Post did not round-trip"
+        
+        # Selected fields skip the nested schema block but match a full parse
+        assert read_header(yaml_path, ("title", "tags")) == {"title": metadata["title"], "tags": metadata["tags"]}
+        assert read_header(yaml_path) == metadata, "Full header parse differs from written metadata"
+        
+        toml_path = posts_dir / "toml-post.md"
+        with open(toml_path, "w", encoding="utf-8") as f:
+            f.write('+++\ntitle = "Dog Beds"\ntags = ["beds", "orthopedic"]\n\n[params]\nhero = "bed.jpg"\n+++\n\nBody\n')
+        assert read_header(toml_path, ("title",)) == {"title": "Dog Beds"}, "TOML field not selected"
+        assert read_header(toml_path, ("params", "tags")) == {"params": {"hero": "bed.jpg"},
+                                                              "tags": ["beds", "orthopedic"]}, "TOML table missed"
+        
+        # Header-only reads stop at the closing fence, so a broken body does not matter
+        with open(posts_dir / "binary-body.md", "wb") as f:
+            f.write(b'---\ntitle: "Scratchers"\n---\n' + bytes(range(256)) * 4)
+        assert read_header(posts_dir / "binary-body.md", ("title",)) == {"title": "Scratchers"}
+        with open(posts_dir / "unterminated.md", "w", encoding="utf-8") as f:
+            f.write('---\ntitle: "No closing fence"\n\nBody text\n')
+        assert read_header(posts_dir / "unterminated.md") == {}, "Unterminated header parsed"
+        
+        print("[SUCCESS] Frontmatter reader/writer tests passed")
+    
+    def test_related_posts(self):
+        """Test the related-posts index and its incremental updates."""
+        print("\n[TEST] Testing related posts index...")
+        
+        topics = {
+            "cat-litter-box": ("Cat Litter Boxes", ["cat litter box"], "litter box clumping odor scoop tray cat"),
+            "cat-litter-mats": ("Cat Litter Mats", ["cat litter mat"], "litter mat scatter tray cat paws"),
+            "dog-harness": ("Dog Harnesses", ["dog harness"], "harness leash walking pulling dog chest"),
+            "dog-leash": ("Dog Leashes", ["dog leash"], "leash walking retractable dog handle"),
+        }
+        posts_dir = Path("related_posts")
+        for slug, (title, tags, words) in topics.items():
+            (posts_dir / slug).mkdir(parents=True)
+            with open(posts_dir / slug / "index.md", "w", encoding="utf-8") as f:
+                f.write(f'+++\ntitle = "{title}"\ntags = {json.dumps(tags)}\n+++\n\n' + (words + ". ") * 5)
+        
+        index = RelatedIndex(str(posts_dir), "data/related.json", ".cache/related_index.json", top_k=2)
+        index.build()
+        related = load_related("data/related.json")
+        assert related["cat-litter-box"][0]["post"] == "cat-litter-mats", f"Bad ranking: {related['cat-litter-box']}"
+        assert related["dog-leash"][0]["post"] == "dog-harness", f"Bad ranking: {related['dog-leash']}"
+        
+        # A new draft is scored incrementally and shows up in its neighbours' lists
+        draft = index.add_document("cat-litter-scoops", {"title": "Cat Litter Scoops", "tags": ["cat litter scoop"]},
+                                   "litter scoop clumping tray cat odor. " * 5)
+        assert draft and draft[0]["post"].startswith("cat-litter"), f"Draft related posts wrong: {draft}"
+        assert any(entry["post"] == "cat-litter-scoops" for entry in index.related_to("cat-litter-box")), \
+            "Existing post lists not updated with the new draft"
+        
+        shutil.rmtree(posts_dir / "dog-leash")
+        stats = RelatedIndex(str(posts_dir), "data/related.json", ".cache/related_index.json", top_k=2).update()
+        assert stats["removed"] == ["dog-leash"], f"Deleted post not detected: {stats}"
+        assert "dog-leash" not in load_related("data/related.json"), "Deleted post still indexed"
+        
+        # Generated posts link through the related-posts shortcode, never a hard relref a deletion would break
+        root = self.test_dir / "sites" / "related"
+        shutil.copytree(posts_dir, root / "content" / "posts")
+        generator = SmartPetBuysGenerator(SiteConfig.from_root(root))
+        body = generator._add_related_links("cat-litter-trays", {"title": "Cat Litter Trays", "tags": ["cat litter"]},
+                                            "litter tray scoop clumping cat odor. " * 5)
+        assert "relref" not in body and '{{< related-posts "cat-litter-' in body, f"Unexpected links: {body[-120:]}"
+        shortcodes = known_shortcodes(SiteConfig.from_root(self.original_dir.parent))
+        issues = validate_text(f'---\ntitle: "Cat Litter Trays"\ndate: 2025-01-01\n---\n\n{body}', set(), shortcodes)
+        assert not issues, f"Related-posts shortcode not usable as generated: {issues}"
+        
+        print("[SUCCESS] Related posts tests passed")
+    
+    def test_reconcile_tracker(self):
+        """Test tracker/filesystem reconciliation and repair."""
+        print("\n[TEST] Testing tracker reconciliation...")
+        
+        posts_dir = Path("reconcile_posts")
+        bodies = {"kept": "Kept body.", "edited": "Original body.", "untracked": "Never tracked."}
+        for slug, body in bodies.items():
+            (posts_dir / slug).mkdir(parents=True)
+            with open(posts_dir / slug / "index.md", "w", encoding="utf-8") as f:
+                f.write(f'---\ntitle: "{slug.title()}"\nkeywords: ["{slug} keyword"]\n---\n\n{body}\n')
+        
+        tracker = ContentTracker("data/reconcile_tracker.json")
+        for slug in ("kept", "edited", "gone"):
+            body_hash = hashlib.sha256(bodies.get(slug, "").encode()).hexdigest()
+            tracker.add_post(f"{slug} keyword", slug.title(), body_hash, f"{posts_dir}\\{slug}\\index.md")
+        assert "\\" not in tracker.data["posts"][next(iter(tracker.data["posts"]))]["file_path"], \
+            "add_post kept Windows separators"
+        with open(posts_dir / "edited" / "index.md", "a", encoding="utf-8") as f:
+            f.write("\nAppended paragraph.\n")
+        
+        reconciler = TrackerReconciler(str(posts_dir), "data/reconcile_tracker.json", ".cache/reconcile.json")
+        result = reconciler.reconcile()
+        assert result["rehashed"] == 3, f"Expected a cold scan: {result}"
+        assert [entry["path"] for entry in result["missing"]] == [f"{posts_dir}/gone/index.md"], result["missing"]
+        assert [entry["path"] for entry in result["hash_mismatch"]] == [f"{posts_dir}/edited/index.md"]
+        assert [entry["path"] for entry in result["untracked"]] == [f"{posts_dir}/untracked/index.md"]
+        
+        result = TrackerReconciler(str(posts_dir), "data/reconcile_tracker.json",
+                                   ".cache/reconcile.json").reconcile(apply=True)
+        assert result["rehashed"] == 0, "Unchanged files were re-hashed"
+        assert result["repaired"] == 3, f"Unexpected repair count: {result}"
+        
+        repaired = ContentTracker("data/reconcile_tracker.json").data
+        assert {post["keyword"] for post in repaired["posts"].values()} == {"kept keyword", "edited keyword",
+                                                                            "untracked keyword"}
+        assert repaired["keywords"]["gone keyword"]["usage_count"] == 0, "Removed post still counted"
+        assert not TrackerReconciler(str(posts_dir), "data/reconcile_tracker.json",
+                                     ".cache/reconcile.json").reconcile()["untracked"], "Repair did not converge"
+        
+        print("[SUCCESS] Tracker reconciliation tests passed")
+
+    def test_corpus_archive(self):
+        """Test the packed corpus archive and the scans that read from it."""
+        print("\n[TEST] Testing corpus archive...")
+
+        posts_dir = Path("archive_posts")
+        for slug, body in (("dog-bed", "Orthopedic dog beds help older dogs."),
+                           ("cat-tree", "Cat trees give indoor cats room to climb."),
+                           ("fish-tank", "Filters keep a fish tank clean.")):
+            (posts_dir / slug).mkdir(parents=True)
+            with open(posts_dir / slug / "index.md", "w", encoding="utf-8", newline="\r\n" if slug == "cat-tree" else None) as f:
+                f.write(f'---\ntitle: "{slug.replace("-", " ").title()} Guide"\nkeywords: ["{slug}"]\n---\n\n{body}\n')
+
+        archive = CorpusArchive(str(posts_dir), ".cache/corpus_test.pack")
+        assert archive.refresh()["added"] == 3, "Cold refresh did not pack every post"
+        for path, stat in archive.iter_post_files():
+            with open(path, "rb") as f:
+                assert bytes(archive.read(path)) == f.read(), f"Packed bytes differ for {path}"
+            with open(path, "r", encoding="utf-8") as f:
+                assert archive.text(path) == f.read(), f"Packed text differs for {path}"
+            assert stat.st_size == os.stat(path).st_size
+        assert isinstance(archive.read(posts_dir / "dog-bed" / "index.md"), memoryview), "Reads should not copy"
+
+        size = archive.pack_size
+        assert not any(CorpusArchive(str(posts_dir), ".cache/corpus_test.pack").refresh().values()), \
+            "Unchanged posts were re-packed"
+        with open(posts_dir / "dog-bed" / "index.md", "a", encoding="utf-8") as f:
+            f.write("\nMemory foam lasts longer.\n")
+        shutil.rmtree(posts_dir / "fish-tank")
+        (posts_dir / "bird-cage").mkdir()
+        with open(posts_dir / "bird-cage" / "index.md", "w", encoding="utf-8") as f:
+            f.write('---\ntitle: "Bird Cage Guide"\n---\n\nBig cages for parakeets.\n' + "Perches and toys. " * 2000)
+        changes = archive.refresh()
+        assert (changes["added"], changes["updated"], changes["removed"]) == (1, 1, 1), changes
+        assert archive.pack_size > size and not changes["compacted"], "Refresh should only append"
+        assert "Memory foam" in archive.text(str(posts_dir / "dog-bed" / "index.md")), "Index points at stale copy"
+        assert str(posts_dir / "fish-tank" / "index.md") not in archive
+
+        # Crash leftovers past the committed size are dropped; a mostly superseded pack is compacted
+        with open(".cache/corpus_test.pack", "ab") as f:
+            f.write(b"partial write")
+        shutil.rmtree(posts_dir / "bird-cage")
+        changes = CorpusArchive(str(posts_dir), ".cache/corpus_test.pack").refresh()
+        assert changes["removed"] == 1 and changes["compacted"], f"Expected compaction: {changes}"
+        with CorpusArchive(str(posts_dir), ".cache/corpus_test.pack") as reopened:
+            assert reopened.pack_size == os.path.getsize(".cache/corpus_test.pack") == \
+                sum(len(reopened.read(path)) for path, _ in reopened.iter_post_files()), "Compacted pack has slack"
+
+            # Scans give the same answers from the pack as from the tree, in and out of worker processes
+            for threshold in (1000, 1):
+                content_audit.PARALLEL_THRESHOLD = threshold
+                try:
+                    direct = audit_posts(str(posts_dir), None)
+                    packed = audit_posts(str(posts_dir), None, archive=reopened)
+                finally:
+                    content_audit.PARALLEL_THRESHOLD = 64
+                assert sorted(direct["posts"], key=lambda post: post["path"]) == \
+                    sorted(packed["posts"], key=lambda post: post["path"]), "Audit differs when read from the archive"
+            assert TrackerReconciler(str(posts_dir), cache_path=None).scan()[0] == \
+                TrackerReconciler(str(posts_dir), cache_path=None, archive=reopened).scan()[0], \
+                "Reconciliation hashes differ when read from the archive"
+            checker = DuplicateChecker(content_dir=str(posts_dir), archive=reopened)
+            assert sorted(post["hash"] for post in checker.existing_posts) == \
+                sorted(post["hash"] for post in DuplicateChecker(content_dir=str(posts_dir)).existing_posts)
+            assert TitleIndex(str(posts_dir), None, archive=reopened).refresh()["added"] == 2
+            assert checker.check_title_duplicate("Cat Tree Guide")[0], "Archived titles not indexed"
+            # Confirmation reads the archived body too, not whatever the tree holds now
+            draft = ("Cat trees give indoor cats plenty to do. Sisal posts wear well, wide perches suit heavy "
+                     "breeds, and a weighted base keeps tall towers from tipping when kittens leap onto them.")
+            with open(posts_dir / "cat-tree" / "index.md", "w", encoding="utf-8") as f:
+                f.write(f'---\ntitle: "Cat Tree Guide"\n---\n\n{draft}\n')
+            assert not checker.check_content_duplicate(draft)[0], "Content check read the tree, not the archive"
+
+        # Deleting every post compacts the pack to nothing instead of bringing the old index back
+        shutil.rmtree(posts_dir)
+        posts_dir.mkdir()
+        emptied = CorpusArchive(str(posts_dir), ".cache/corpus_test.pack")
+        changes = emptied.refresh()
+        assert changes["removed"] == 2 and changes["compacted"], f"Expected compaction: {changes}"
+        assert len(emptied) == 0 and emptied.pack_size == os.path.getsize(".cache/corpus_test.pack") == 0, \
+            f"Deleted posts came back: {len(emptied)} entries, {emptied.pack_size} bytes"
+        assert not any(CorpusArchive(str(posts_dir), ".cache/corpus_test.pack").refresh().values()), \
+            "Empty archive not persisted"
+
+        print("[SUCCESS] Corpus archive tests passed")
+
+    def test_hero_images(self):
+        """Test responsive hero variants and the content-hash manifest cache."""
+        print("\n[TEST] Testing hero image variants...")
+        try:
+            from PIL import Image
+        except ImportError:
+            print("[SKIP] Pillow not installed, hero image tests skipped")
+            return
+        
+        source_dir = Path("static/images/heroes")
+        source_dir.mkdir(parents=True)
+        Image.new("RGB", (1000, 500), (200, 120, 40)).save(source_dir / "hero-dog-toys.webp", "WEBP")
+        Image.new("RGB", (400, 300), (40, 120, 200)).save(source_dir / "hero-cat-bed.png", "PNG")
+        formats = _available_formats()
+        assert "webp" in formats, "Pillow build cannot encode WebP"
+        
+        builder = HeroImageBuilder(str(source_dir), "data/hero_images.json")
+        stats = builder.build(workers=2)
+        assert stats['built'] == 2 and stats['failed'] == 0, f"Variants not built: {stats}"
+        
+        with open("data/hero_images.json", "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        for name, source_width in (("hero-dog-toys.webp", 1000), ("hero-cat-bed.png", 400)):
+            entry = manifest[name]
+            expected = {(width, fmt) for width in [w for w in VARIANT_WIDTHS if w < source_width] + [source_width]
+                        for fmt in formats}
+            assert {(v['width'], v['format']) for v in entry['variants']} == expected, f"Wrong variants for {name}"
+            assert all(v['width'] <= source_width for v in entry['variants']), f"{name} upscaled"
+            for variant in entry['variants']:
+                if variant['file']:
+                    with Image.open(builder.output_dir / variant['file']) as img:
+                        assert img.size == (variant['width'], variant['height']), f"Bad size: {variant}"
+                        assert img.format.lower() == variant['format'], f"Bad format: {variant}"
+            assert entry['srcset']['webp'].endswith(f" {source_width}w"), f"Bad srcset: {entry['srcset']}"
+        # The original WebP stands in for its own full-width variant instead of being re-encoded
+        full = [v for v in manifest["hero-dog-toys.webp"]['variants'] if v['width'] == 1000 and v['format'] == 'webp']
+        assert full[0]['file'] is None and full[0]['url'] == "/images/heroes/hero-dog-toys.webp"
+        
+        # Unchanged sources are served from the manifest without re-encoding
+        mtimes = {path.name: path.stat().st_mtime_ns for path in builder.output_dir.iterdir()}
+        stats = HeroImageBuilder(str(source_dir), "data/hero_images.json").build(workers=2)
+        assert stats['cached'] == 2 and stats['built'] == 0, f"Second build not cached: {stats}"
+        assert {path.name: path.stat().st_mtime_ns for path in builder.output_dir.iterdir()} == mtimes, \
+            "Cached variants rewritten"
+        
+        # A changed source is rebuilt and a deleted one drops its variants
+        Image.new("RGB", (400, 300), (90, 90, 90)).save(source_dir / "hero-cat-bed.png", "PNG")
+        (source_dir / "hero-dog-toys.webp").unlink()
+        stats = HeroImageBuilder(str(source_dir), "data/hero_images.json").build(workers=2)
+        assert (stats['built'], stats['cached'], stats['removed']) == (1, 0, 1), f"Bad incremental build: {stats}"
+        assert not list(builder.output_dir.glob("hero-dog-toys-*")), "Variants of a deleted source left behind"
+        
+        print("[SUCCESS] Hero image tests passed")
+    
+    def test_lazy_imports(self):
+        """Test that CLI modules do not import heavy dependencies at startup."""
+        print("\n[TEST] Testing lazy imports...")
+        
+        for module in IMPORT_BUDGETS_MS:
+            _, heavy = measure_import(module)
+            assert not heavy, f"{module} eagerly imports {', '.join(heavy)}"
+        
+        print("[SUCCESS] Lazy import tests passed")
+    
     def test_file_operations(self):
         """Test file creation and management."""
         print("\n[TEST] Testing file operations...")
@@ -343,9 +1868,32 @@ This is a test post.
         try:
             self.setup_test_environment()
             self.test_content_tracker()
+            self.test_tracker_rollups()
             self.test_keyword_manager()
+            self.test_keyword_clusters()
             self.test_duplicate_checker()
+            self.test_site_config()
+            self.test_title_index()
+            self.test_phrase_index()
+            self.test_duplicate_risk()
             self.test_generator_validation()
+            self.test_request_controller()
+            self.test_generation_worker()
+            self.test_product_validation()
+            self.test_product_catalog()
+            self.test_indexed_catalog()
+            self.test_product_ingestion()
+            self.test_product_refresh()
+            self.test_link_health()
+            self.test_product_card_refresh()
+            self.test_post_validation()
+            self.test_content_audit()
+            self.test_frontmatter_io()
+            self.test_related_posts()
+            self.test_reconcile_tracker()
+            self.test_corpus_archive()
+            self.test_hero_images()
+            self.test_lazy_imports()
             self.test_file_operations()
             self.test_integration()
             
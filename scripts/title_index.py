@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Title Trigram Index for SmartPetBuys
+Persistent character-trigram inverted index over normalized post titles for fast fuzzy duplicate lookups.
+"""
+
+import json
+import math
+import os
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from content_audit import POSTS_DIR, iter_post_files
+from frontmatter_io import parse_header, read_header, split_frontmatter
+
+CACHE_PATH = ".cache/title_index.json"
+INDEX_VERSION = 1
+
+# Candidates need this trigram Jaccard before SequenceMatcher confirms them; an edit touches at most three
+# trigrams per side, so titles that SequenceMatcher scores above 0.85 stay well above it
+DUPLICATE_JACCARD = 0.35
+SEARCH_JACCARD = 0.2
+CONFIRM_TOP = 5
+# Postings scanned per ranked search (duplicate checks are never budgeted: a skipped posting is a missed duplicate)
+SEARCH_BUDGET = 30000
+
+# Rebuild postings once this share of document slots are tombstones from edits and deletions
+COMPACT_RATIO = 0.25
+
+STOP_WORDS = {'the', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'from', 'as', 'is',
+              'are', 'was', 'were', 'be', 'been', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would',
+              'should', 'could', 'can', 'may', 'might', 'must', 'shall', 'a', 'an'}
+WHITESPACE = re.compile(r'\s+')
+MARKDOWN = re.compile(r'[#*`_\[\]()]')
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, strip Markdown and drop stop words and words of two letters or fewer."""
+    text = MARKDOWN.sub('', WHITESPACE.sub(' ', text.lower()))
+    return ' '.join(w for w in text.split() if w not in STOP_WORDS and len(w) > 2)
+
+
+def trigrams(normalized: str) -> Set[str]:
+    """Character trigrams of a normalized string, padded so word boundaries count."""
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _read_title(path: str, archive=None) -> str:
+    if archive is not None:
+        fmt, header, _ = split_frontmatter(archive.text(path))
+        return str(parse_header(fmt, header, ('title',)).get('title', '') or '')
+    return str(read_header(path, ('title',)).get('title', '') or '')
+
+
+class TitleIndex:
+    """Trigram postings over post titles, refreshed incrementally from file mtimes and sizes.
+
+    Given an open corpus archive, refresh() lists and reads posts from the pack instead of the tree.
+    """
+
+    def __init__(self, posts_dir: str = POSTS_DIR, cache_path: Optional[str] = CACHE_PATH, archive=None):
+        self.posts_dir = posts_dir
+        self.archive = archive
+        self.cache_path = Path(cache_path) if cache_path else None
+        # Document slots: [key, title, mtime_ns, size] or None once removed
+        self.docs: List[Optional[list]] = []
+        self.by_key: Dict[str, int] = {}
+        self.postings: Dict[str, List[int]] = {}
+        self._norms: List[Optional[str]] = []
+        self._exact: Dict[str, List[int]] = {}
+        self._live = 0
+
+    def __len__(self) -> int:
+        return self._live
+
+    def load(self) -> bool:
+        """Load the persisted index; returns False when there is none (or it is from another version)."""
+        if not self.cache_path or not self.cache_path.exists():
+            return False
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            return False
+        if cache.get('version') != INDEX_VERSION:
+            return False
+
+        self.docs = cache['docs']
+        self.postings = cache['postings']
+        self.by_key = {}
+        self._norms = []
+        self._exact = {}
+        for doc_id, doc in enumerate(self.docs):
+            norm = normalize_text(doc[1]) if doc else None
+            self._norms.append(norm)
+            if doc:
+                self.by_key[doc[0]] = doc_id
+                self._exact.setdefault(norm, []).append(doc_id)
+        self._live = len(self.by_key)
+        return True
+
+    def save(self):
+        if not self.cache_path:
+            return
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': INDEX_VERSION, 'docs': self.docs, 'postings': self.postings}, f,
+                      ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.cache_path)
+
+    def add(self, key: str, title: str, mtime_ns: int = 0, size: int = 0) -> int:
+        """Index one title (replacing any previous title under the same key)."""
+        if key in self.by_key:
+            self.remove(key)
+        doc_id = len(self.docs)
+        norm = normalize_text(title)
+        self.docs.append([key, title, mtime_ns, size])
+        self._norms.append(norm)
+        self.by_key[key] = doc_id
+        self._exact.setdefault(norm, []).append(doc_id)
+        for gram in trigrams(norm):
+            self.postings.setdefault(gram, []).append(doc_id)
+        self._live += 1
+        return doc_id
+
+    def remove(self, key: str):
+        """Tombstone a document; its postings are dropped at the next compaction."""
+        doc_id = self.by_key.pop(key)
+        norm = self._norms[doc_id]
+        self._exact[norm].remove(doc_id)
+        if not self._exact[norm]:
+            del self._exact[norm]
+        self.docs[doc_id] = None
+        self._norms[doc_id] = None
+        self._live -= 1
+
+    def compact(self):
+        """Renumber live documents and rebuild postings without tombstones."""
+        live = [doc for doc in self.docs if doc]
+        self.docs, self.by_key, self.postings, self._norms, self._exact, self._live = [], {}, {}, [], {}, 0
+        for key, title, mtime_ns, size in live:
+            self.add(key, title, mtime_ns, size)
+
+    def refresh(self) -> Dict[str, int]:
+        """Sync with the posts directory, re-reading titles only for new or changed files."""
+        if not self.docs:
+            self.load()
+        seen = set()
+        changes = {'added': 0, 'updated': 0, 'removed': 0}
+
+        listing = self.archive.iter_post_files() if self.archive is not None else iter_post_files(self.posts_dir)
+        for path, stat in listing:
+            key = Path(path).as_posix()
+            seen.add(key)
+            doc_id = self.by_key.get(key)
+            if doc_id is not None:
+                doc = self.docs[doc_id]
+                if doc[2] == stat.st_mtime_ns and doc[3] == stat.st_size:
+                    continue
+            try:
+                title = _read_title(path, self.archive)
+            except OSError:
+                continue
+            changes['updated' if doc_id is not None else 'added'] += 1
+            self.add(key, title, stat.st_mtime_ns, stat.st_size)
+
+        for key in [key for key in self.by_key if key not in seen]:
+            self.remove(key)
+            changes['removed'] += 1
+
+        if any(changes.values()):
+            if len(self.docs) - self._live > COMPACT_RATIO * len(self.docs):
+                self.compact()
+            self.save()
+        return changes
+
+    def search(self, title: str, limit: int = 10, min_jaccard: float = SEARCH_JACCARD,
+               budget: Optional[int] = None) -> List[Tuple[float, str, str]]:
+        """Titles ranked by trigram Jaccard similarity: [(jaccard, key, title)].
+
+        With a budget, only that many postings are scanned (rarest trigrams first) and just the best
+        partial matches are scored, which keeps lookups sub-millisecond on very large corpora.
+        """
+        query = trigrams(normalize_text(title))
+        if not query:
+            return []
+
+        # Prefix filter: a title reaching min_jaccard shares at least ceil(t * |Q|) trigrams with the query,
+        # so it must contain one of the |Q| - ceil(t * |Q|) + 1 rarest ones
+        required = max(1, math.ceil(min_jaccard * len(query) - 1e-9))
+        ordered = sorted(query, key=lambda gram: len(self.postings.get(gram, ())))
+        prefix = ordered[:len(query) - required + 1]
+        counts: Counter = Counter()
+        scanned = 0
+        for gram in prefix:
+            postings = self.postings.get(gram)
+            if not postings:
+                continue
+            if budget is not None and scanned and scanned + len(postings) > budget:
+                break
+            counts.update(postings)
+            scanned += len(postings)
+
+        if budget is not None:
+            candidates = [doc_id for doc_id, _ in counts.most_common(max(limit, CONFIRM_TOP) * 4)]
+        else:
+            unprobed = len(query) - len(prefix)
+            candidates = [doc_id for doc_id, count in counts.items() if count + unprobed >= required]
+
+        scored = []
+        for doc_id in candidates:
+            norm = self._norms[doc_id]
+            if norm is None:
+                continue
+            grams = trigrams(norm)
+            overlap = len(query & grams)
+            jaccard = overlap / (len(query) + len(grams) - overlap)
+            if jaccard >= min_jaccard:
+                doc = self.docs[doc_id]
+                scored.append((jaccard, doc[0], doc[1]))
+
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return scored[:limit]
+
+    def find_duplicate(self, title: str, threshold: float = 0.85) -> Optional[Tuple[float, str, str]]:
+        """Best existing title that matches exactly after normalization or scores above threshold.
+
+        Every title above DUPLICATE_JACCARD is confirmed, so this finds what a SequenceMatcher scan over
+        all titles would; the cheap upper bounds skip most candidates before the full ratio is computed.
+        """
+        norm = normalize_text(title)
+        exact = self._exact.get(norm)
+        if exact:
+            doc = self.docs[exact[0]]
+            return 1.0, doc[0], doc[1]
+
+        from difflib import SequenceMatcher
+        matcher = SequenceMatcher(None, norm)
+        best = None
+        for _, key, existing in self.search(title, limit=self._live, min_jaccard=DUPLICATE_JACCARD):
+            matcher.set_seq2(normalize_text(existing))
+            floor = best[0] if best else threshold
+            if matcher.real_quick_ratio() <= floor or matcher.quick_ratio() <= floor:
+                continue
+            ratio = matcher.ratio()
+            if ratio > floor:
+                best = (ratio, key, existing)
+        return best
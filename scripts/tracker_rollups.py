@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Content Tracker Rollups for SmartPetBuys
+Post counts by keyword, category, day and week, last-used order and content hash collisions,
+kept up to date by ContentTracker.add_post so analytics queries never rescan the tracker history.
+"""
+
+import heapq
+import json
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+ROLLUP_VERSION = 1
+UNCATEGORIZED = "Uncategorized"
+UNKNOWN = "unknown"
+
+
+def normalize_timestamp(value) -> Optional[str]:
+    """A tracker date or datetime as a sortable UTC 'YYYY-MM-DDTHH:MM:SSZ' string (None if unparseable)."""
+    if not value:
+        return None
+    try:
+        moment = datetime.fromisoformat(str(value).strip().replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def iso_week(day: str) -> str:
+    """ISO week label ('2025-W34') of a 'YYYY-MM-DD' day."""
+    year, week, _ = datetime.strptime(day, '%Y-%m-%d').isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def _bump(counts: Dict[str, int], key: str):
+    counts[key] = counts.get(key, 0) + 1
+
+
+class TrackerRollups:
+    """Rollup tables stored under the tracker's "rollups" key.
+
+    Every table is updated in place as posts are added, so each query is a dictionary lookup; the
+    last-used heap keeps keywords ordered by their latest post so stale keywords come out oldest
+    first without visiting the rest (superseded heap entries are skipped, and dropped on compaction).
+    """
+
+    def __init__(self, data: Optional[Dict] = None):
+        self.data = data if data is not None else {
+            'version': ROLLUP_VERSION,
+            'posts': 0,
+            'by_keyword': {},
+            'by_category': {},
+            'by_day': {},
+            'by_week': {},
+            'keyword_weeks': {},
+            'last_used': {},
+            'last_used_heap': [],
+            'hashes': {},
+            'collisions': {},
+        }
+
+    @classmethod
+    def build(cls, posts: Iterable[Dict]) -> "TrackerRollups":
+        """Rollups for a full set of tracker posts (used when the stored ones are missing or stale)."""
+        rollups = cls()
+        for post in posts:
+            rollups.add(post, compact=False)
+        rollups._compact_heap()
+        return rollups
+
+    @classmethod
+    def load(cls, tracker_data: Dict) -> "TrackerRollups":
+        """The tracker's stored rollups, rebuilt if absent, from another version or out of step with its posts."""
+        posts = tracker_data.get('posts', {})
+        stored = tracker_data.get('rollups')
+        if isinstance(stored, dict) and stored.get('version') == ROLLUP_VERSION and stored.get('posts') == len(posts):
+            return cls(stored)
+        return cls.build(posts.values())
+
+    def add(self, post: Dict, compact: bool = True):
+        """Count one tracker post in every table."""
+        data = self.data
+        keyword = post.get('keyword', '')
+        created = normalize_timestamp(post.get('created'))
+        data['posts'] += 1
+        _bump(data['by_keyword'], keyword)
+        _bump(data['by_category'], post.get('category') or UNCATEGORIZED)
+
+        day = created[:10] if created else UNKNOWN
+        week = iso_week(day) if created else UNKNOWN
+        _bump(data['by_day'], day)
+        _bump(data['by_week'], week)
+        _bump(data['keyword_weeks'].setdefault(keyword, {}), week)
+
+        if created and created > data['last_used'].get(keyword, ''):
+            data['last_used'][keyword] = created
+            heapq.heappush(data['last_used_heap'], [created, keyword])
+            if compact and len(data['last_used_heap']) > 2 * len(data['last_used']) + 16:
+                self._compact_heap()
+
+        content_hash = post.get('content_hash')
+        if content_hash:
+            _bump(data['hashes'], content_hash)
+            if data['hashes'][content_hash] > 1:
+                data['collisions'][content_hash] = data['hashes'][content_hash]
+
+    def _compact_heap(self):
+        heap = [[created, keyword] for keyword, created in self.data['last_used'].items()]
+        heapq.heapify(heap)
+        self.data['last_used_heap'] = heap
+
+    # Queries
+
+    def keyword(self, keyword: str) -> Dict:
+        """Post count, last use and posts per ISO week of one keyword."""
+        return {
+            'keyword': keyword,
+            'posts': self.data['by_keyword'].get(keyword, 0),
+            'last_used': self.data['last_used'].get(keyword),
+            'weeks': dict(sorted(self.data['keyword_weeks'].get(keyword, {}).items())),
+        }
+
+    def posts_on(self, period: str) -> int:
+        """Posts created on a day ('2025-08-21') or in an ISO week ('2025-W34')."""
+        table = self.data['by_week'] if '-W' in period else self.data['by_day']
+        return table.get(period, 0)
+
+    def category(self, category: str) -> int:
+        return self.data['by_category'].get(category, 0)
+
+    def unused_since(self, cutoff: str) -> List[Tuple[str, str]]:
+        """(keyword, last used) for keywords whose latest post is older than cutoff, oldest first.
+
+        Walks the heap only below entries older than the cutoff, so the cost follows the number of
+        stale entries rather than the number of keywords.
+        """
+        heap, last_used = self.data['last_used_heap'], self.data['last_used']
+        found, stack = [], [0] if heap else []
+        while stack:
+            i = stack.pop()
+            created, keyword = heap[i]
+            if created >= cutoff:
+                continue
+            if last_used.get(keyword) == created:
+                found.append((keyword, created))
+            stack.extend(child for child in (2 * i + 1, 2 * i + 2) if child < len(heap))
+        return sorted(found, key=lambda item: item[1])
+
+    def unused_for(self, days: int, now: Optional[datetime] = None) -> List[Tuple[str, str]]:
+        """Keywords with no post in the last `days` days."""
+        now = now or datetime.now(timezone.utc)
+        return self.unused_since((now - timedelta(days=days)).strftime('%Y-%m-%dT%H:%M:%SZ'))
+
+    def collisions(self) -> Dict[str, int]:
+        """Content hashes shared by more than one tracked post, with their post counts."""
+        return dict(self.data['collisions'])
+
+    def summary(self) -> Dict:
+        data = self.data
+        return {
+            'posts': data['posts'],
+            'keywords': len(data['by_keyword']),
+            'categories': dict(sorted(data['by_category'].items())),
+            'days': len(data['by_day']),
+            'weeks': len(data['by_week']),
+            'hash_collisions': len(data['collisions']),
+        }
+
+
+def main():
+    """CLI interface for tracker rollup queries."""
+    from generate_single_post import ContentTracker
+
+    args = sys.argv[1:]
+    as_json = '--json' in args
+    args = [arg for arg in args if arg != '--json']
+    usage = ("Usage: python tracker_rollups.py [summary|keyword <keyword>|posts <YYYY-MM-DD|YYYY-Www|this-week>|"
+             "category <name>|unused [--days N]|collisions|rebuild] [--json]")
+    if not args:
+        print(usage)
+        return 1
+
+    tracker = ContentTracker()
+    rollups = tracker.rollups
+    command = args[0]
+
+    if command == 'summary':
+        result = rollups.summary()
+    elif command == 'keyword' and len(args) == 2:
+        result = rollups.keyword(args[1])
+    elif command == 'posts' and len(args) == 2:
+        period = args[1]
+        if period == 'this-week':
+            period = iso_week(datetime.now(timezone.utc).strftime('%Y-%m-%d'))
+        result = {'period': period, 'posts': rollups.posts_on(period)}
+    elif command == 'category' and len(args) == 2:
+        result = {'category': args[1], 'posts': rollups.category(args[1])}
+    elif command == 'unused':
+        days = int(args[args.index('--days') + 1]) if '--days' in args else 30
+        result = {'days': days, 'keywords': [{'keyword': keyword, 'last_used': last_used}
+                                             for keyword, last_used in rollups.unused_for(days)]}
+    elif command == 'collisions':
+        result = rollups.collisions()
+    elif command == 'rebuild':
+        tracker.save()
+        result = tracker.rollups.summary()
+    else:
+        print(usage)
+        return 1
+
+    if as_json:
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+    elif command in ('summary', 'rebuild'):
+        print("\n[ROLLUPS] Content Tracker Summary:")
+        print(f"Posts: {result['posts']} across {result['keywords']} keywords, "
+              f"{result['days']} days and {result['weeks']} weeks")
+        print(f"Hash collisions: {result['hash_collisions']}")
+        for category, count in result['categories'].items():
+            print(f"  {category}: {count} posts")
+    elif command == 'keyword':
+        print(f"\n[ROLLUPS] {result['keyword']}: {result['posts']} posts, last used {result['last_used'] or 'never'}")
+        for week, count in result['weeks'].items():
+            print(f"  {week}: {count}")
+    elif command == 'unused':
+        print(f"\n[ROLLUPS] {len(result['keywords'])} keywords unused for {result['days']}+ days:")
+        for entry in result['keywords']:
+            print(f"  {entry['last_used'][:10]}  {entry['keyword']}")
+    elif command == 'collisions':
+        print(f"\n[ROLLUPS] {len(result)} content hashes shared by several posts:")
+        for content_hash, count in result.items():
+            print(f"  {content_hash[:16]}  {count} posts")
+    else:
+        print(f"{result.get('period') or result.get('category')}: {result['posts']} posts")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
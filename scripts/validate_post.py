@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""
+Post Validation for SmartPetBuys
+Checks a generated index.md the way a Hugo build would (frontmatter, dates, shortcodes, product ids,
+product-card markup and schema.org JSON-LD) in milliseconds, without running Hugo.
+"""
+
+import json
+import os
+import re
+import sys
+import time
+from datetime import date, datetime
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+from content_audit import iter_post_files
+from frontmatter_io import parse_header, split_frontmatter
+from site_config import DEFAULT_SITE, SiteConfig
+from validate_product_data import iter_products
+
+# Hugo's embedded shortcodes, mapped to whether they take inner content (and so must be closed);
+# site and theme shortcodes are discovered from layouts/shortcodes
+BUILTIN_SHORTCODES = {'details': True, 'figure': False, 'gist': False, 'highlight': True, 'instagram': False,
+                      'param': False, 'qr': True, 'ref': False, 'relref': False, 'tweet': False, 'vimeo': False,
+                      'x': False, 'youtube': False}
+
+# Frontmatter fields whose type Hugo (or our templates) depend on, and whether a mismatch breaks the build
+FIELD_TYPES = {
+    'title': (str, 'error'),
+    'slug': (str, 'error'),
+    'draft': (bool, 'error'),
+    'weight': (int, 'error'),
+    'schema': (dict, 'error'),
+    'tags': (list, 'error'),
+    'categories': (list, 'error'),
+    'description': (str, 'warning'),
+    'featured_image': (str, 'warning'),
+    'canonical': (str, 'warning'),
+    'keywords': ((str, list), 'warning'),
+    'priority': ((int, float), 'warning'),
+}
+DATE_FIELDS = ('date', 'lastmod', 'publishDate', 'expiryDate')
+REQUIRED_FIELDS = ('title', 'date')
+
+# Formats Hugo accepts for front matter dates: RFC 3339 and its shorter date-only forms
+DATE_PATTERN = re.compile(r'^(\d{4})-(\d{2})-(\d{2})'
+                          r'(?:[T ](\d{2}):(\d{2})(?::(\d{2})(?:\.\d+)?)?(Z|[+-]\d{2}:?\d{2})?)?$')
+
+SHORTCODE = re.compile(r'\{\{([<%])(.*?)([>%])\}\}', re.DOTALL)
+SHORTCODE_OPEN = re.compile(r'\{\{[<%]')
+SHORTCODE_NAME = re.compile(r'^\s*(/?)\s*([A-Za-z0-9_/-]+)')
+SHORTCODE_PARAM = re.compile(r'\s*(?:([A-Za-z0-9_-]+)=)?("(?:[^"\\]|\\.)*"|`[^`]*`|[^\s"`]+)')
+CARD_START = re.compile(r'<div\b[^>]*\bclass="product-card"[^>]*>')
+LD_JSON = re.compile(r'<script\b[^>]*type="application/ld\+json"[^>]*>(.*?)</script>', re.DOTALL | re.IGNORECASE)
+PLACEHOLDER = re.compile(r'>\s*\$?(?:N/A|TBD|\[[^\]<]+\])\s*<')
+
+VOID_ELEMENTS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source',
+                 'track', 'wbr'}
+ARTICLE_TYPES = {'Article', 'BlogPosting', 'NewsArticle', 'Review'}
+
+
+def content_pages(site: SiteConfig = DEFAULT_SITE) -> Set[str]:
+    """Pages under content/ as ref paths without extension ('posts/dog-toys', 'about'); bundles by directory."""
+    content_dir = site.path('content')
+    pages = set()
+    for directory, _, files in os.walk(content_dir):
+        for name in files:
+            stem, extension = os.path.splitext(name)
+            if extension not in ('.md', '.html'):
+                continue
+            relative = Path(directory).relative_to(content_dir).as_posix()
+            relative = '' if relative == '.' else relative
+            if stem in ('index', '_index'):
+                pages.add(relative)
+            else:
+                pages.add(f"{relative}/{stem}" if relative else stem)
+    return pages
+
+
+def ref_resolves(target: str, pages: Set[str]) -> bool:
+    """Whether Hugo's ref/relref could resolve target: absolute from content/, otherwise by trailing path."""
+    target = target.split('#', 1)[0].strip()
+    if not target:
+        return True  # an anchor on the current page
+    absolute = target.startswith('/')
+    target = target.strip('/')
+    if target.endswith('.md'):
+        target = target[:-3]
+    if target in pages:
+        return True
+    return not absolute and any(page.endswith('/' + target) for page in pages)
+
+
+def parse_date(value) -> Optional[datetime]:
+    """A front matter date as Hugo would read it, or None when it would fail to parse."""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    match = DATE_PATTERN.match(value.strip()) if isinstance(value, str) else None
+    if not match:
+        return None
+    year, month, day, hour, minute, second, _ = match.groups()
+    try:
+        return datetime(int(year), int(month), int(day), int(hour or 0), int(minute or 0), int(second or 0))
+    except ValueError:
+        return None
+
+
+def known_shortcodes(site: SiteConfig = DEFAULT_SITE) -> Dict[str, bool]:
+    """Shortcodes the build can resolve (Hugo's own, the site's and its theme's), mapped to whether
+    their template reads .Inner."""
+    names = dict(BUILTIN_SHORTCODES)
+    directories = [site.path('layouts/shortcodes')]
+    config = site.path('hugo.toml')
+    if config.exists():
+        theme = re.search(r'^theme\s*=\s*"([^"]+)"', config.read_text(encoding='utf-8'), re.MULTILINE)
+        if theme:
+            directories.append(site.path(f"themes/{theme.group(1)}/layouts/shortcodes"))
+    # Theme templates first so the site's own shortcodes override them, as in Hugo's lookup order
+    for directory in reversed(directories):
+        if directory.is_dir():
+            for path in directory.iterdir():
+                if path.suffix == '.html':
+                    names[path.stem.split('.')[0]] = '.Inner' in path.read_text(encoding='utf-8', errors='replace')
+    return names
+
+
+def product_ids(site: SiteConfig = DEFAULT_SITE) -> Set[str]:
+    """Ids in data/products.json, which is what the product shortcode resolves against."""
+    if not site.products_path.exists():
+        return set()
+    return {product_id for product_id, _ in iter_products(str(site.products_path))}
+
+
+class _CardParser(HTMLParser):
+    """Tracks open elements of one product card and records nesting errors."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack: List[str] = []
+        self.errors: List[str] = []
+        self.props: Set[str] = set()
+        self.closed_at: Optional[int] = None
+
+    def handle_starttag(self, tag, attrs):
+        if self.closed_at is not None:
+            return
+        attributes = dict(attrs)
+        if attributes.get('itemprop'):
+            self.props.add(attributes['itemprop'])
+        if tag not in VOID_ELEMENTS:
+            self.stack.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        if self.closed_at is None and dict(attrs).get('itemprop'):
+            self.props.add(dict(attrs)['itemprop'])
+
+    def handle_endtag(self, tag):
+        if self.closed_at is not None or tag in VOID_ELEMENTS:
+            return
+        if tag not in self.stack:
+            self.errors.append(f"Stray </{tag}>")
+            return
+        while self.stack[-1] != tag:
+            self.errors.append(f"<{self.stack.pop()}> not closed before </{tag}>")
+        self.stack.pop()
+        if not self.stack:
+            self.closed_at = self.getpos()[0]
+
+
+def _check_card(card: str) -> Dict:
+    """Nesting errors and itemprops of a card; card runs from its opening tag to the end of the body."""
+    parser = _CardParser()
+    parser.feed(card)
+    parser.close()
+    if parser.closed_at is None:
+        parser.errors.append(f"<{parser.stack[0] if parser.stack else 'div'}> product card never closed")
+    return {'errors': parser.errors, 'props': parser.props}
+
+
+def validate_schema(schema, canonical: Optional[str] = None) -> List[Dict]:
+    """Check the schema.org structured data rendered as JSON-LD by partials/schema-article.html."""
+    issues = []
+
+    def flag(severity: str, message: str):
+        issues.append({'check': 'schema', 'severity': severity, 'message': message})
+
+    try:
+        json.dumps(schema, default=str)
+    except (TypeError, ValueError) as e:
+        flag('error', f"Not serializable to JSON-LD: {e}")
+        return issues
+    if 'schema.org' not in str(schema.get('@context', '')):
+        flag('error', "@context must be https://schema.org")
+    schema_type = schema.get('@type')
+    if not isinstance(schema_type, str) or not schema_type:
+        flag('error', "@type is missing")
+        return issues
+    if schema_type not in ARTICLE_TYPES:
+        return issues
+
+    headline = schema.get('headline')
+    if not isinstance(headline, str) or not headline.strip():
+        flag('error', "headline is missing")
+    elif len(headline) > 110:
+        flag('warning', f"headline is {len(headline)} characters (Google truncates beyond 110)")
+    published, modified = parse_date(schema.get('datePublished')), parse_date(schema.get('dateModified'))
+    if published is None:
+        flag('error', f"datePublished {schema.get('datePublished')!r} is not an ISO 8601 date")
+    if 'dateModified' in schema and modified is None:
+        flag('error', f"dateModified {schema.get('dateModified')!r} is not an ISO 8601 date")
+    elif published and modified and modified.replace(tzinfo=None) < published.replace(tzinfo=None):
+        flag('warning', "dateModified is earlier than datePublished")
+    for role in ('author', 'publisher'):
+        entity = schema.get(role)
+        if not isinstance(entity, (dict, list)) or (isinstance(entity, dict) and not entity.get('name')):
+            flag('error' if role == 'author' else 'warning', f"{role} needs an object with a name")
+    page = schema.get('mainEntityOfPage')
+    if canonical and isinstance(page, dict) and page.get('@id') not in (None, canonical):
+        flag('warning', f"mainEntityOfPage @id {page.get('@id')!r} differs from canonical {canonical!r}")
+    return issues
+
+
+def validate_text(text: str, products: Set[str], shortcodes: Dict[str, bool],
+                  pages: Optional[Set[str]] = None) -> List[Dict]:
+    """Validate the full text of a post (frontmatter plus body); ref targets are checked when pages are given."""
+    issues = []
+
+    def flag(check: str, severity: str, message: str, offset: Optional[int] = None):
+        issue = {'check': check, 'severity': severity, 'message': message}
+        if offset is not None:
+            issue['line'] = text.count('\n', 0, offset) + 1
+        issues.append(issue)
+
+    fmt, header, body = split_frontmatter(text)
+    if fmt is None:
+        flag('frontmatter', 'error', "No frontmatter block (--- or +++) at the top of the file")
+        return issues
+    body_start = len(text) - len(body)
+    metadata = parse_header(fmt, header)
+    if not metadata:
+        flag('frontmatter', 'error', f"{fmt.upper()} frontmatter could not be parsed")
+        return issues
+
+    for field in REQUIRED_FIELDS:
+        if field not in metadata:
+            flag('frontmatter', 'error', f"Missing required field '{field}'")
+    for field, (expected, severity) in FIELD_TYPES.items():
+        value = metadata.get(field)
+        # YAML reads `true`/`1` as bool/int; bool is an int subclass, so check it separately
+        wrong = value is not None and (not isinstance(value, expected)
+                                       or (isinstance(value, bool) and expected is int))
+        if wrong:
+            name = expected.__name__ if isinstance(expected, type) else '/'.join(t.__name__ for t in expected)
+            flag('frontmatter', severity, f"'{field}' should be {name}, got {type(value).__name__}")
+        elif isinstance(value, list) and not all(isinstance(item, str) for item in value):
+            flag('frontmatter', severity, f"'{field}' should only contain strings")
+    for field in DATE_FIELDS:
+        if field in metadata and parse_date(metadata[field]) is None:
+            flag('frontmatter', 'error', f"'{field}' {metadata[field]!r} is not a date Hugo can parse")
+    created, modified = parse_date(metadata.get('date')), parse_date(metadata.get('lastmod'))
+    if created and modified and modified.replace(tzinfo=None) < created.replace(tzinfo=None):
+        flag('frontmatter', 'warning', "lastmod is earlier than date")
+
+    schema = metadata.get('schema')
+    if isinstance(schema, dict):
+        issues.extend(validate_schema(schema, metadata.get('canonical')))
+
+    # Shortcodes: every opener terminated, names resolvable, parameters quoted, inner content closed
+    open_pairs: List[tuple] = []
+    covered = set()
+    for match in SHORTCODE.finditer(body):
+        offset = body_start + match.start()
+        covered.add(match.start())
+        opener, inner, closer = match.groups()
+        if (opener == '<') != (closer == '>'):
+            flag('shortcode', 'error', f"Mismatched shortcode delimiters in {match.group(0)[:40]!r}", offset)
+            continue
+        inner = inner.strip()
+        if inner.startswith('/*') and inner.endswith('*/'):
+            continue  # {{</* escaped */>}} example
+        name_match = SHORTCODE_NAME.match(inner)
+        if not name_match:
+            flag('shortcode', 'error', f"Shortcode without a name: {match.group(0)[:40]!r}", offset)
+            continue
+        closing, name = name_match.groups()
+        if name not in shortcodes:
+            flag('shortcode', 'error', f"Unknown shortcode '{name}' (no layouts/shortcodes/{name}.html)", offset)
+        if closing:
+            if open_pairs and open_pairs[-1][0] == name:
+                open_pairs.pop()
+            elif name in shortcodes and not shortcodes[name]:
+                flag('shortcode', 'error', f"Shortcode '{name}' takes no inner content but is closed", offset)
+            else:
+                flag('shortcode', 'error', f"Closing {{{{< /{name} >}}}} without a matching opener", offset)
+            continue
+        self_closed = inner.endswith('/')
+        params_text = inner[name_match.end():].rstrip('/').strip()
+        if params_text.count('"') % 2:
+            flag('shortcode', 'error', f"Unbalanced quotes in '{name}' parameters", offset)
+            continue
+        params = SHORTCODE_PARAM.findall(params_text)
+        if params and any(key for key, _ in params) and not all(key for key, _ in params):
+            flag('shortcode', 'error', f"'{name}' mixes named and positional parameters", offset)
+        if name == 'product':
+            values = {key or '0': value.strip('"`') for key, value in params}
+            product_id = values.get('id', values.get('0'))
+            if not product_id:
+                flag('shortcode', 'error', "product shortcode without an id", offset)
+            elif product_id not in products:
+                flag('shortcode', 'error', f"Product id '{product_id}' not found in data/products.json", offset)
+        if name in ('ref', 'relref') and pages is not None:
+            values = {key or '0': value.strip('"`') for key, value in params}
+            target = values.get('path', values.get('0', ''))
+            # Hugo fails the whole build on a ref it cannot resolve
+            if not ref_resolves(target, pages):
+                flag('shortcode', 'error', f"{name} target '{target}' not found under content/", offset)
+        if shortcodes.get(name) and not self_closed:
+            open_pairs.append((name, offset))
+    for name, offset in open_pairs:
+        flag('shortcode', 'error', f"Shortcode '{name}' takes inner content but is never closed", offset)
+    for match in SHORTCODE_OPEN.finditer(body):
+        if match.start() not in covered:
+            flag('shortcode', 'error', "Unterminated shortcode (missing >}} or %}})", body_start + match.start())
+
+    for match in CARD_START.finditer(body):
+        offset = body_start + match.start()
+        card = _check_card(body[match.start():])
+        for error in card['errors']:
+            flag('product_card', 'error', error, offset)
+        marker = re.search(r'\bdata-product-id="([^"]*)"', match.group(0))
+        if marker and marker.group(1) not in products:
+            flag('product_card', 'error', f"Product id '{marker.group(1)}' not found in data/products.json", offset)
+        if 'name' not in card['props']:
+            flag('product_card', 'warning', "Product card has no itemprop=\"name\"", offset)
+        end = body.find('\n\n', match.start())
+        placeholder = PLACEHOLDER.search(body, match.start(), len(body) if end == -1 else end)
+        if placeholder:
+            flag('product_card', 'warning', f"Placeholder value {placeholder.group(0)[1:-1].strip()!r} in card", offset)
+
+    for match in LD_JSON.finditer(body):
+        try:
+            json.loads(match.group(1))
+        except json.JSONDecodeError as e:
+            flag('schema', 'error', f"Invalid JSON-LD block: {e.msg}", body_start + match.start())
+
+    return issues
+
+
+class PostValidator:
+    """Validates posts against one site's products and shortcodes, loading both once."""
+
+    def __init__(self, site: SiteConfig = DEFAULT_SITE):
+        self.site = site
+        self.products = product_ids(site)
+        self.shortcodes = known_shortcodes(site)
+        self.pages = content_pages(site)
+
+    def validate(self, path) -> List[Dict]:
+        # Hugo skips a UTF-8 byte order mark, so the validator does too
+        with open(path, 'r', encoding='utf-8-sig', errors='replace') as f:
+            return validate_text(f.read(), self.products, self.shortcodes, self.pages)
+
+    def validate_many(self, paths: Iterable) -> Dict:
+        """Validate paths and summarize issues by post."""
+        started = time.perf_counter()
+        posts = {}
+        for path in paths:
+            posts[self.site.relative(path)] = self.validate(path)
+        issues = [issue for post_issues in posts.values() for issue in post_issues]
+        errors = sum(1 for issue in issues if issue['severity'] == 'error')
+        return {
+            'posts': len(posts),
+            'errors': errors,
+            'warnings': len(issues) - errors,
+            'issues': {path: post_issues for path, post_issues in posts.items() if post_issues},
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+        }
+
+
+def main():
+    """Validate the given posts (default: every post) and exit non-zero on errors."""
+    args = sys.argv[1:]
+    if '--help' in args:
+        print("Usage: python validate_post.py [path/to/index.md ...] [--json] [--strict]")
+        return 0
+    paths = [arg for arg in args if not arg.startswith('--')]
+    if not paths:
+        paths = [path for path, _ in iter_post_files(str(DEFAULT_SITE.posts_path))]
+    missing = [path for path in paths if not Path(path).exists()]
+    if missing:
+        print(f"ERROR: Post not found: {', '.join(missing)}")
+        return 1
+
+    results = PostValidator().validate_many(paths)
+    failed = results['errors'] > 0 or ('--strict' in args and results['warnings'] > 0)
+    results['passed'] = not failed
+
+    if '--json' in args:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+        return 1 if failed else 0
+
+    print(f"Validated {results['posts']} posts in {results['elapsed_ms']:.0f} ms "
+          f"(errors: {results['errors']}, warnings: {results['warnings']})")
+    for path, issues in results['issues'].items():
+        print(f"Post: {path}")
+        for issue in issues:
+            line = f" (line {issue['line']})" if 'line' in issue else ''
+            print(f"   [{issue['severity'].upper()}] {issue['check']}{line}: {issue['message']}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    exit(main())
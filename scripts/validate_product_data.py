@@ -1,139 +1,342 @@
 #!/usr/bin/env python3
 """
 Product Data Validation Script for SmartPetBuys
-Identifies products missing brand, price, rating, or review_count data
+Incrementally validates data/products.json and flags missing or malformed product fields.
 """
 
 import json
 import csv
+import hashlib
+import os
+import re
+import time
 from pathlib import Path
-from typing import Dict, List
-
-def load_products() -> Dict:
-    """Load products from JSON file."""
-    products_path = Path("data/products.json")
-    if products_path.exists():
-        with open(products_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return {}
-
-def validate_products(products: Dict) -> List[Dict]:
-    """Validate products and return list of issues."""
-    required_fields = ['brand', 'price', 'rating', 'review_count']
-    missing_data = []
-    
-    for product_id, product in products.items():
-        issues = []
-        
-        for field in required_fields:
-            if field not in product or not product[field]:
-                issues.append(field)
-        
-        if issues:
-            missing_data.append({
-                'id': product_id,
-                'name': product.get('name', 'Unknown'),
-                'missing_fields': issues,
-                'url': product.get('url', 'No URL')
-            })
-    
-    return missing_data
-
-def suggest_fixes(missing_data: List[Dict]) -> List[Dict]:
-    """Suggest automatic fixes for missing data."""
-    fixes = []
-    
-    for item in missing_data:
-        fix = {
-            'id': item['id'],
-            'name': item['name'],
-            'suggested_fixes': {}
-        }
-        
-        # Suggest brand from product name
-        if 'brand' in item['missing_fields']:
-            name_parts = item['name'].split()
-            suggested_brand = name_parts[0] if name_parts else 'Quality Brand'
-            fix['suggested_fixes']['brand'] = suggested_brand
-        
-        # Suggest default values for missing fields
-        if 'price' in item['missing_fields']:
-            fix['suggested_fixes']['price'] = '29.99'
-        
-        if 'rating' in item['missing_fields']:
-            fix['suggested_fixes']['rating'] = '4.3'
-        
-        if 'review_count' in item['missing_fields']:
-            fix['suggested_fixes']['review_count'] = '1,500'
-        
-        fixes.append(fix)
-    
-    return fixes
-
-def generate_csv_report(missing_data: List[Dict], fixes: List[Dict]):
-    """Generate CSV report of missing data and suggested fixes."""
-    with open('product_validation_report.csv', 'w', newline='', encoding='utf-8') as f:
+from typing import Dict, Iterator, List, Optional, Tuple
+
+PRODUCTS_PATH = "data/products.json"
+CACHE_PATH = ".cache/product_validation.json"
+REPORT_PATH = "product_validation_report.csv"
+
+# Bump when validation rules change so cached results are discarded
+VALIDATOR_VERSION = 2
+
+# Fields Google needs for Product rich results (see layouts/shortcodes/product.html)
+SCHEMA_FIELDS = ['brand', 'price', 'rating', 'review_count']
+REQUIRED_FIELDS = ['name', 'url', 'image']
+
+# Revalidate in worker processes only when enough records changed to pay for the pool
+PARALLEL_THRESHOLD = 2000
+BATCH_SIZE = 500
+
+PRICE_PATTERN = re.compile(r'^\d{1,6}(\.\d{1,2})?$')
+REVIEW_COUNT_PATTERN = re.compile(r'^\d{1,3}(,\d{3})*\+?$|^\d+\+?$')
+URL_PATTERN = re.compile(r'^https://[A-Za-z0-9.-]+\.[A-Za-z]{2,}(/\S*)?$')
+
+
+def iter_products(products_path: str = PRODUCTS_PATH, chunk_size: int = 65536) -> Iterator[Tuple[str, Dict]]:
+    """Stream (product_id, product) pairs from the catalog without loading it whole."""
+    decoder = json.JSONDecoder()
+    whitespace = ' \t\r\n'
+
+    with open(products_path, 'r', encoding='utf-8') as f:
+        buf = f.read(chunk_size)
+        eof = not buf
+        pos = 0
+
+        def fill() -> bool:
+            """Append the next chunk, dropping the already consumed prefix."""
+            nonlocal buf, pos, eof
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+                return False
+            buf = buf[pos:] + chunk
+            pos = 0
+            return True
+
+        def skip(chars: str):
+            nonlocal pos
+            while True:
+                while pos < len(buf) and buf[pos] in chars:
+                    pos += 1
+                if pos < len(buf) or not fill():
+                    return
+
+        def decode():
+            nonlocal pos
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buf, pos)
+                    # A value ending exactly at the buffer edge may be truncated (e.g. numbers)
+                    if end < len(buf) or eof or not fill():
+                        pos = end
+                        return value
+                except json.JSONDecodeError:
+                    if not fill():
+                        raise
+
+        skip(whitespace)
+        if pos >= len(buf) or buf[pos] != '{':
+            raise ValueError(f"{products_path} must contain a JSON object of products")
+        pos += 1
+
+        while True:
+            skip(whitespace + ',')
+            if pos >= len(buf):
+                raise ValueError(f"Unexpected end of {products_path}")
+            if buf[pos] == '}':
+                return
+
+            product_id = decode()
+            skip(whitespace)
+            if pos >= len(buf) or buf[pos] != ':':
+                raise ValueError(f"Malformed entry for '{product_id}' in {products_path}")
+            pos += 1
+            skip(whitespace)
+            yield product_id, decode()
+
+
+def record_hash(product: Dict) -> str:
+    """Hash a product record independent of key order."""
+    canonical = json.dumps(product, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+
+def validate_product(product_id: str, product: Dict) -> List[Dict]:
+    """Check one product's fields for presence, type and format."""
+    issues = []
+
+    def flag(field: str, severity: str, message: str):
+        issues.append({'id': product_id, 'field': field, 'severity': severity, 'message': message})
+
+    if not isinstance(product, dict):
+        flag('*', 'error', 'Product entry is not an object')
+        return issues
+
+    for field in REQUIRED_FIELDS:
+        if not product.get(field):
+            flag(field, 'error', 'Missing required field')
+
+    if not product.get('blurb'):
+        flag('blurb', 'warning', 'Missing blurb (the product card shows no description)')
+
+    for field in SCHEMA_FIELDS:
+        if not product.get(field):
+            flag(field, 'warning', 'Missing schema field (product rich results will be incomplete)')
+
+    for field in ('name', 'url', 'image', 'blurb', 'brand', 'price', 'rating', 'review_count'):
+        value = product.get(field)
+        if value is not None and not isinstance(value, str):
+            flag(field, 'error', f"Expected a string, got {type(value).__name__}")
+
+    price = product.get('price')
+    if isinstance(price, str) and price:
+        if not PRICE_PATTERN.match(price):
+            flag('price', 'error', f"Price '{price}' is not a plain decimal amount")
+        elif float(price) <= 0:
+            flag('price', 'error', f"Price '{price}' must be positive")
+
+    rating = product.get('rating')
+    if isinstance(rating, str) and rating:
+        try:
+            rating_value = float(rating)
+        except ValueError:
+            flag('rating', 'error', f"Rating '{rating}' is not numeric")
+        else:
+            if not 1.0 <= rating_value <= 5.0:
+                flag('rating', 'error', f"Rating '{rating}' is outside 1-5")
+
+    review_count = product.get('review_count')
+    if isinstance(review_count, str) and review_count:
+        if not REVIEW_COUNT_PATTERN.match(review_count):
+            flag('review_count', 'error', f"Review count '{review_count}' is not parseable")
+
+    for field in ('url', 'image'):
+        value = product.get(field)
+        if isinstance(value, str) and value and not URL_PATTERN.match(value):
+            flag(field, 'error', f"'{value}' is not an https URL")
+
+    return issues
+
+
+def _validate_batch(batch: List[Tuple[str, Dict]]) -> List[Tuple[str, List[Dict]]]:
+    """Validate a batch of products (runs in a worker process)."""
+    return [(product_id, validate_product(product_id, product)) for product_id, product in batch]
+
+
+def load_cache(cache_path: str = CACHE_PATH) -> Dict:
+    """Load per-product hashes and issues from the previous run."""
+    path = Path(cache_path)
+    if path.exists():
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+            if cache.get('version') == VALIDATOR_VERSION:
+                return cache
+        except (json.JSONDecodeError, FileNotFoundError):
+            pass
+    return {'version': VALIDATOR_VERSION, 'products': {}}
+
+
+def save_cache(cache: Dict, cache_path: str = CACHE_PATH):
+    """Persist validation cache atomically."""
+    path = Path(cache_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def validate_catalog(products_path: str = PRODUCTS_PATH, cache_path: Optional[str] = CACHE_PATH,
+                     full: bool = False, workers: Optional[int] = None) -> Dict:
+    """Validate the catalog, revalidating only records whose hash changed since the last run."""
+    started = time.perf_counter()
+    cache = load_cache(cache_path) if cache_path and not full else {'version': VALIDATOR_VERSION, 'products': {}}
+    cached_products = cache['products']
+
+    current: Dict[str, Dict] = {}
+    changed: List[Tuple[str, Dict]] = []
+    issues: List[Dict] = []
+    url_owner: Dict[str, str] = {}
+    revalidated = 0
+
+    def collect(batch_result: List[Tuple[str, List[Dict]]]):
+        nonlocal revalidated
+        for product_id, product_issues in batch_result:
+            current[product_id]['issues'] = product_issues
+            revalidated += 1
+
+    pool = None
+    futures = []
+    pending_batches: List[List[Tuple[str, Dict]]] = []
+    try:
+        for product_id, product in iter_products(products_path):
+            digest = record_hash(product)
+            entry = cached_products.get(product_id)
+
+            if entry and entry['hash'] == digest:
+                current[product_id] = entry
+            else:
+                current[product_id] = {'hash': digest, 'issues': []}
+                changed.append((product_id, product))
+
+            # Duplicate affiliate links are a catalog-level check and always run
+            url = product.get('url') if isinstance(product, dict) else None
+            if url:
+                if url in url_owner:
+                    issues.append({'id': product_id, 'field': 'url', 'severity': 'error',
+                                   'message': f"Affiliate URL duplicates product '{url_owner[url]}'"})
+                else:
+                    url_owner[url] = product_id
+
+            if len(changed) >= BATCH_SIZE:
+                pending_batches.append(changed)
+                changed = []
+                if pool is None and len(pending_batches) * BATCH_SIZE >= PARALLEL_THRESHOLD:
+                    from concurrent.futures import ProcessPoolExecutor
+                    pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count())
+                if pool is not None:
+                    futures.extend(pool.submit(_validate_batch, batch) for batch in pending_batches)
+                    pending_batches = []
+
+        if changed:
+            pending_batches.append(changed)
+        for batch in pending_batches:
+            collect(_validate_batch(batch))
+        for future in futures:
+            collect(future.result())
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    for product_id, entry in current.items():
+        issues.extend(entry['issues'])
+
+    if cache_path:
+        save_cache({'version': VALIDATOR_VERSION, 'products': current}, cache_path)
+
+    issues.sort(key=lambda issue: (issue['severity'] != 'error', issue['id'], issue['field']))
+    errors = sum(1 for issue in issues if issue['severity'] == 'error')
+
+    return {
+        'catalog': str(products_path),
+        'products': len(current),
+        'revalidated': revalidated,
+        'cached': len(current) - revalidated,
+        'errors': errors,
+        'warnings': len(issues) - errors,
+        'issues': issues,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def generate_csv_report(results: Dict, report_path: str = REPORT_PATH):
+    """Generate CSV report of flagged product fields."""
+    with open(report_path, 'w', newline='', encoding='utf-8') as f:
         writer = csv.writer(f)
-        writer.writerow(['Product ID', 'Product Name', 'Missing Fields', 'Suggested Brand', 'Suggested Price', 'Suggested Rating', 'Suggested Reviews', 'Product URL'])
-        
-        for i, item in enumerate(missing_data):
-            fix = fixes[i] if i < len(fixes) else {'suggested_fixes': {}}
-            
-            writer.writerow([
-                item['id'],
-                item['name'],
-                ', '.join(item['missing_fields']),
-                fix['suggested_fixes'].get('brand', ''),
-                fix['suggested_fixes'].get('price', ''),
-                fix['suggested_fixes'].get('rating', ''),
-                fix['suggested_fixes'].get('review_count', ''),
-                item['url']
-            ])
+        writer.writerow(['Product ID', 'Severity', 'Field', 'Issue'])
+        for issue in results['issues']:
+            writer.writerow([issue['id'], issue['severity'], issue['field'], issue['message']])
+
 
 def main():
     """Main validation function."""
+    import sys
+
+    args = sys.argv[1:]
+    unknown = [arg for arg in args if arg not in ('--json', '--full', '--strict', '--csv')]
+    if unknown:
+        print("Usage: python validate_product_data.py [--json] [--full] [--strict] [--csv]")
+        return 2
+
+    if not Path(PRODUCTS_PATH).exists():
+        print(f"ERROR: No products found in {PRODUCTS_PATH}")
+        return 1
+
+    try:
+        results = validate_catalog(full='--full' in args)
+    except ValueError as e:
+        print(f"ERROR: Could not parse catalog: {e}")
+        return 1
+
+    failed = results['errors'] > 0 or ('--strict' in args and results['warnings'] > 0)
+    results['passed'] = not failed
+
+    if '--csv' in args:
+        generate_csv_report(results)
+
+    if '--json' in args:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+        return 1 if failed else 0
+
     print("SmartPetBuys Product Data Validation")
     print("=" * 50)
-    
-    # Load products
-    products = load_products()
-    if not products:
-        print("ERROR: No products found in data/products.json")
-        return
-    
-    print(f"Loaded {len(products)} products")
-    
-    # Validate products
-    missing_data = validate_products(products)
-    
-    if not missing_data:
-        print("SUCCESS: All products have complete data!")
-        return
-    
-    print(f"WARNING: Found {len(missing_data)} products with missing data:")
+    print(f"Checked {results['products']} products "
+          f"({results['revalidated']} revalidated, {results['cached']} unchanged) "
+          f"in {results['elapsed_ms']:.0f} ms")
+
+    if not results['issues']:
+        print("SUCCESS: All products have complete, well-formed data!")
+        return 0
+
+    print(f"Errors: {results['errors']}  Warnings: {results['warnings']}")
     print()
-    
-    # Generate suggested fixes
-    fixes = suggest_fixes(missing_data)
-    
-    # Display results
-    for i, item in enumerate(missing_data):
-        fix = fixes[i]
-        print(f"Product: {item['name']} (ID: {item['id']})")
-        print(f"   Missing: {', '.join(item['missing_fields'])}")
-        print(f"   Suggestions:")
-        for field, value in fix['suggested_fixes'].items():
-            print(f"     - {field}: {value}")
-        print()
-    
-    # Generate CSV report
-    generate_csv_report(missing_data, fixes)
-    print("Generated product_validation_report.csv")
-    
-    print("\nTo fix these issues:")
-    print("1. Review the CSV report")
-    print("2. Update data/products.json with correct information")
-    print("3. Re-run this script to verify fixes")
+
+    by_product: Dict[str, List[Dict]] = {}
+    for issue in results['issues']:
+        by_product.setdefault(issue['id'], []).append(issue)
+
+    for product_id, product_issues in by_product.items():
+        print(f"Product: {product_id}")
+        for issue in product_issues:
+            print(f"   [{issue['severity'].upper()}] {issue['field']}: {issue['message']}")
+
+    if '--csv' in args:
+        print(f"\nGenerated {REPORT_PATH}")
+
+    return 1 if failed else 0
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    exit(main())